@@ -0,0 +1,23 @@
+-- time ranges and keyset pages filter on the owner column, range on created_at
+-- and order by (created_at, id): one composite index serves all three, so the
+-- single-column owner indexes it starts with are dropped. indexes are built and
+-- dropped concurrently, outside a transaction (see the .sql.conf), so writes go
+-- on while they build; each old index goes only once its replacement is there
+CREATE INDEX CONCURRENTLY idx_location_employee_created ON employee_location (employee_id, created_at, id);
+DROP INDEX CONCURRENTLY IF EXISTS idx_location_session;
+
+CREATE INDEX CONCURRENTLY idx_task_employee_created ON task (employee_id, created_at, id);
+DROP INDEX CONCURRENTLY IF EXISTS idx_task_employee;
+
+CREATE INDEX CONCURRENTLY idx_jobs_employer_created ON jobs (employer_id, created_at, id);
+DROP INDEX CONCURRENTLY IF EXISTS idx_employer;
+
+CREATE INDEX CONCURRENTLY payments_from_user_id_created_idx ON payments (from_user_id, created_at, id);
+DROP INDEX CONCURRENTLY IF EXISTS payments_from_user_id_idx;
+
+CREATE INDEX CONCURRENTLY payments_to_user_id_created_idx ON payments (to_user_id, created_at, id);
+DROP INDEX CONCURRENTLY IF EXISTS payments_to_user_id_idx;
+
+-- every lookup by employee only wants the current (not deleted) mapping
+CREATE INDEX CONCURRENTLY idx_employee_mapping_active ON employee_mapping (employee_id, employer_id) WHERE deleted IS NULL;
+DROP INDEX CONCURRENTLY IF EXISTS idx_employee;
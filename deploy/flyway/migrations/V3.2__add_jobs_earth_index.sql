@@ -0,0 +1,6 @@
+-- job search tests earth_box(...) @> ll_to_earth(location_lat, location_long)
+-- on open jobs only; the expression must match the query's for the GiST index
+-- to be used. it replaces the btree on the raw columns, which no query can use.
+-- built concurrently like the V3.1 indexes
+CREATE INDEX CONCURRENTLY idx_jobs_open_earth ON jobs USING gist (ll_to_earth(location_lat, location_long)) WHERE deleted IS NULL AND done IS NULL;
+DROP INDEX CONCURRENTLY IF EXISTS idx_jobs_location;
@@ -0,0 +1,148 @@
+-- location pings go to daily partitions of created_at (UTC days): a time range
+-- only reads the days it covers and retention drops whole days instead of
+-- deleting rows. the days dropped are first rolled up into per-hour means in
+-- employee_location_hourly. a partitioned table's primary key has to contain
+-- the partition key, hence (id, created_at)
+ALTER TABLE employee_location RENAME TO employee_location_unpartitioned;
+
+CREATE TABLE employee_location
+(
+    id               UUID        NOT NULL,
+    created_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_modified_at TIMESTAMPTZ DEFAULT NOW(),
+    employee_id      UUID        NOT NULL,
+    location_lat     NUMERIC     NOT NULL,
+    location_long    NUMERIC     NOT NULL,
+    PRIMARY KEY (id, created_at),
+    FOREIGN KEY (employee_id) REFERENCES user_accounts (id)
+) PARTITION BY RANGE (created_at);
+
+-- pings of days that have no partition (old points of a batch upload, or a
+-- missed maintenance run) land here until their day gets one or is rolled up
+CREATE TABLE employee_location_default PARTITION OF employee_location DEFAULT;
+
+CREATE TABLE employee_location_hourly
+(
+    id               UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    -- start of the hour
+    created_at       TIMESTAMPTZ NOT NULL,
+    last_modified_at TIMESTAMPTZ DEFAULT NOW(),
+    employee_id      UUID        NOT NULL,
+    -- mean position of the pings of the hour
+    location_lat     NUMERIC     NOT NULL,
+    location_long    NUMERIC     NOT NULL,
+    point_count      INTEGER     NOT NULL,
+    FOREIGN KEY (employee_id) REFERENCES user_accounts (id)
+);
+
+CREATE UNIQUE INDEX idx_location_hourly_employee_created ON employee_location_hourly (employee_id, created_at);
+
+CREATE FUNCTION employee_location_add_partition(day DATE) RETURNS VOID
+    LANGUAGE plpgsql AS
+$$
+DECLARE
+    name        TEXT        := 'employee_location_p' || to_char(day, 'YYYYMMDD');
+    lower_bound TIMESTAMPTZ := day::TIMESTAMP AT TIME ZONE 'UTC';
+    upper_bound TIMESTAMPTZ := (day + 1)::TIMESTAMP AT TIME ZONE 'UTC';
+BEGIN
+    IF to_regclass(name) IS NOT NULL THEN
+        RETURN;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE employee_location INCLUDING DEFAULTS)', name);
+    -- the default partition may not keep rows of an attached partition's range
+    EXECUTE format(
+            'WITH moved AS (DELETE FROM employee_location_default WHERE created_at >= $1 AND created_at < $2 RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved', name) USING lower_bound, upper_bound;
+    EXECUTE format('ALTER TABLE employee_location ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   name, lower_bound, upper_bound);
+END
+$$;
+
+-- adds the rows returned by the query source to the hourly rollups, merging
+-- into hours that were rolled up before
+CREATE FUNCTION employee_location_roll_up(source TEXT) RETURNS VOID
+    LANGUAGE plpgsql AS
+$$
+BEGIN
+    EXECUTE 'WITH source AS (' || source || ') '
+                'INSERT INTO employee_location_hourly AS h (created_at, employee_id, location_lat, location_long, point_count) '
+                'SELECT date_trunc(''hour'', created_at, ''UTC''), employee_id, AVG(location_lat), AVG(location_long), COUNT(*) '
+                'FROM source GROUP BY 1, 2 '
+                'ON CONFLICT (employee_id, created_at) DO UPDATE SET '
+                'location_lat = (h.location_lat * h.point_count + EXCLUDED.location_lat * EXCLUDED.point_count) / (h.point_count + EXCLUDED.point_count), '
+                'location_long = (h.location_long * h.point_count + EXCLUDED.location_long * EXCLUDED.point_count) / (h.point_count + EXCLUDED.point_count), '
+                'point_count = h.point_count + EXCLUDED.point_count, '
+                'last_modified_at = NOW()';
+END
+$$;
+
+-- creates the partitions of the next `ahead` days, then rolls up and drops the
+-- days that ended more than `retention` ago. returns the partitions dropped.
+-- every row is rolled up in the transaction that removes it, so a point is
+-- always either in employee_location or in employee_location_hourly
+CREATE FUNCTION employee_location_maintain(retention INTERVAL, ahead INTEGER) RETURNS INTEGER
+    LANGUAGE plpgsql AS
+$$
+DECLARE
+    today    DATE        := (NOW() AT TIME ZONE 'UTC')::DATE;
+    boundary TIMESTAMPTZ := date_trunc('day', NOW() - retention, 'UTC');
+    dropped  INTEGER     := 0;
+    part     RECORD;
+BEGIN
+    -- one instance at a time, the others skip this run
+    IF NOT pg_try_advisory_xact_lock(hashtext('employee_location_maintain')) THEN
+        RETURN 0;
+    END IF;
+    FOR i IN 0..ahead
+        LOOP
+            PERFORM employee_location_add_partition(today + i);
+        END LOOP;
+    FOR part IN
+        SELECT child.relname AS name
+        FROM pg_inherits
+                 JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                 JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'employee_location'
+          AND child.relname ~ '^employee_location_p\d{8}$'
+          AND (to_date(right(child.relname, 8), 'YYYYMMDD') + 1)::TIMESTAMP AT TIME ZONE 'UTC' <= boundary
+        LOOP
+            -- late pings for the day wait until it is gone; inserts into the
+            -- other days go on, only the detach locks the whole table
+            EXECUTE format('LOCK TABLE %I IN SHARE MODE', part.name);
+            PERFORM employee_location_roll_up(format('SELECT * FROM %I', part.name));
+            EXECUTE format('ALTER TABLE employee_location DETACH PARTITION %I', part.name);
+            EXECUTE format('DROP TABLE %I', part.name);
+            dropped := dropped + 1;
+        END LOOP;
+    PERFORM employee_location_roll_up(format(
+            'DELETE FROM employee_location_default WHERE created_at < %L RETURNING *', boundary));
+    RETURN dropped;
+END
+$$;
+
+-- partitions for every day with pings and the days ahead; the days past any
+-- retention are rolled up and dropped by the first maintenance run
+DO
+$$
+    DECLARE
+        today     DATE := (NOW() AT TIME ZONE 'UTC')::DATE;
+        -- LEAST skips the NULL of an empty table
+        first_day DATE := LEAST(
+                (SELECT MIN(COALESCE(created_at, last_modified_at)) AT TIME ZONE 'UTC'
+                 FROM employee_location_unpartitioned)::DATE, today);
+    BEGIN
+        FOR i IN 0..(today - first_day + 7)
+            LOOP
+                PERFORM employee_location_add_partition(first_day + i);
+            END LOOP;
+    END
+$$;
+
+INSERT INTO employee_location (id, created_at, last_modified_at, employee_id, location_lat, location_long)
+SELECT id, COALESCE(created_at, last_modified_at, NOW()), last_modified_at, employee_id, location_lat, location_long
+FROM employee_location_unpartitioned;
+
+DROP TABLE employee_location_unpartitioned;
+
+-- created on the parent, every partition gets its own copy
+CREATE INDEX idx_location_employee_created ON employee_location (employee_id, created_at, id);
@@ -0,0 +1,18 @@
+-- newest ping of each employee, upserted with every batch of pings, so the
+-- live map is one lookup per employee instead of a range scan of the pings
+CREATE TABLE employee_last_location
+(
+    id               UUID PRIMARY KEY,
+    created_at       TIMESTAMPTZ DEFAULT NOW(),
+    last_modified_at TIMESTAMPTZ DEFAULT NOW(),
+    employee_id      UUID        NOT NULL UNIQUE,
+    location_lat     NUMERIC     NOT NULL,
+    location_long    NUMERIC     NOT NULL,
+    located_at       TIMESTAMPTZ NOT NULL,
+    FOREIGN KEY (employee_id) REFERENCES user_accounts (id)
+);
+
+INSERT INTO employee_last_location (id, employee_id, location_lat, location_long, located_at)
+SELECT DISTINCT ON (employee_id) id, employee_id, location_lat, location_long, created_at
+FROM employee_location
+ORDER BY employee_id, created_at DESC, id DESC;
@@ -14,7 +14,7 @@ function get_container() {
 
 function add_sql() {
   container=$(get_container $COCKROACH_CONTAINER_NAME)
-  folder="$PWD"/deploy/flyway/migrations/*
+  folder="$PWD"/deploy/flyway/migrations/*.sql
   for file in $folder; do
     if [ -f "$file" ]; then
         file_name=$(basename "$file")
@@ -55,6 +55,11 @@ then
   echo "Running tests"
   source .env
   doppler run poetry run pytest
+elif [[ $1 = "plan-check" ]]
+then
+  echo "Checking query plans"
+  source .env
+  doppler run poetry run pytest tests/test_query_plans.py
 elif [[ $1 = "check-format" ]]
 then
   isort src tests  -c --diff && black src tests  --diff --check
@@ -1,17 +1,22 @@
 from fastapi import Header, HTTPException
 from firebase_admin import auth
 
-from src.client.cockroach import CockroachDBClient
+from src.client.cockroach import CockroachDBSession
 from src.client.firebase import FirebaseClient
 from src.db.tables.user import User
 
 
-def _get_requesting_user(
-    authorization, cockroach_client: CockroachDBClient, firebase_client: FirebaseClient
+async def _get_requesting_user(
+    authorization,
+    cockroach_session: CockroachDBSession,
+    firebase_client: FirebaseClient,
 ) -> User:
-    firebase_user_id = get_user_from_token(firebase_client, authorization)
-    user = cockroach_client.query(
-        User.get_by_field_unique,
+    # token verification is blocking (signature check, key fetch), keep it off the loop
+    firebase_user_id = await firebase_client.arun(
+        get_user_from_token, firebase_client, authorization
+    )
+    user = await cockroach_session.aquery(
+        User.aget_by_field_unique,
         field="firebase_user_id",
         match_value=firebase_user_id,
         error_not_exist=False,
@@ -0,0 +1,32 @@
+import os
+import secrets
+
+from fastapi import Header, HTTPException
+from starlette import status
+
+ENV_OPS_TOKEN = "OPS_TOKEN"
+
+
+def verify_ops(authorization: str | None = Header(None)) -> None:
+    # ops endpoints are off unless a token is configured
+    ops_token = os.environ.get(ENV_OPS_TOKEN)
+    if authorization is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing authorization header",
+        )
+    try:
+        scheme, token = authorization.split()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authorization header",
+        )
+    if (
+        ops_token is None
+        or scheme.lower() != "bearer"
+        or not secrets.compare_digest(token, ops_token)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized"
+        )
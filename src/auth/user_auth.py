@@ -5,11 +5,11 @@ from pydantic import BaseModel
 from starlette import status
 
 from src.auth.base import _get_requesting_user
-from src.client.cockroach import CockroachDBClient
+from src.client.cockroach import CockroachDBSession
 from src.client.firebase import FirebaseClient
 from src.db.tables.task import Task
 from src.db.tables.user import User
-from src.utils.client import getCockroachClient, getFirebaseClient
+from src.utils.client import getCockroachSession, getFirebaseClient
 from src.utils.enums import UserType
 
 
@@ -22,12 +22,14 @@ class VerifiedTask(BaseModel):
     requesting_user: User
 
 
-def verify_user(
+async def verify_user(
     authorization: str = Header(...),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     firebase_client: FirebaseClient = Depends(getFirebaseClient),
 ) -> VerifiedUser:
-    user: User = _get_requesting_user(authorization, cockroach_client, firebase_client)
+    user: User = await _get_requesting_user(
+        authorization, cockroach_session, firebase_client
+    )
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -35,19 +37,21 @@ def verify_user(
     return VerifiedUser(requesting_user=user)
 
 
-def verify_task(
+async def verify_task(
     task_id: UUID,
     authorization: str = Header(...),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     firebase_client: FirebaseClient = Depends(getFirebaseClient),
 ):
-    user: User = _get_requesting_user(authorization, cockroach_client, firebase_client)
+    user: User = await _get_requesting_user(
+        authorization, cockroach_session, firebase_client
+    )
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    task: Task = cockroach_client.query(
-        Task.get_id,
+    task: Task = await cockroach_session.aquery(
+        Task.aget_id,
         id=task_id,
     )
     if task is None:
@@ -61,12 +65,14 @@ def verify_task(
     return VerifiedTask(task=task, requesting_user=user)
 
 
-def verify_employer(
+async def verify_employer(
     authorization: str = Header(...),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     firebase_client: FirebaseClient = Depends(getFirebaseClient),
 ) -> VerifiedUser:
-    user: User = _get_requesting_user(authorization, cockroach_client, firebase_client)
+    user: User = await _get_requesting_user(
+        authorization, cockroach_session, firebase_client
+    )
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -78,12 +84,14 @@ def verify_employer(
     return VerifiedUser(requesting_user=user)
 
 
-def verify_employee(
+async def verify_employee(
     authorization: str = Header(...),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     firebase_client: FirebaseClient = Depends(getFirebaseClient),
 ) -> VerifiedUser:
-    user: User = _get_requesting_user(authorization, cockroach_client, firebase_client)
+    user: User = await _get_requesting_user(
+        authorization, cockroach_session, firebase_client
+    )
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -1,12 +1,39 @@
+import asyncio
+import contextvars
+import inspect
 import os
-from typing import Any, Callable, Optional
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Optional
 
 import sqlalchemy
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
+from src.utils.metrics import Counter, SlowQueryLog, Timer
+from src.utils.request_stats import instrument_engine
+
 
 class CockroachDBClient:
     ENV_URL = "COCKROACH_DB_URL"
+    ENV_POOL_SIZE = "DB_POOL_SIZE"
+    ENV_MAX_OVERFLOW = "DB_MAX_OVERFLOW"
+    ENV_POOL_TIMEOUT = "DB_POOL_TIMEOUT"
+    ENV_POOL_RECYCLE = "DB_POOL_RECYCLE"
+    ENV_POOL_PRE_PING = "DB_POOL_PRE_PING"
+    ENV_RETRY_ATTEMPTS = "DB_RETRY_ATTEMPTS"
+    ENV_RETRY_BASE_DELAY = "DB_RETRY_BASE_DELAY"
+    ENV_RETRY_MAX_DELAY = "DB_RETRY_MAX_DELAY"
+    ENV_FOLLOWER_READS = "DB_FOLLOWER_READS"
+    ENV_FOLLOWER_READ_STALENESS = "DB_FOLLOWER_READ_STALENESS"
+    ENV_SLOW_QUERY_MS = "DB_SLOW_QUERY_MS"
+    ENV_SLOW_QUERY_LOG_SIZE = "DB_SLOW_QUERY_LOG_SIZE"
+    ENV_SLOW_QUERY_EXPLAIN_RATE = "DB_SLOW_QUERY_EXPLAIN_RATE"
+    RETRYABLE_SQLSTATE = "40001"
 
     def __init__(self, url: Optional[str] = None):
         # self.url = url or os.environ[self.ENV_URL]
@@ -14,6 +41,38 @@ class CockroachDBClient:
         self.db_user = os.environ["DB_USER"]
         self.db_pass = os.environ["DB_PASS"]
         self.unix_socket_path = os.environ["UNIX_SOCKET_PATH"]
+        # applied to both engines, so a worker can hold up to
+        # 2 * (pool_size + max_overflow) connections
+        self.pool_size = int(os.environ.get(self.ENV_POOL_SIZE, 5))
+        self.max_overflow = int(os.environ.get(self.ENV_MAX_OVERFLOW, 10))
+        self.pool_timeout = float(os.environ.get(self.ENV_POOL_TIMEOUT, 30))
+        self.pool_recycle = int(os.environ.get(self.ENV_POOL_RECYCLE, 1800))
+        self.pool_pre_ping = (
+            os.environ.get(self.ENV_POOL_PRE_PING, "true").lower() == "true"
+        )
+        self.retry_attempts = int(os.environ.get(self.ENV_RETRY_ATTEMPTS, 5))
+        self.retry_base_delay = float(os.environ.get(self.ENV_RETRY_BASE_DELAY, 0.05))
+        self.retry_max_delay = float(os.environ.get(self.ENV_RETRY_MAX_DELAY, 1.0))
+        # AS OF SYSTEM TIME is CockroachDB only, keep it off against Postgres
+        self.follower_reads = (
+            os.environ.get(self.ENV_FOLLOWER_READS, "false").lower() == "true"
+        )
+        self.follower_read_staleness = os.environ.get(self.ENV_FOLLOWER_READ_STALENESS)
+        if self.follower_read_staleness is not None and not re.fullmatch(
+            r"-\d+(\.\d+)?(ms|s|m)", self.follower_read_staleness
+        ):
+            raise ValueError(
+                f"{self.ENV_FOLLOWER_READ_STALENESS} must be a negative interval like -5s"
+            )
+        self.checkout_wait = {"sync": Timer(), "async": Timer()}
+        self.transaction_retries = Counter()
+        self.transaction_retries_exhausted = Counter()
+        self.slow_queries = SlowQueryLog(
+            threshold=float(os.environ.get(self.ENV_SLOW_QUERY_MS, 200)) / 1000,
+            size=int(os.environ.get(self.ENV_SLOW_QUERY_LOG_SIZE, 100)),
+            explain_rate=float(os.environ.get(self.ENV_SLOW_QUERY_EXPLAIN_RATE, 0.1)),
+        )
+        self._explain_tasks = set()
         self.engine = sqlalchemy.create_engine(
             sqlalchemy.engine.url.URL.create(
                 drivername="postgresql+pg8000",
@@ -21,9 +80,122 @@ class CockroachDBClient:
                 password=self.db_pass,
                 database=self.db_name,
                 query={"unix_sock": f"{self.unix_socket_path}/.s.PGSQL.5432"},
-            )
+            ),
+            **self._pool_options(),
+        )
+        # asyncpg takes the socket directory as host and appends .s.PGSQL.5432 itself
+        self.async_engine = create_async_engine(
+            sqlalchemy.engine.url.URL.create(
+                drivername="postgresql+asyncpg",
+                username=self.db_user,
+                password=self.db_pass,
+                database=self.db_name,
+                query={"host": self.unix_socket_path},
+            ),
+            **self._pool_options(),
+        )
+        self.async_session_maker = async_sessionmaker(
+            bind=self.async_engine, autoflush=False, expire_on_commit=False
+        )
+        instrument_engine(self.engine, self._on_query)
+        instrument_engine(self.async_engine.sync_engine, self._on_async_query)
+
+    def _pool_options(self) -> dict[str, Any]:
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+
+    def pool_status(self) -> dict[str, dict[str, Any]]:
+        status = {}
+        for name, pool in (
+            ("sync", self.engine.pool),
+            ("async", self.async_engine.pool),
+        ):
+            checkout_wait = self.checkout_wait[name]
+            status[name] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                # QueuePool.overflow() counts up from -pool_size
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": self.max_overflow,
+                "checkout_count": checkout_wait.count,
+                "checkout_wait_avg_ms": checkout_wait.avg * 1000,
+                "checkout_wait_max_ms": checkout_wait.max * 1000,
+            }
+        return status
+
+    def metrics(self) -> dict[str, float]:
+        values = {}
+        for engine, status in self.pool_status().items():
+            for key, value in status.items():
+                values[f'db_pool_{key}{{engine="{engine}"}}'] = value
+        values["db_transaction_retries_total"] = self.transaction_retries.value
+        values[
+            "db_transaction_retries_exhausted_total"
+        ] = self.transaction_retries_exhausted.value
+        values["db_slow_queries_total"] = self.slow_queries.count.value
+        return values
+
+    def _on_query(self, statement: str, parameters: Any, many: bool, seconds: float):
+        # plans are only captured through the async engine
+        self.slow_queries.observe(statement, parameters, seconds)
+
+    def _on_async_query(
+        self, statement: str, parameters: Any, many: bool, seconds: float
+    ):
+        entry = self.slow_queries.observe(statement, parameters, seconds)
+        if entry is None or many:
+            return
+        # EXPLAIN runs later on a connection of its own: inside the request's
+        # transaction a failing EXPLAIN would abort it. the empty context keeps
+        # it out of the request's stats
+        task = contextvars.Context().run(
+            asyncio.get_running_loop().create_task,
+            self._explain(entry, statement, parameters),
+        )
+        self._explain_tasks.add(task)
+        task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain(self, entry: dict, statement: str, parameters: Any):
+        try:
+            async with self.async_engine.connect() as conn:
+                result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+                entry["plan"] = "\n".join(str(row[0]) for row in result)
+        except Exception as e:
+            entry["plan"] = f"EXPLAIN failed: {e}"
+
+    @classmethod
+    def is_retryable(cls, error: DBAPIError) -> bool:
+        orig = error.orig
+        # asyncpg (through sqlalchemy) and psycopg2 expose the code directly,
+        # pg8000 puts the server's error fields in args[0]
+        sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+        if sqlstate is None and orig is not None and orig.args:
+            if isinstance(orig.args[0], dict):
+                sqlstate = orig.args[0].get("C")
+        return sqlstate == cls.RETRYABLE_SQLSTATE
+
+    def _retry_delay(self, attempt: int) -> float:
+        # exponential backoff with full jitter
+        return random.uniform(
+            0, min(self.retry_max_delay, self.retry_base_delay * 2**attempt)
         )
 
+    def _checkout(self, session: Session):
+        start = time.perf_counter()
+        session.connection()
+        self.checkout_wait["sync"].observe(time.perf_counter() - start)
+
+    async def _acheckout(self, session: AsyncSession):
+        start = time.perf_counter()
+        await session.connection()
+        self.checkout_wait["async"].observe(time.perf_counter() - start)
+
     def get_session_maker(self):
         return sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
 
@@ -31,6 +203,7 @@ class CockroachDBClient:
         # Instead of using run_transaction, directly execute the provided function
         session = self.get_session_maker()()
         try:
+            self._checkout(session)
             result = fn(session, **kwargs)
             session.commit()
             return result
@@ -39,3 +212,173 @@ class CockroachDBClient:
             raise e
         finally:
             session.close()
+
+    async def aquery(self, fn: Callable[[AsyncSession, ...], Awaitable[Any]], **kwargs):
+        # same contract as query, but fn is a coroutine function over an AsyncSession
+        # so waiting on the database never blocks the event loop
+        return await self.run_transaction(
+            lambda cockroach_session: cockroach_session.aquery(fn, **kwargs)
+        )
+
+    async def run_transaction(
+        self, fn: Callable[["CockroachDBSession"], Awaitable[Any]]
+    ) -> Any:
+        """run fn in a unit of work, re-running it when the transaction hits a
+        serialization conflict (SQLSTATE 40001)
+
+        follows CockroachDB's client-side retry protocol: the work runs after
+        SAVEPOINT cockroach_restart, a conflict rolls back to that savepoint and fn
+        is called again on the same transaction, RELEASE SAVEPOINT commits it.
+        fn may therefore run more than once and must not have side effects outside
+        the database before it returns
+        """
+        async with self.unit_of_work() as cockroach_session:
+            attempt = 0
+            while True:
+                try:
+                    result = await fn(cockroach_session)
+                    await cockroach_session.release()
+                    return result
+                except DBAPIError as e:
+                    if not self.is_retryable(e):
+                        raise e
+                    attempt += 1
+                    if attempt >= self.retry_attempts:
+                        self.transaction_retries_exhausted.inc()
+                        raise e
+                    self.transaction_retries.inc()
+                    await cockroach_session.restart()
+                    await asyncio.sleep(self._retry_delay(attempt))
+
+    async def astale_query(
+        self, fn: Callable[[AsyncSession, ...], Awaitable[Any]], **kwargs
+    ):
+        """aquery for reads that tolerate a few seconds of staleness
+
+        the read runs in its own read-only transaction at a past timestamp
+        (follower_read_timestamp(), or DB_FOLLOWER_READ_STALENESS when set), so it
+        can be served by the nearest replica instead of the leaseholder. with
+        follower reads disabled it is a plain aquery
+        """
+        if not self.follower_reads:
+            return await self.aquery(fn, **kwargs)
+        if self.follower_read_staleness is not None:
+            as_of = f"'{self.follower_read_staleness}'"
+        else:
+            as_of = "follower_read_timestamp()"
+        async with self.async_session_maker() as session:
+            async with session.begin():
+                await self._acheckout(session)
+                await session.execute(
+                    text(f"SET TRANSACTION AS OF SYSTEM TIME {as_of}")
+                )
+                return await fn(session, **kwargs)
+
+    async def astream(
+        self, fn: Callable[[AsyncSession, ...], AsyncIterator[Any]], **kwargs
+    ) -> AsyncIterator[Any]:
+        """iterate an async generator reader (DBSchemaBase.astream_*) in a
+        transaction of its own
+
+        meant for response bodies that are sent after the request's unit of work
+        has committed. there is no retry: rows already yielded cannot be taken back
+        """
+        async with self.async_session_maker() as session:
+            async with session.begin():
+                await self._acheckout(session)
+                async for item in fn(session, **kwargs):
+                    yield item
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator["CockroachDBSession"]:
+        # one session and one transaction: commit when the block exits cleanly,
+        # roll back if anything inside it raises
+        async with self.async_session_maker() as session:
+            cockroach_session = CockroachDBSession(self, session)
+            try:
+                async with session.begin():
+                    yield cockroach_session
+            except BaseException:
+                await cockroach_session.close_streams()
+                raise
+            # committed: the streams now belong to the response
+            cockroach_session.streams.clear()
+            await cockroach_session.run_after_commit()
+
+
+class CockroachDBSession:
+    """a unit of work opened by CockroachDBClient.unit_of_work
+
+    aquery has the same calling convention as CockroachDBClient.aquery, but every
+    call runs on the same connection and inside the same transaction, which is
+    committed or rolled back by whoever opened the unit of work
+    """
+
+    def __init__(self, client: CockroachDBClient, session: AsyncSession):
+        self.client = client
+        self.session = session
+        self._started = False
+        self._after_commit: list[Callable[[], Awaitable[None] | None]] = []
+        # streams opened by the current attempt, closed if it does not commit
+        self.streams: list[AsyncGenerator[Any, None]] = []
+
+    async def aquery(self, fn: Callable[[AsyncSession, ...], Awaitable[Any]], **kwargs):
+        # the connection is taken on first use, not when the unit of work opens,
+        # so auth work before the first query does not hold a pooled connection
+        if not self._started:
+            await self.client._acheckout(self.session)
+            await self.session.execute(text("SAVEPOINT cockroach_restart"))
+            self._started = True
+        return await fn(self.session, **kwargs)
+
+    async def astale_query(
+        self, fn: Callable[[AsyncSession, ...], Awaitable[Any]], **kwargs
+    ):
+        # opt-in for reads that can be a few seconds behind. with follower reads
+        # enabled the read leaves the request's transaction (and takes a second
+        # connection), otherwise it stays on the unit of work
+        if not self.client.follower_reads:
+            return await self.aquery(fn, **kwargs)
+        return await self.client.astale_query(fn, **kwargs)
+
+    def astream(
+        self, fn: Callable[[AsyncSession, ...], AsyncIterator[Any]], **kwargs
+    ) -> AsyncIterator[Any]:
+        # streams outlive the handler, so they cannot use the unit of work's
+        # session and get their own (see CockroachDBClient.astream)
+        stream = self.client.astream(fn, **kwargs)
+        self.streams.append(stream)
+        return stream
+
+    async def close_streams(self):
+        # a stream already read from holds a connection until closed, and a
+        # retried or failed attempt never hands it on
+        streams, self.streams = self.streams, []
+        for stream in streams:
+            await stream.aclose()
+
+    def after_commit(self, fn: Callable[[], Awaitable[None] | None]):
+        """call fn once the unit of work has committed, for in-process state
+        that must not see writes that end up rolled back. what fn returns is
+        awaited when it is awaitable"""
+        self._after_commit.append(fn)
+
+    async def run_after_commit(self):
+        callbacks, self._after_commit = self._after_commit, []
+        for fn in callbacks:
+            result = fn()
+            if inspect.isawaitable(result):
+                await result
+
+    async def release(self):
+        if self._started:
+            await self.session.execute(text("RELEASE SAVEPOINT cockroach_restart"))
+
+    async def restart(self):
+        # the retry registers its own callbacks and opens its own streams
+        self._after_commit.clear()
+        await self.close_streams()
+        if self._started:
+            await self.session.execute(text("ROLLBACK TO SAVEPOINT cockroach_restart"))
+            # objects loaded before the restart may no longer match the database
+            self.session.expunge_all()
@@ -1,13 +1,17 @@
 import json
 import os
+import time
 import uuid
 from uuid import UUID
 
 import firebase_admin
 import requests
+from fastapi.concurrency import run_in_threadpool
 from firebase_admin import auth, credentials
 from pydantic import BaseModel
 
+from src.utils.request_stats import record_firebase
+
 
 class FirebaseUser(BaseModel):
     id: str
@@ -27,6 +31,15 @@ class FirebaseClient:
             cred = credentials.Certificate(os.environ.get(self.env_var))
             self.app = firebase_admin.initialize_app(cred)
 
+    async def arun(self, fn, *args, **kwargs):
+        # firebase_admin calls block on the network, run them in the threadpool
+        # and count them into the request's stats
+        start = time.perf_counter()
+        try:
+            return await run_in_threadpool(fn, *args, **kwargs)
+        finally:
+            record_firebase(time.perf_counter() - start)
+
     def get_user_by_email(self, email: str) -> FirebaseUser | None:
         try:
             user = auth.get_user_by_email(email, app=self.app)
@@ -5,20 +5,61 @@ import types
 import typing
 import uuid
 from abc import ABC
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Any, List, Optional, Type
+from typing import Any, AsyncIterator, Iterator, List, Optional, Type
 
 from pydantic import BaseModel, Field
 from sqlalchemy import ARRAY, JSON, Boolean, Column, DateTime
 from sqlalchemy import Enum as SQLEnum
-from sqlalchemy import Float, Integer, String, and_, func, select
+from sqlalchemy import (
+    Float,
+    Integer,
+    String,
+    and_,
+    delete,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import DeclarativeMeta, Session, declared_attr
+from sqlalchemy.types import TypeDecorator
 
+from src.utils.enums import EmployeeStatus, UserType
+from src.utils.pagination import decode_cursor, decode_distance_cursor
 from src.utils.time import get_current_time
 
+BULK_INSERT_BATCH_SIZE = 500
+STREAM_BATCH_SIZE = 500
+MAX_BIND_PARAMS = 65535
+
+# names of the Postgres enum types the migrations created; asyncpg casts every
+# bound enum to its column's type by name
+ENUM_TYPE_NAMES = {UserType: "user_type", EmployeeStatus: "employee_map_type"}
+
+
+class UTCDateTime(TypeDecorator):
+    """TIMESTAMPTZ, like every timestamp column of the migrations
+
+    asyncpg binds timezone-aware values only; a naive datetime (an old cursor,
+    a client time without an offset) is taken as UTC
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value: datetime | None, dialect) -> datetime | None:
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
 
 def snake_case_to_camel_case(name: str) -> str:
     return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
@@ -43,7 +84,7 @@ class Base:
         if annotation == int:
             return Integer
         if annotation == datetime:
-            return DateTime
+            return UTCDateTime
         if annotation == uuid.UUID:
             return UUID(as_uuid=True)
         if annotation == bool:
@@ -55,7 +96,7 @@ class Base:
         if typing.get_origin(annotation) == list:
             return ARRAY(UUID)
         if issubclass(annotation, Enum):
-            return SQLEnum(annotation)
+            return SQLEnum(annotation, name=ENUM_TYPE_NAMES.get(annotation))
         raise Exception(f"Type {annotation} not supported")
 
     @classmethod
@@ -97,44 +138,371 @@ class DBSchemaBase(BaseModel, ABC):
             "id": Column(
                 UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False
             ),
-            "created_at": Column(DateTime, default=func.now(), nullable=False),
-            "last_modified_at": Column(DateTime, default=func.now(), nullable=False),
+            "created_at": Column(UTCDateTime, default=func.now(), nullable=False),
+            "last_modified_at": Column(UTCDateTime, default=func.now(), nullable=False),
         }
 
     @classmethod
-    def add(cls, db: Session, items: List[DBSchemaBase]):
-        for item in items:
-            po = cls._schema_cls()(**item.model_dump(exclude_none=True))
-            db.add(po)
+    def _schema_cls(cls):
+        if cls._cached_schema_cls is None:
+            cls._cached_schema_cls = Base.from_schema_base(cls)
+        return cls._cached_schema_cls
 
     @classmethod
-    def _extract_all_data(cls, db: Session, statement) -> List[DBSchemaBase] | None:
-        results = db.execute(statement).scalars().all()
-        return [cls.model_validate(po, from_attributes=True) for po in results]
+    def get_field(cls, field):
+        schema_cls = cls._schema_cls()
+        return getattr(schema_cls, field)
 
     @classmethod
-    def get_all(cls, db: Session) -> List[DBSchemaBase] | None:
-        return cls._extract_all_data(db, select(cls._schema_cls()))
+    def _from_row(cls, row) -> DBSchemaBase:
+        # rows come from our own tables through columns typed after these same
+        # fields, so the model is built without running validation again
+        return cls.model_construct(**{f: getattr(row, f) for f in cls.model_fields})
 
     @classmethod
-    def get_id(
-        cls, db: Session, id: UUID, error_not_exist: bool = True
+    def _to_record(
+        cls, result, error_not_exist: bool, condition: str = ""
     ) -> DBSchemaBase | None:
-        schema_cls = cls._schema_cls()
-        result = db.query(schema_cls).filter(cls._schema_cls().id == id).first()
         if result:
-            return cls.model_validate(result, from_attributes=True)
+            return cls._from_row(result)
         if error_not_exist:
             raise Exception(
-                f"Could not find a record in {schema_cls.__name__} with id {id}"
+                f"Could not find a record in {cls._schema_cls().__name__} {condition}".rstrip()
             )
         return None
 
     @classmethod
-    def _schema_cls(cls):
-        if cls._cached_schema_cls is None:
-            cls._cached_schema_cls = Base.from_schema_base(cls)
-        return cls._cached_schema_cls
+    def _to_records(
+        cls,
+        results,
+        error_not_exist: bool,
+        condition: str = "",
+        columns: list[str] | None = None,
+    ) -> List[DBSchemaBase] | List[Row] | None:
+        if results and columns:
+            # projected rows are returned as they come, without validation
+            return list(results)
+        if results:
+            return [cls._from_row(r) for r in results]
+        if error_not_exist:
+            raise Exception(
+                f"Could not find a record in {cls._schema_cls().__name__} {condition}".rstrip()
+            )
+        return None
+
+    @classmethod
+    def _to_distance_records(
+        cls, results, error_not_exist: bool
+    ) -> list[tuple[DBSchemaBase, float]] | None:
+        if results:
+            return [(cls._from_row(r[0]), r.distance) for r in results]
+        if error_not_exist:
+            raise Exception(
+                f"Could not find a record in {cls._schema_cls().__name__} in radius"
+            )
+        return None
+
+    # statement builders, shared by the sync readers and their async (a*) variants
+
+    @classmethod
+    def _select_id(cls, id: UUID):
+        schema_cls = cls._schema_cls()
+        return select(schema_cls).where(schema_cls.id == id).limit(1)
+
+    @classmethod
+    def _select_in_radius(cls, lat: float, lon: float, radius: float):
+        schema_cls = cls._schema_cls()
+        return select(schema_cls).where(
+            func.earth_box(func.ll_to_earth(lat, lon), radius).op("@>")(
+                func.ll_to_earth(
+                    getattr(schema_cls, "location_lat"),
+                    getattr(schema_cls, "location_long"),
+                )
+            )
+        )
+
+    @classmethod
+    def _distance_from(cls, lat: float, lon: float):
+        schema_cls = cls._schema_cls()
+        return func.earth_distance(
+            func.ll_to_earth(lat, lon),
+            func.ll_to_earth(
+                getattr(schema_cls, "location_lat"),
+                getattr(schema_cls, "location_long"),
+            ),
+        )
+
+    @classmethod
+    def _select_nearest(
+        cls,
+        lat: float,
+        lon: float,
+        radius: float,
+        fields: list[str] | None,
+        match_values: list[Any] | None,
+        limit: int,
+        cursor: str | None,
+    ):
+        """records within radius meters with their distance, closest first.
+        the earth_box test is the one an index on ll_to_earth(location_lat,
+        location_long) can serve, earth_distance then drops the box's corners"""
+        schema_cls = cls._schema_cls()
+        distance = cls._distance_from(lat, lon)
+        statement = (
+            cls._select_in_radius(lat, lon, radius)
+            .add_columns(distance.label("distance"))
+            .where(distance <= radius)
+        )
+        if fields:
+            statement = statement.where(cls._field_criteria(fields, match_values))
+        if cursor is not None:
+            statement = statement.where(
+                tuple_(distance, schema_cls.id)
+                > tuple_(*decode_distance_cursor(cursor))
+            )
+        return statement.order_by(distance, schema_cls.id).limit(limit)
+
+    @classmethod
+    def _field_criteria(cls, fields: list[str], match_values: list[Any]):
+        schema_cls = cls._schema_cls()
+        return and_(
+            *(getattr(schema_cls, f) == v for f, v in zip(fields, match_values))
+        )
+
+    @classmethod
+    def _select_by_fields(cls, fields: list[str], match_values: list[Any]):
+        return select(cls._schema_cls()).where(
+            cls._field_criteria(fields, match_values)
+        )
+
+    @classmethod
+    def _select_by_time_field(
+        cls,
+        time_field: str,
+        start_time: datetime,
+        end_time: datetime,
+        field: str,
+        match_value: Any,
+    ):
+        schema_cls = cls._schema_cls()
+        return select(schema_cls).where(
+            and_(
+                getattr(schema_cls, field) == match_value,
+                getattr(schema_cls, time_field).between(start_time, end_time),
+            )
+        )
+
+    @classmethod
+    def _select_by_field_value_list(cls, field: str, match_values: list[Any]):
+        schema_cls = cls._schema_cls()
+        return select(schema_cls).where(getattr(schema_cls, field).in_(match_values))
+
+    @classmethod
+    def _project(cls, statement, columns: list[str] | None):
+        """select only the given columns; the reader then returns Row tuples
+        (attribute access by column name) instead of validated models"""
+        if not columns:
+            return statement
+        return statement.with_only_columns(*(cls.get_field(c) for c in columns))
+
+    @classmethod
+    def _rows(cls, result, columns: list[str] | None):
+        return result.all() if columns else result.scalars().all()
+
+    @classmethod
+    def _paginate(cls, statement, limit: int | None, cursor: str | None):
+        """keyset pagination on (created_at, id): the page after cursor, at most
+        limit records. unpaginated statements keep their unordered result"""
+        if limit is None and cursor is None:
+            return statement
+        schema_cls = cls._schema_cls()
+        statement = statement.order_by(schema_cls.created_at, schema_cls.id)
+        if cursor is not None:
+            statement = statement.where(
+                tuple_(schema_cls.created_at, schema_cls.id)
+                > tuple_(*decode_cursor(cursor))
+            )
+        if limit is not None:
+            statement = statement.limit(limit)
+        return statement
+
+    @classmethod
+    def _select_latest(cls, field: str, match_value: Any, model_field: Any):
+        return (
+            cls._select_by_fields([field], [match_value])
+            .order_by(cls.get_field(model_field).desc())
+            .limit(1)
+        )
+
+    @classmethod
+    def _update_id(cls, id: UUID, new_data: DBSchemaBase):
+        schema_cls = cls._schema_cls()
+        new_data.last_modified_at = get_current_time()
+
+        update_data = {
+            key: value
+            for key, value in new_data.model_dump().items()
+            if key not in cls._fixed_fields()
+        }
+        return update(schema_cls).where(schema_cls.id == id).values(update_data)
+
+    @classmethod
+    def _update_by_fields(
+        cls, fields: list[str], match_values: list[Any], new_values: dict[str, Any]
+    ):
+        schema_cls = cls._schema_cls()
+        fixed_fields = cls._fixed_fields() & new_values.keys()
+        if fixed_fields:
+            raise Exception(f"Cannot update {fixed_fields} of {schema_cls.__name__}")
+        return (
+            update(schema_cls)
+            .where(cls._field_criteria(fields, match_values))
+            .values({**new_values, "last_modified_at": get_current_time()})
+            .returning(schema_cls)
+        )
+
+    @classmethod
+    def _delete_id(cls, id: UUID):
+        schema_cls = cls._schema_cls()
+        return delete(schema_cls).where(schema_cls.id == id)
+
+    @classmethod
+    def _to_schema_objects(cls, items: List[DBSchemaBase]) -> list:
+        return [
+            cls._schema_cls()(**item.model_dump(exclude_none=True)) for item in items
+        ]
+
+    @classmethod
+    def _value_batches(
+        cls, items: List[DBSchemaBase], batch_size: int
+    ) -> Iterator[list[dict]]:
+        if not items:
+            return
+        rows = [item.model_dump() for item in items]
+        # every row of a VALUES list needs the same columns; columns that are None
+        # on all rows are left out so database defaults still apply to them
+        columns = [c for c in rows[0] if any(row[c] is not None for row in rows)]
+        # postgres allows at most 65535 bind parameters per statement
+        batch_size = max(1, min(batch_size, MAX_BIND_PARAMS // len(columns)))
+        for start in range(0, len(rows), batch_size):
+            yield [
+                {c: row[c] for c in columns} for row in rows[start : start + batch_size]
+            ]
+
+    @classmethod
+    def _insert_batches(
+        cls, items: List[DBSchemaBase], batch_size: int, return_ids: bool
+    ) -> Iterator:
+        """multi-row INSERT ... VALUES statements, batch_size rows each"""
+        table = cls._schema_cls().__table__
+        for values in cls._value_batches(items, batch_size):
+            statement = insert(table).values(values)
+            if return_ids:
+                statement = statement.returning(table.c.id)
+            yield statement
+
+    @classmethod
+    def _upsert_batches(
+        cls,
+        items: List[DBSchemaBase],
+        conflict_fields: List[str] | None,
+        update_fields: List[str] | None,
+        batch_size: int,
+        if_newer: str | None = None,
+    ) -> Iterator:
+        """INSERT ... ON CONFLICT statements returning the written rows
+
+        with update_fields the conflicting row gets those columns from the new
+        row (DO UPDATE), without them it is left alone (DO NOTHING). conflict_fields
+        must match a unique constraint; None only works with DO NOTHING and skips
+        rows violating any constraint. with if_newer the update only happens when
+        the new row's if_newer column is greater, so rows arriving out of order
+        cannot replace a later one
+        """
+        table = cls._schema_cls().__table__
+        for values in cls._value_batches(items, batch_size):
+            statement = pg_insert(table).values(values)
+            if update_fields:
+                statement = statement.on_conflict_do_update(
+                    index_elements=conflict_fields,
+                    set_={
+                        **{f: statement.excluded[f] for f in update_fields},
+                        "last_modified_at": get_current_time(),
+                    },
+                    where=(
+                        table.c[if_newer] < statement.excluded[if_newer]
+                        if if_newer
+                        else None
+                    ),
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(
+                    index_elements=conflict_fields
+                )
+            yield statement.returning(*table.columns)
+
+    # sync API, used through CockroachDBClient.query
+
+    @classmethod
+    def add(cls, db: Session, items: List[DBSchemaBase]):
+        db.add_all(cls._to_schema_objects(items))
+
+    @classmethod
+    def add_bulk(
+        cls,
+        db: Session,
+        items: List[DBSchemaBase],
+        batch_size: int = BULK_INSERT_BATCH_SIZE,
+        return_ids: bool = False,
+    ) -> List[uuid.UUID] | None:
+        """insert items with one multi-row INSERT per batch instead of one per row"""
+        ids = []
+        for statement in cls._insert_batches(items, batch_size, return_ids):
+            result = db.execute(statement)
+            if return_ids:
+                ids.extend(result.scalars().all())
+        return ids if return_ids else None
+
+    @classmethod
+    def upsert(
+        cls,
+        db: Session,
+        items: List[DBSchemaBase],
+        conflict_fields: List[str] | None = None,
+        update_fields: List[str] | None = None,
+        batch_size: int = BULK_INSERT_BATCH_SIZE,
+        if_newer: str | None = None,
+    ) -> List[DBSchemaBase] | None:
+        """insert items, resolving unique conflicts in the same statement; returns
+        the inserted or updated records, None if every row was skipped"""
+        results = []
+        for statement in cls._upsert_batches(
+            items, conflict_fields, update_fields, batch_size, if_newer
+        ):
+            results.extend(db.execute(statement).all())
+        return cls._to_records(results, False)
+
+    @classmethod
+    def get_all(
+        cls,
+        db: Session,
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> List[DBSchemaBase] | List[Row] | None:
+        statement = cls._paginate(select(cls._schema_cls()), limit, cursor)
+        statement = cls._project(statement, columns)
+        results = cls._rows(db.execute(statement), columns)
+        if columns:
+            return list(results)
+        return [cls._from_row(po) for po in results]
+
+    @classmethod
+    def get_id(
+        cls, db: Session, id: UUID, error_not_exist: bool = True
+    ) -> DBSchemaBase | None:
+        result = db.execute(cls._select_id(id)).scalars().first()
+        return cls._to_record(result, error_not_exist, f"with id {id}")
 
     @classmethod
     def get_multiple_in_radius(
@@ -145,45 +513,38 @@ class DBSchemaBase(BaseModel, ABC):
         radius: float,
         error_not_exist: bool = False,
     ) -> List[DBSchemaBase] | None:
-        schema_cls = cls._schema_cls()
-        result = (
-            db.query(schema_cls)
-            .filter(
-                and_(
-                    func.earth_box(func.ll_to_earth(lat, lon), radius).op("@>")(
-                        func.ll_to_earth(
-                            getattr(schema_cls, "location_lat"),
-                            getattr(schema_cls, "location_long"),
-                        )
-                    )
-                )
-            )
-            .all()
+        results = db.execute(cls._select_in_radius(lat, lon, radius)).scalars().all()
+        return cls._to_records(results, error_not_exist)
+
+    @classmethod
+    def get_nearest_in_radius(
+        cls,
+        db: Session,
+        lat: float,
+        lon: float,
+        radius: float,
+        limit: int,
+        fields: list[str] | None = None,
+        match_values: list[Any] | None = None,
+        cursor: str | None = None,
+        error_not_exist: bool = False,
+    ) -> list[tuple[DBSchemaBase, float]] | None:
+        """(record, distance in meters) pairs within radius, closest first and
+        limited to limit; fields / match_values narrow the records further"""
+        statement = cls._select_nearest(
+            lat, lon, radius, fields, match_values, limit, cursor
         )
-        if result:
-            return [cls.model_validate(r, from_attributes=True) for r in result]
-        if error_not_exist:
-            raise Exception(f"Could not find a record in {schema_cls.__name__}")
-        return None
+        results = db.execute(statement).all()
+        return cls._to_distance_records(results, error_not_exist)
 
     @classmethod
     def get_by_field_unique(
         cls, db: Session, field: str, match_value: Any, error_not_exist: bool = False
     ) -> DBSchemaBase | None:
         """generic function to extract a single record which matches given column and value condition"""
-        schema_cls = cls._schema_cls()
-        result = (
-            db.query(schema_cls)
-            .filter(and_(getattr(schema_cls, field) == match_value))
-            .first()
-        )
-        if result:
-            return cls.model_validate(result, from_attributes=True)
-        if error_not_exist:
-            raise Exception(
-                f"Could not find a record in {schema_cls.__name__} with {field} {match_value}"
-            )
-        return None
+        statement = cls._select_by_fields([field], [match_value]).limit(1)
+        result = db.execute(statement).scalars().first()
+        return cls._to_record(result, error_not_exist, f"with {field} {match_value}")
 
     @classmethod
     def get_by_multiple_field_unique(
@@ -193,23 +554,9 @@ class DBSchemaBase(BaseModel, ABC):
         match_values: list[Any],
         error_not_exist: bool = False,
     ) -> DBSchemaBase | None:
-        schema_cls = cls._schema_cls()
-        result = (
-            db.query(schema_cls)
-            .filter(
-                and_(
-                    *(getattr(schema_cls, f) == v for f, v in zip(fields, match_values))
-                )
-            )
-            .first()
-        )
-        if result:
-            return cls.model_validate(result, from_attributes=True)
-        if error_not_exist:
-            raise Exception(
-                f"Could not find a record in {schema_cls.__name__} with {fields} {match_values}"
-            )
-        return None
+        statement = cls._select_by_fields(fields, match_values).limit(1)
+        result = db.execute(statement).scalars().first()
+        return cls._to_record(result, error_not_exist, f"with {fields} {match_values}")
 
     @classmethod
     def get_by_multiple_field_multiple(
@@ -218,43 +565,39 @@ class DBSchemaBase(BaseModel, ABC):
         fields: list[str],
         match_values: list[Any],
         error_not_exist: bool = False,
-    ) -> list[DBSchemaBase] | None:
-        schema_cls = cls._schema_cls()
-        result = (
-            db.query(schema_cls)
-            .filter(
-                and_(
-                    *(getattr(schema_cls, f) == v for f, v in zip(fields, match_values))
-                )
-            )
-            .all()
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> list[DBSchemaBase] | list[Row] | None:
+        statement = cls._paginate(
+            cls._select_by_fields(fields, match_values), limit, cursor
+        )
+        statement = cls._project(statement, columns)
+        results = cls._rows(db.execute(statement), columns)
+        return cls._to_records(
+            results, error_not_exist, f"with {fields} {match_values}", columns=columns
         )
-        if result:
-            return [cls.model_validate(r, from_attributes=True) for r in result]
-        if error_not_exist:
-            raise Exception(
-                f"Could not find a record in {schema_cls.__name__} with {fields} {match_values}"
-            )
-        return None
 
     @classmethod
     def get_by_field_multiple(
-        cls, db: Session, field: str, match_value: Any, error_not_exist: bool = False
-    ) -> list[DBSchemaBase] | None:
+        cls,
+        db: Session,
+        field: str,
+        match_value: Any,
+        error_not_exist: bool = False,
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> list[DBSchemaBase] | list[Row] | None:
         """generic function to extract a single record which matches given column and value condition"""
-        schema_cls = cls._schema_cls()
-        result = (
-            db.query(schema_cls)
-            .filter(and_(getattr(schema_cls, field) == match_value))
-            .all()
+        statement = cls._paginate(
+            cls._select_by_fields([field], [match_value]), limit, cursor
+        )
+        statement = cls._project(statement, columns)
+        results = cls._rows(db.execute(statement), columns)
+        return cls._to_records(
+            results, error_not_exist, f"with {field} {match_value}", columns=columns
         )
-        if result:
-            return [cls.model_validate(r, from_attributes=True) for r in result]
-        if error_not_exist:
-            raise Exception(
-                f"Could not find a record in {schema_cls.__name__} with {field} {match_value}"
-            )
-        return None
 
     @classmethod
     def get_by_time_field_multiple(
@@ -266,25 +609,22 @@ class DBSchemaBase(BaseModel, ABC):
         field: str,
         match_value: Any,
         error_not_exist: bool = False,
-    ) -> list[DBSchemaBase] | None:
-        schema_cls = cls._schema_cls()
-        result = (
-            db.query(schema_cls)
-            .filter(
-                and_(
-                    getattr(schema_cls, field) == match_value,
-                    getattr(schema_cls, time_field).between(start_time, end_time),
-                )
-            )
-            .all()
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> list[DBSchemaBase] | list[Row] | None:
+        statement = cls._paginate(
+            cls._select_by_time_field(
+                time_field, start_time, end_time, field, match_value
+            ),
+            limit,
+            cursor,
+        )
+        statement = cls._project(statement, columns)
+        results = cls._rows(db.execute(statement), columns)
+        return cls._to_records(
+            results, error_not_exist, f"with {field} {match_value}", columns=columns
         )
-        if result:
-            return [cls.model_validate(r, from_attributes=True) for r in result]
-        if error_not_exist:
-            raise Exception(
-                f"Could not find a record in {schema_cls.__name__} with {field} {match_value}"
-            )
-        return None
 
     @classmethod
     def get_by_field_value_list(
@@ -293,39 +633,83 @@ class DBSchemaBase(BaseModel, ABC):
         field: str,
         match_values: list[Any],
         error_not_exist: bool = False,
-    ) -> list[DBSchemaBase] | None:
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> list[DBSchemaBase] | list[Row] | None:
         """generic function to extract a single record which matches given column and value condition"""
-        schema_cls = cls._schema_cls()
-        result = (
-            db.query(schema_cls)
-            .filter(getattr(schema_cls, field).in_(match_values))
-            .all()
+        statement = cls._paginate(
+            cls._select_by_field_value_list(field, match_values), limit, cursor
+        )
+        statement = cls._project(statement, columns)
+        results = cls._rows(db.execute(statement), columns)
+        return cls._to_records(
+            results,
+            error_not_exist,
+            f"with {field} being one of {match_values}",
+            columns=columns,
         )
-        if result:
-            return [cls.model_validate(r, from_attributes=True) for r in result]
-        if error_not_exist:
-            raise Exception(
-                f"Could not find a record in {schema_cls.__name__} with {field} being one of {match_values}"
-            )
-        return None
 
     @classmethod
-    def update_by_id(cls, db: Session, id: UUID, new_data: DBSchemaBase):
-        # Retrieve the item by ID
-        schema_cls = cls._schema_cls()
-        new_data.last_modified_at = get_current_time()
+    def _stream(
+        cls, db: Session, statement, columns: list[str] | None, yield_per: int
+    ) -> Iterator[DBSchemaBase | Row]:
+        statement = cls._project(statement, columns)
+        result = db.execute(statement.execution_options(yield_per=yield_per))
+        if columns:
+            yield from result
+        else:
+            for po in result.scalars():
+                yield cls._from_row(po)
 
-        update_data = {
-            key: value
-            for key, value in new_data.model_dump().items()
-            if key not in cls._fixed_fields()
-        }
-        db.query(schema_cls).filter(cls._schema_cls().id == id).update(update_data)
+    @classmethod
+    def stream_by_time_field_multiple(
+        cls,
+        db: Session,
+        time_field: str,
+        start_time: datetime,
+        end_time: datetime,
+        field: str,
+        match_value: Any,
+        columns: list[str] | None = None,
+        yield_per: int = STREAM_BATCH_SIZE,
+    ) -> Iterator[DBSchemaBase | Row]:
+        """get_by_time_field_multiple read through a server-side cursor, yield_per
+        rows at a time, in (created_at, id) order"""
+        statement = cls._select_by_time_field(
+            time_field, start_time, end_time, field, match_value
+        ).order_by(cls.get_field("created_at"), cls.get_field("id"))
+        yield from cls._stream(db, statement, columns, yield_per)
 
     @classmethod
-    def get_field(cls, field):
-        schema_cls = cls._schema_cls()
-        return getattr(schema_cls, field)
+    def stream_by_field_value_list(
+        cls,
+        db: Session,
+        field: str,
+        match_values: list[Any],
+        columns: list[str] | None = None,
+        yield_per: int = STREAM_BATCH_SIZE,
+    ) -> Iterator[DBSchemaBase | Row]:
+        statement = cls._select_by_field_value_list(field, match_values)
+        yield from cls._stream(db, statement, columns, yield_per)
+
+    @classmethod
+    def update_by_id(cls, db: Session, id: UUID, new_data: DBSchemaBase):
+        db.execute(cls._update_id(id, new_data))
+
+    @classmethod
+    def update_by_multiple_field(
+        cls,
+        db: Session,
+        fields: list[str],
+        match_values: list[Any],
+        new_values: dict[str, Any],
+    ) -> list[DBSchemaBase] | None:
+        """compare-and-set: writes only new_values, only on records that still match
+        the fields/match_values condition, and returns the updated records"""
+        statement = cls._update_by_fields(fields, match_values, new_values)
+        results = db.execute(statement).scalars().all()
+        return cls._to_records(results, False)
 
     @classmethod
     def get_latest_record(
@@ -337,23 +721,298 @@ class DBSchemaBase(BaseModel, ABC):
         error_not_exist: bool = False,
     ) -> DBSchemaBase | None:
         """generic function to extract a single record which matches given column and value condition"""
-        schema_cls = cls._schema_cls()
-        model_column = cls.get_field(model_field)
-        result = (
-            db.query(schema_cls)
-            .filter(and_(getattr(schema_cls, field) == match_value))
-            .order_by(model_column.desc())
-            .first()
-        )
-        if result:
-            return cls.model_validate(result, from_attributes=True)
-        if error_not_exist:
-            raise Exception(
-                f"Could not find a record in {schema_cls.__name__} with {field} {match_value}"
-            )
-        return None
+        statement = cls._select_latest(field, match_value, model_field)
+        result = db.execute(statement).scalars().first()
+        return cls._to_record(result, error_not_exist, f"with {field} {match_value}")
 
     @classmethod
     def delete_by_id(cls, db: Session, id: UUID):
-        schema_cls = cls._schema_cls()
-        db.query(schema_cls).filter(cls._schema_cls().id == id).delete()
+        db.execute(cls._delete_id(id))
+
+    # async API, used through CockroachDBClient.aquery
+
+    @classmethod
+    async def aadd(cls, db: AsyncSession, items: List[DBSchemaBase]):
+        # executed as statements rather than through session.add + flush: a failed
+        # flush rolls back the whole session transaction, which would break the
+        # savepoint retry in CockroachDBClient.run_transaction. it also surfaces
+        # constraint violations at the call site, not when the unit of work commits
+        await cls.aadd_bulk(db, items)
+
+    @classmethod
+    async def aadd_bulk(
+        cls,
+        db: AsyncSession,
+        items: List[DBSchemaBase],
+        batch_size: int = BULK_INSERT_BATCH_SIZE,
+        return_ids: bool = False,
+    ) -> List[uuid.UUID] | None:
+        """insert items with one multi-row INSERT per batch instead of one per row"""
+        ids = []
+        for statement in cls._insert_batches(items, batch_size, return_ids):
+            result = await db.execute(statement)
+            if return_ids:
+                ids.extend(result.scalars().all())
+        return ids if return_ids else None
+
+    @classmethod
+    async def aupsert(
+        cls,
+        db: AsyncSession,
+        items: List[DBSchemaBase],
+        conflict_fields: List[str] | None = None,
+        update_fields: List[str] | None = None,
+        batch_size: int = BULK_INSERT_BATCH_SIZE,
+        if_newer: str | None = None,
+    ) -> List[DBSchemaBase] | None:
+        results = []
+        for statement in cls._upsert_batches(
+            items, conflict_fields, update_fields, batch_size, if_newer
+        ):
+            results.extend((await db.execute(statement)).all())
+        return cls._to_records(results, False)
+
+    @classmethod
+    async def aget_all(
+        cls,
+        db: AsyncSession,
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> List[DBSchemaBase] | List[Row] | None:
+        statement = cls._paginate(select(cls._schema_cls()), limit, cursor)
+        statement = cls._project(statement, columns)
+        results = cls._rows(await db.execute(statement), columns)
+        if columns:
+            return list(results)
+        return [cls._from_row(po) for po in results]
+
+    @classmethod
+    async def aget_id(
+        cls, db: AsyncSession, id: UUID, error_not_exist: bool = True
+    ) -> DBSchemaBase | None:
+        result = (await db.execute(cls._select_id(id))).scalars().first()
+        return cls._to_record(result, error_not_exist, f"with id {id}")
+
+    @classmethod
+    async def aget_multiple_in_radius(
+        cls,
+        db: AsyncSession,
+        lat: float,
+        lon: float,
+        radius: float,
+        error_not_exist: bool = False,
+    ) -> List[DBSchemaBase] | None:
+        statement = cls._select_in_radius(lat, lon, radius)
+        results = (await db.execute(statement)).scalars().all()
+        return cls._to_records(results, error_not_exist)
+
+    @classmethod
+    async def aget_nearest_in_radius(
+        cls,
+        db: AsyncSession,
+        lat: float,
+        lon: float,
+        radius: float,
+        limit: int,
+        fields: list[str] | None = None,
+        match_values: list[Any] | None = None,
+        cursor: str | None = None,
+        error_not_exist: bool = False,
+    ) -> list[tuple[DBSchemaBase, float]] | None:
+        statement = cls._select_nearest(
+            lat, lon, radius, fields, match_values, limit, cursor
+        )
+        results = (await db.execute(statement)).all()
+        return cls._to_distance_records(results, error_not_exist)
+
+    @classmethod
+    async def aget_by_field_unique(
+        cls,
+        db: AsyncSession,
+        field: str,
+        match_value: Any,
+        error_not_exist: bool = False,
+    ) -> DBSchemaBase | None:
+        statement = cls._select_by_fields([field], [match_value]).limit(1)
+        result = (await db.execute(statement)).scalars().first()
+        return cls._to_record(result, error_not_exist, f"with {field} {match_value}")
+
+    @classmethod
+    async def aget_by_multiple_field_unique(
+        cls,
+        db: AsyncSession,
+        fields: list[str],
+        match_values: list[Any],
+        error_not_exist: bool = False,
+    ) -> DBSchemaBase | None:
+        statement = cls._select_by_fields(fields, match_values).limit(1)
+        result = (await db.execute(statement)).scalars().first()
+        return cls._to_record(result, error_not_exist, f"with {fields} {match_values}")
+
+    @classmethod
+    async def aget_by_multiple_field_multiple(
+        cls,
+        db: AsyncSession,
+        fields: list[str],
+        match_values: list[Any],
+        error_not_exist: bool = False,
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> list[DBSchemaBase] | list[Row] | None:
+        statement = cls._paginate(
+            cls._select_by_fields(fields, match_values), limit, cursor
+        )
+        statement = cls._project(statement, columns)
+        results = cls._rows(await db.execute(statement), columns)
+        return cls._to_records(
+            results, error_not_exist, f"with {fields} {match_values}", columns=columns
+        )
+
+    @classmethod
+    async def aget_by_field_multiple(
+        cls,
+        db: AsyncSession,
+        field: str,
+        match_value: Any,
+        error_not_exist: bool = False,
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> list[DBSchemaBase] | list[Row] | None:
+        statement = cls._paginate(
+            cls._select_by_fields([field], [match_value]), limit, cursor
+        )
+        statement = cls._project(statement, columns)
+        results = cls._rows(await db.execute(statement), columns)
+        return cls._to_records(
+            results, error_not_exist, f"with {field} {match_value}", columns=columns
+        )
+
+    @classmethod
+    async def aget_by_time_field_multiple(
+        cls,
+        db: AsyncSession,
+        time_field: str,
+        start_time: datetime,
+        end_time: datetime,
+        field: str,
+        match_value: Any,
+        error_not_exist: bool = False,
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> list[DBSchemaBase] | list[Row] | None:
+        statement = cls._paginate(
+            cls._select_by_time_field(
+                time_field, start_time, end_time, field, match_value
+            ),
+            limit,
+            cursor,
+        )
+        statement = cls._project(statement, columns)
+        results = cls._rows(await db.execute(statement), columns)
+        return cls._to_records(
+            results, error_not_exist, f"with {field} {match_value}", columns=columns
+        )
+
+    @classmethod
+    async def aget_by_field_value_list(
+        cls,
+        db: AsyncSession,
+        field: str,
+        match_values: list[Any],
+        error_not_exist: bool = False,
+        limit: int | None = None,
+        cursor: str | None = None,
+        columns: list[str] | None = None,
+    ) -> list[DBSchemaBase] | list[Row] | None:
+        statement = cls._paginate(
+            cls._select_by_field_value_list(field, match_values), limit, cursor
+        )
+        statement = cls._project(statement, columns)
+        results = cls._rows(await db.execute(statement), columns)
+        return cls._to_records(
+            results,
+            error_not_exist,
+            f"with {field} being one of {match_values}",
+            columns=columns,
+        )
+
+    @classmethod
+    async def _astream(
+        cls, db: AsyncSession, statement, columns: list[str] | None, yield_per: int
+    ) -> AsyncIterator[DBSchemaBase | Row]:
+        statement = cls._project(statement, columns)
+        result = await db.stream(statement.execution_options(yield_per=yield_per))
+        if columns:
+            async for row in result:
+                yield row
+        else:
+            async for po in result.scalars():
+                yield cls._from_row(po)
+
+    @classmethod
+    async def astream_by_time_field_multiple(
+        cls,
+        db: AsyncSession,
+        time_field: str,
+        start_time: datetime,
+        end_time: datetime,
+        field: str,
+        match_value: Any,
+        columns: list[str] | None = None,
+        yield_per: int = STREAM_BATCH_SIZE,
+    ) -> AsyncIterator[DBSchemaBase | Row]:
+        statement = cls._select_by_time_field(
+            time_field, start_time, end_time, field, match_value
+        ).order_by(cls.get_field("created_at"), cls.get_field("id"))
+        async for item in cls._astream(db, statement, columns, yield_per):
+            yield item
+
+    @classmethod
+    async def astream_by_field_value_list(
+        cls,
+        db: AsyncSession,
+        field: str,
+        match_values: list[Any],
+        columns: list[str] | None = None,
+        yield_per: int = STREAM_BATCH_SIZE,
+    ) -> AsyncIterator[DBSchemaBase | Row]:
+        statement = cls._select_by_field_value_list(field, match_values)
+        async for item in cls._astream(db, statement, columns, yield_per):
+            yield item
+
+    @classmethod
+    async def aupdate_by_id(cls, db: AsyncSession, id: UUID, new_data: DBSchemaBase):
+        await db.execute(cls._update_id(id, new_data))
+
+    @classmethod
+    async def aupdate_by_multiple_field(
+        cls,
+        db: AsyncSession,
+        fields: list[str],
+        match_values: list[Any],
+        new_values: dict[str, Any],
+    ) -> list[DBSchemaBase] | None:
+        statement = cls._update_by_fields(fields, match_values, new_values)
+        results = (await db.execute(statement)).scalars().all()
+        return cls._to_records(results, False)
+
+    @classmethod
+    async def aget_latest_record(
+        cls,
+        db: AsyncSession,
+        field: str,
+        match_value: Any,
+        model_field: Any,
+        error_not_exist: bool = False,
+    ) -> DBSchemaBase | None:
+        statement = cls._select_latest(field, match_value, model_field)
+        result = (await db.execute(statement)).scalars().first()
+        return cls._to_record(result, error_not_exist, f"with {field} {match_value}")
+
+    @classmethod
+    async def adelete_by_id(cls, db: AsyncSession, id: UUID):
+        await db.execute(cls._delete_id(id))
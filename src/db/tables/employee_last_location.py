@@ -0,0 +1,77 @@
+from datetime import datetime
+from typing import Type
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.db.base import Base, DBSchemaBase
+from src.db.tables.employee_mapping import EmployeeMapping
+
+
+class EmployeeLastLocation(DBSchemaBase):
+    # newest ping of each employee, kept current by EmployeeLocation.arecord
+    employee_id: UUID
+    location_lat: float
+    location_long: float
+    located_at: datetime
+
+    @classmethod
+    def _schema_cls(cls) -> Type[Base]:
+        return _EmployeeLastLocation
+
+    @classmethod
+    async def aupsert_latest(cls, db: AsyncSession, locations: list) -> None:
+        """moves the last location of each employee in locations (EmployeeLocation
+        records) forward to their newest one; older points change nothing"""
+        latest = {}
+        for location in locations:
+            current = latest.get(location.employee_id)
+            if current is None or current.created_at < location.created_at:
+                latest[location.employee_id] = location
+        await cls.aupsert(
+            db,
+            # a fixed row order keeps concurrent upserts from deadlocking
+            items=[
+                cls(
+                    employee_id=location.employee_id,
+                    location_lat=location.location_lat,
+                    location_long=location.location_long,
+                    located_at=location.created_at,
+                )
+                for _, location in sorted(latest.items())
+            ],
+            conflict_fields=["employee_id"],
+            update_fields=["location_lat", "location_long", "located_at"],
+            if_newer="located_at",
+        )
+
+    @classmethod
+    def _select_of_employer(cls, employer_id: UUID, columns: list[str]):
+        # last locations of the employer's current (not deleted) employees
+        mapping = EmployeeMapping._schema_cls()
+        return (
+            select(*(cls.get_field(c) for c in columns))
+            .join(mapping, mapping.employee_id == cls.get_field("employee_id"))
+            .where(mapping.employer_id == employer_id, mapping.deleted.is_(None))
+        )
+
+    @classmethod
+    def get_of_employer(
+        cls, db: Session, employer_id: UUID, columns: list[str]
+    ) -> list[Row]:
+        return list(db.execute(cls._select_of_employer(employer_id, columns)).all())
+
+    @classmethod
+    async def aget_of_employer(
+        cls, db: AsyncSession, employer_id: UUID, columns: list[str]
+    ) -> list[Row]:
+        result = await db.execute(cls._select_of_employer(employer_id, columns))
+        return list(result.all())
+
+
+_EmployeeLastLocation = Base.from_schema_base(
+    EmployeeLastLocation, "employee_last_location"
+)
@@ -1,7 +1,13 @@
+from __future__ import annotations
+
 from typing import Type
 from uuid import UUID
 
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from src.db.base import Base, DBSchemaBase
+from src.db.tables.employee_last_location import EmployeeLastLocation
 
 
 class EmployeeLocation(DBSchemaBase):
@@ -13,5 +19,28 @@ class EmployeeLocation(DBSchemaBase):
     def _schema_cls(cls) -> Type[Base]:
         return _EmployeeLocation
 
+    @classmethod
+    async def arecord(cls, db: AsyncSession, items: list[EmployeeLocation]):
+        """adds location pings and moves each employee's last location forward"""
+        await cls.aadd_bulk(db, items)
+        await EmployeeLastLocation.aupsert_latest(db, items)
+
+    @classmethod
+    async def amaintain(
+        cls, db: AsyncSession, retention_days: int, ahead_days: int
+    ) -> int:
+        """creates the daily partitions ahead, rolls the days past retention up
+        into EmployeeLocationHourly and drops them; the number of days dropped.
+        see employee_location_maintain in V3.3__partition_employee_location.sql
+        """
+        result = await db.execute(
+            text(
+                "SELECT employee_location_maintain("
+                "make_interval(days => :retention_days), :ahead_days)"
+            ),
+            {"retention_days": retention_days, "ahead_days": ahead_days},
+        )
+        return result.scalar()
+
 
 _EmployeeLocation = Base.from_schema_base(EmployeeLocation, "employee_location")
@@ -0,0 +1,22 @@
+from typing import Type
+from uuid import UUID
+
+from src.db.base import Base, DBSchemaBase
+
+
+class EmployeeLocationHourly(DBSchemaBase):
+    # mean position of an employee's pings in the hour starting at created_at,
+    # written by employee_location_maintain for days past the raw retention
+    employee_id: UUID
+    location_lat: float
+    location_long: float
+    point_count: int
+
+    @classmethod
+    def _schema_cls(cls) -> Type[Base]:
+        return _EmployeeLocationHourly
+
+
+_EmployeeLocationHourly = Base.from_schema_base(
+    EmployeeLocationHourly, "employee_location_hourly"
+)
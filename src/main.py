@@ -1,13 +1,45 @@
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.routers.employee import employee_router
 from src.routers.employer import employer_router
+from src.routers.ops import ops_router
 from src.routers.user import user_router
-
-app = FastAPI(title="Google Solution Challenge Backend", version="0.2.0-dev12")
+from src.utils.client import (
+    getCockroachClient,
+    getJobIndex,
+    getLocationBuffer,
+    getLocationHub,
+    getLocationRetention,
+)
+from src.utils.request_stats import RequestStatsMiddleware
+from src.utils.response_encoding import ResponseEncodingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_index = getJobIndex()
+    location_buffer = getLocationBuffer()
+    location_retention = getLocationRetention()
+    await job_index.start(getCockroachClient())
+    await location_buffer.start(getCockroachClient())
+    await location_retention.start(getCockroachClient())
+    yield
+    await getLocationHub().stop()
+    await location_retention.stop()
+    # queued pings are written before the client goes away
+    await location_buffer.stop()
+    await job_index.stop()
+
+
+app = FastAPI(
+    title="Google Solution Challenge Backend",
+    version="0.2.0-dev12",
+    lifespan=lifespan,
+)
 
 origins = os.environ["CORS_ORIGINS"].split(",")
 
@@ -39,6 +71,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ResponseEncodingMiddleware)
+# added last so it wraps everything else, including CORS preflights
+app.add_middleware(RequestStatsMiddleware)
 
 
 """@app.middleware("http")
@@ -56,6 +91,7 @@ async def error_middleware(request: Request, call_next):
 app.include_router(user_router)
 app.include_router(employee_router)
 app.include_router(employer_router)
+app.include_router(ops_router)
 
 
 if __name__ == "__main__":
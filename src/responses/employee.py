@@ -3,6 +3,7 @@ from uuid import UUID
 
 from pydantic import BaseModel
 
+from src.responses.util import Location
 from src.utils.enums import EmployeeStatus
 
 
@@ -14,3 +15,8 @@ class EmployeeResponse(BaseModel):
     status: EmployeeStatus
     email: str
     join_date: datetime
+
+
+class EmployeeLocationResponse(Location):
+    # last known location, created_at is when it was taken
+    employee_id: UUID
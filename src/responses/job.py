@@ -1,9 +1,14 @@
 from datetime import datetime
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from src.responses.util import Location
+from src.utils.pagination import MAX_PAGE_SIZE
+
+DEFAULT_SEARCH_RADIUS = 25000
+MAX_SEARCH_RADIUS = 100000
+DEFAULT_SEARCH_LIMIT = 100
 
 
 class JobCreateRequest(BaseModel):
@@ -14,6 +19,14 @@ class JobCreateRequest(BaseModel):
     amount: int
 
 
+class JobSearchRequest(Location):
+    # meters around the location; results are the closest open jobs first, the
+    # next page starts after the cursor in the X-Next-Cursor header
+    radius: float = Field(DEFAULT_SEARCH_RADIUS, gt=0, le=MAX_SEARCH_RADIUS)
+    limit: int = Field(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_PAGE_SIZE)
+    cursor: str | None = None
+
+
 class JobResponse(BaseModel):
     id: UUID
     created_at: datetime
@@ -24,3 +37,5 @@ class JobResponse(BaseModel):
     done: datetime | None = None
     amount: int
     deleted: datetime | None = None
+    # meters from the searched location, only set by job search
+    distance: float | None = None
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class PoolStatus(BaseModel):
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    max_overflow: int
+    checkout_count: int
+    checkout_wait_avg_ms: float
+    checkout_wait_max_ms: float
+
+
+class SlowQuery(BaseModel):
+    sql: str
+    param_types: list[str]
+    duration_ms: float
+    recorded_at: datetime
+    plan: str | None = None
@@ -1,15 +1,47 @@
 from datetime import datetime
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from src.utils.pagination import MAX_PAGE_SIZE
 
 
 class DurationRequest(BaseModel):
     start_time: datetime
     end_time: datetime
+    # pages are ordered by (created_at, id), the next page starts after the
+    # cursor returned in the X-Next-Cursor header of this one. streaming
+    # endpoints send the whole duration when neither is given
+    limit: int | None = Field(None, ge=1, le=MAX_PAGE_SIZE)
+    cursor: str | None = None
+
+    @property
+    def paginated(self) -> bool:
+        return self.limit is not None or self.cursor is not None
+
+    @property
+    def page_size(self) -> int:
+        return self.limit or MAX_PAGE_SIZE
 
 
 class Location(BaseModel):
     location_lat: float
     location_long: float
     created_at: datetime | None = None
+
+
+class LocationPathRequest(DurationRequest):
+    # optional simplification of the path: averaged into buckets of
+    # bucket_seconds (bucket_path), then simplify_path. a paginated request
+    # gets each page simplified, otherwise the whole duration is
+    tolerance_meters: float | None = Field(None, gt=0)
+    max_points: int | None = Field(None, ge=2)
+    bucket_seconds: float | None = Field(None, gt=0)
+
+    @property
+    def simplified(self) -> bool:
+        return (
+            self.tolerance_meters is not None
+            or self.max_points is not None
+            or self.bucket_seconds is not None
+        )
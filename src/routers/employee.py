@@ -1,29 +1,46 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from starlette import status
 from starlette.responses import Response
 
 from src.auth import relation, user_auth
 from src.auth.relation import VerifiedEmployee
 from src.auth.user_auth import VerifiedTask, VerifiedUser
-from src.client.cockroach import CockroachDBClient
+from src.client.cockroach import CockroachDBSession
 from src.responses.employee import EmployeeResponse
-from src.responses.job import JobResponse
+from src.responses.job import JobResponse, JobSearchRequest
 from src.responses.task import TaskResponse
 from src.responses.user import UserResponse
 from src.responses.util import DurationRequest, Location
 from src.services.employee import EmployeeService
-from src.utils.client import getCockroachClient
+from src.utils.client import (
+    getCockroachSession,
+    getJobIndex,
+    getLocationBuffer,
+    getLocationHub,
+)
+from src.utils.job_index import JobIndex
+from src.utils.location_hub import LocationHub
+from src.utils.location_payload import decode_locations
+from src.utils.pagination import next_cursor_headers
+from src.utils.response import EncodedResponse, ModelResponse
+from src.utils.route import TransactionRoute
+from src.utils.write_behind import LocationBuffer
 
 EMPLOYEE_PREFIX = "/employee"
-employee_router = APIRouter(prefix=EMPLOYEE_PREFIX)
+employee_router = APIRouter(
+    prefix=EMPLOYEE_PREFIX,
+    route_class=TransactionRoute,
+    default_response_class=EncodedResponse,
+)
 ENDPOINT_GET_TASKS = "/{employee_id}/get-tasks/"  # done | integrated
 ENDPOINT_GET_TASK = "/{task_id}/get-task/"  # done | integrated
 ENDPOINT_GET_JOB_DETAIL = "/{job_id}/get-job-detail/"  # done | integrated
 ENDPOINT_COMPLETE_TASK = "/{task_id}/complete-task/"  # done | integrated
 ENDPOINT_GET_EMPLOYER = "/get-employer/"  # done | integrated
 ENDPOINT_ADD_LOCATION = "/add-location/"  # done | integrated
+ENDPOINT_ADD_LOCATIONS = "/add-locations/"
 ENDPOINT_FIND_JOBS = "/find-jobs/"  # done | integrated
 ENDPOINT_LEAVE_JOB = "/leave-job/"  # done | integrated
 ENDPOINT_APPROVE_PAYMENT = "/{payment_id}/approve-payment/"  # done | integrated
@@ -33,12 +50,13 @@ ENDPOINT_GET_EMPLOYEE_JOB = "/get-employee-job/"  # done
 @employee_router.post(ENDPOINT_GET_TASKS, response_model=list[TaskResponse])
 async def get_tasks(
     request: DurationRequest,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_employee: VerifiedEmployee = Depends(relation.verify_employee_s_employer),
 ):
-    return EmployeeService.fetch_tasks(
-        verified_employee.employee, cockroach_client, request
+    tasks, cursor = await EmployeeService.fetch_tasks(
+        verified_employee.employee, cockroach_session, request
     )
+    return ModelResponse(tasks, headers=next_cursor_headers(cursor))
 
 
 @employee_router.get(ENDPOINT_GET_TASK, response_model=TaskResponse)
@@ -51,10 +69,10 @@ async def get_task(
 @employee_router.get(ENDPOINT_LEAVE_JOB)
 async def get_leave_job(
     verified_user: VerifiedUser = Depends(user_auth.verify_employee),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    EmployeeService.leave_job(
-        cockroach_client=cockroach_client, user=verified_user.requesting_user
+    await EmployeeService.leave_job(
+        cockroach_session=cockroach_session, user=verified_user.requesting_user
     )
     return Response(status_code=status.HTTP_200_OK)
 
@@ -62,9 +80,9 @@ async def get_leave_job(
 @employee_router.get(ENDPOINT_COMPLETE_TASK)
 async def get_complete_task(
     verified_task: VerifiedTask = Depends(user_auth.verify_task),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    EmployeeService.complete_task(verified_task.task, cockroach_client)
+    await EmployeeService.complete_task(verified_task.task, cockroach_session)
     return Response(status_code=status.HTTP_200_OK)
 
 
@@ -72,12 +90,37 @@ async def get_complete_task(
 async def post_add_location(
     location: Location,
     verified_user: VerifiedUser = Depends(user_auth.verify_employee),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
+    location_buffer: LocationBuffer = Depends(getLocationBuffer),
+    location_hub: LocationHub = Depends(getLocationHub),
 ):
-    EmployeeService.add_location(
+    await EmployeeService.add_location(
         location=location,
         user=verified_user.requesting_user,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
+        location_buffer=location_buffer,
+        location_hub=location_hub,
+    )
+    return Response(status_code=status.HTTP_200_OK)
+
+
+@employee_router.post(ENDPOINT_ADD_LOCATIONS)
+async def post_add_locations(
+    request: Request,
+    verified_user: VerifiedUser = Depends(user_auth.verify_employee),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
+    location_hub: LocationHub = Depends(getLocationHub),
+):
+    """a batch of timestamped points in one request, see decode_locations for
+    the accepted bodies"""
+    locations = decode_locations(
+        await request.body(), request.headers.get("content-type")
+    )
+    await EmployeeService.add_locations(
+        locations=locations,
+        user=verified_user.requesting_user,
+        cockroach_session=cockroach_session,
+        location_hub=location_hub,
     )
     return Response(status_code=status.HTTP_200_OK)
 
@@ -88,10 +131,14 @@ async def post_add_location(
     dependencies=[Depends(user_auth.verify_employee)],
 )
 async def post_get_jobs(
-    request: Location,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    request: JobSearchRequest,
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
+    job_index: JobIndex = Depends(getJobIndex),
 ):
-    return EmployeeService.get_jobs(cockroach_client=cockroach_client, request=request)
+    jobs, cursor = await EmployeeService.get_jobs(
+        cockroach_session=cockroach_session, request=request, job_index=job_index
+    )
+    return ModelResponse(jobs, headers=next_cursor_headers(cursor))
 
 
 @employee_router.get(
@@ -101,21 +148,23 @@ async def post_get_jobs(
 )
 async def get_job_detail(
     job_id: UUID,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    return EmployeeService.fetch_job(cockroach_client=cockroach_client, job_id=job_id)
+    return await EmployeeService.fetch_job(
+        cockroach_session=cockroach_session, job_id=job_id
+    )
 
 
 @employee_router.get(ENDPOINT_APPROVE_PAYMENT)
 async def get_approve_payment(
     payment_id: UUID,
     verified_user: VerifiedUser = Depends(user_auth.verify_employee),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    EmployeeService.approve_payment(
+    await EmployeeService.approve_payment(
         payment_id=payment_id,
         user=verified_user.requesting_user,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
     )
     return Response(status_code=status.HTTP_200_OK)
 
@@ -123,18 +172,18 @@ async def get_approve_payment(
 @employee_router.get(ENDPOINT_GET_EMPLOYER, response_model=UserResponse)
 async def get_employer(
     verified_user: VerifiedUser = Depends(user_auth.verify_employee),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    return EmployeeService.fetch_employer(
-        cockroach_client=cockroach_client, user=verified_user.requesting_user
+    return await EmployeeService.fetch_employer(
+        cockroach_session=cockroach_session, user=verified_user.requesting_user
     )
 
 
 @employee_router.get(ENDPOINT_GET_EMPLOYEE_JOB, response_model=EmployeeResponse)
 async def get_employee_job(
     verified_user: VerifiedUser = Depends(user_auth.verify_employee),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    return EmployeeService.fetch_employee_job(
-        cockroach_client=cockroach_client, user=verified_user.requesting_user
+    return await EmployeeService.fetch_employee_job(
+        cockroach_session=cockroach_session, user=verified_user.requesting_user
     )
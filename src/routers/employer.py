@@ -1,27 +1,50 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from starlette import status
 from starlette.responses import Response
 
 from src.auth import relation, user_auth
 from src.auth.relation import VerifiedEmployee
 from src.auth.user_auth import VerifiedTask, VerifiedUser
-from src.client.cockroach import CockroachDBClient
-from src.responses.employee import EmployeeResponse
+from src.client.cockroach import CockroachDBSession
+from src.responses.employee import EmployeeLocationResponse, EmployeeResponse
 from src.responses.job import JobCreateRequest, JobResponse
 from src.responses.task import TaskCreateRequest
 from src.responses.user import PaymentRequest, PaymentResponse, UserResponse
-from src.responses.util import DurationRequest, Location
+from src.responses.util import Location, LocationPathRequest
 from src.services.employer import EmployerService
-from src.utils.client import getCockroachClient
+from src.utils.client import (
+    getCockroachSession,
+    getJobIndex,
+    getLocationHub,
+    getLocationRetention,
+)
+from src.utils.job_index import JobIndex
+from src.utils.location_hub import LocationHub
+from src.utils.location_payload import LocationPathResponse, compact_media_type
+from src.utils.location_retention import LocationRetention
+from src.utils.pagination import MAX_PAGE_SIZE, next_cursor_headers
+from src.utils.response import (
+    EncodedResponse,
+    EventStreamResponse,
+    ModelResponse,
+    StreamingModelResponse,
+)
+from src.utils.route import TransactionRoute
 
 EMPLOYER_PREFIX = "/employer"
-employer_router = APIRouter(prefix=EMPLOYER_PREFIX)
+employer_router = APIRouter(
+    prefix=EMPLOYER_PREFIX,
+    route_class=TransactionRoute,
+    default_response_class=EncodedResponse,
+)
 ENDPOINT_ADD_TASK = "/add-task/"  # done | integrated
 ENDPOINT_ADD_JOBS = "/add-jobs/"  # done | integrated
 ENDPOINT_GET_EMPLOYEES = "/get-employees/"  # done  | integrated
 ENDPOINT_GET_EMPLOYEE = "/{employee_id}/get-employee/"  # done | integrated
+ENDPOINT_GET_LIVE_LOCATIONS = "/get-live-locations/"
+ENDPOINT_STREAM_LOCATIONS = "/stream-locations/"
 ENDPOINT_GET_EMPLOYEE_LOCATION = (
     "/{employee_id}/get-employee-location/"  # done | integrated
 )
@@ -44,10 +67,12 @@ ENDPOINT_COMPLETE_JOB = "/{job_id}/complete-job/"  # done | integrated
 @employer_router.post(ENDPOINT_ADD_TASK)
 async def post_add_task(
     request: TaskCreateRequest,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_user: VerifiedUser = Depends(user_auth.verify_employer),
 ):
-    EmployerService.add_task(request, cockroach_client, verified_user.requesting_user)
+    await EmployerService.add_task(
+        request, cockroach_session, verified_user.requesting_user
+    )
     return Response(status_code=status.HTTP_200_OK)
 
 
@@ -55,7 +80,7 @@ async def post_add_task(
 async def get_add_employee(
     employee_id: UUID,
     title: str,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_user: VerifiedUser = Depends(user_auth.verify_employer),
 ):
     if verified_user.requesting_user.id == employee_id:
@@ -63,9 +88,9 @@ async def get_add_employee(
             status_code=status.HTTP_409_CONFLICT,
             detail="You cannot add yourself as an employee",
         )
-    EmployerService.add_employee(
+    await EmployerService.add_employee(
         employee_id=employee_id,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
         user=verified_user.requesting_user,
         title=title,
     )
@@ -75,20 +100,27 @@ async def get_add_employee(
 @employer_router.post(ENDPOINT_ADD_JOBS)
 async def post_add_job(
     request: JobCreateRequest,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
+    job_index: JobIndex = Depends(getJobIndex),
     verified_user: VerifiedUser = Depends(user_auth.verify_employer),
 ):
-    EmployerService.add_job(request, cockroach_client, verified_user.requesting_user)
+    await EmployerService.add_job(
+        request, cockroach_session, verified_user.requesting_user, job_index
+    )
     return Response(status_code=status.HTTP_200_OK)
 
 
 @employer_router.get(ENDPOINT_GET_EMPLOYEES, response_model=list[EmployeeResponse])
 async def get_employees(
+    accept: str | None = Header(None),
     verified_user: VerifiedUser = Depends(user_auth.verify_employer),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    return EmployerService.fetch_employees(
-        cockroach_client=cockroach_client, user=verified_user.requesting_user
+    return StreamingModelResponse(
+        await EmployerService.stream_employees(
+            cockroach_session=cockroach_session, user=verified_user.requesting_user
+        ),
+        accept=accept,
     )
 
 
@@ -99,10 +131,10 @@ async def get_employees(
 )
 async def get_search_employees(
     phone_no: str,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    return EmployerService.search_employee_by_phone(
-        cockroach_client=cockroach_client, phone_no=phone_no
+    return await EmployerService.search_employee_by_phone(
+        cockroach_session=cockroach_session, phone_no=phone_no
     )
 
 
@@ -113,30 +145,93 @@ async def get_search_employees(
 )
 async def get_search_employees_by_email(
     email_id: str,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    return EmployerService.search_employee_by_email(
-        cockroach_client=cockroach_client, email=email_id
+    return await EmployerService.search_employee_by_email(
+        cockroach_session=cockroach_session, email=email_id
     )
 
 
 @employer_router.post(ENDPOINT_GET_EMPLOYEE_LOCATION, response_model=list[Location])
 async def post_get_employee_location(
-    request: DurationRequest,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    request: LocationPathRequest,
+    accept: str | None = Header(None),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_employee: VerifiedEmployee = Depends(relation.verify_employee_s_employer),
+    location_retention: LocationRetention = Depends(getLocationRetention),
 ):
-    return EmployerService.fetch_location_path(
-        cockroach_client=cockroach_client,
+    """the path of the employee over the duration; a client may ask for one of
+    LocationPathResponse's compact encodings by Accept"""
+    compact = compact_media_type(accept)
+    if request.simplified and not request.paginated:
+        locations = await EmployerService.fetch_simplified_location_path(
+            cockroach_session=cockroach_session,
+            user=verified_employee.employee,
+            request=request,
+            location_retention=location_retention,
+        )
+        if compact is not None:
+            return LocationPathResponse(locations, compact)
+        return ModelResponse(locations)
+    if not request.paginated:
+        stream = await EmployerService.stream_location_path(
+            cockroach_session=cockroach_session,
+            user=verified_employee.employee,
+            request=request,
+            location_retention=location_retention,
+        )
+        if compact is not None:
+            return LocationPathResponse(stream, compact)
+        return StreamingModelResponse(stream, accept=accept)
+    locations, cursor = await EmployerService.fetch_location_path(
+        cockroach_session=cockroach_session,
         user=verified_employee.employee,
         request=request,
+        location_retention=location_retention,
+    )
+    headers = next_cursor_headers(cursor)
+    if compact is not None:
+        return LocationPathResponse(locations, compact, headers=headers)
+    return ModelResponse(locations, headers=headers)
+
+
+@employer_router.get(
+    ENDPOINT_GET_LIVE_LOCATIONS, response_model=list[EmployeeLocationResponse]
+)
+async def get_live_locations(
+    verified_user: VerifiedUser = Depends(user_auth.verify_employer),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
+):
+    """last known location of every current employee, for the live map"""
+    return ModelResponse(
+        await EmployerService.fetch_live_locations(
+            cockroach_session=cockroach_session, user=verified_user.requesting_user
+        )
+    )
+
+
+@employer_router.get(ENDPOINT_STREAM_LOCATIONS)
+async def get_stream_locations(
+    verified_user: VerifiedUser = Depends(user_auth.verify_employer),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
+    location_hub: LocationHub = Depends(getLocationHub),
+):
+    """server-sent `location` events (EmployeeLocationResponse) of the current
+    employees: their last locations first, then every new ping"""
+    return EventStreamResponse(
+        await EmployerService.stream_live_locations(
+            cockroach_session=cockroach_session,
+            user=verified_user.requesting_user,
+            location_hub=location_hub,
+        ),
+        event="location",
     )
 
 
 @employer_router.post(ENDPOINT_ADD_PAYMENT)
 async def post_add_payment(
     request: PaymentRequest,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_employee: VerifiedEmployee = Depends(relation.verify_employee_s_employer),
 ):
     if verified_employee.employer is None:
@@ -144,11 +239,11 @@ async def post_add_payment(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="You are not authorized to add payment to this employee",
         )
-    EmployerService.add_payment(
+    await EmployerService.add_payment(
         user=verified_employee.employer,
         employee_id=verified_employee.employee.id,
         request=request,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
     )
     return Response(status_code=status.HTTP_200_OK)
 
@@ -158,19 +253,21 @@ async def post_add_payment(
 )
 async def post_get_employee_payment(
     employee_id: UUID,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_user: VerifiedUser = Depends(user_auth.verify_employer),
 ):
-    return EmployerService.fetch_employee_payments(
-        cockroach_client=cockroach_client,
-        user=verified_user.requesting_user,
-        user_id=employee_id,
+    return ModelResponse(
+        await EmployerService.fetch_employee_payments(
+            cockroach_session=cockroach_session,
+            user=verified_user.requesting_user,
+            user_id=employee_id,
+        )
     )
 
 
 @employer_router.get(ENDPOINT_REMOVE_EMPLOYEE)
 async def get_remove_employee(
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_employee: VerifiedEmployee = Depends(relation.verify_employee_s_employer),
 ):
     if verified_employee.employer is None:
@@ -178,8 +275,8 @@ async def get_remove_employee(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="You are not authorized to add payment to this employee",
         )
-    EmployerService.remove_employee(
-        cockroach_client=cockroach_client,
+    await EmployerService.remove_employee(
+        cockroach_session=cockroach_session,
         user_employee=verified_employee.employee,
         user_employer=verified_employee.employer,
     )
@@ -188,24 +285,26 @@ async def get_remove_employee(
 
 @employer_router.get(ENDPOINT_GET_EMPLOYEE, response_model=EmployeeResponse)
 async def get_employee(
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_employee: VerifiedEmployee = Depends(relation.verify_employee_s_employer),
 ):
-    return EmployerService.fetch_employee(
-        cockroach_client=cockroach_client, user=verified_employee.employee
+    return await EmployerService.fetch_employee(
+        cockroach_session=cockroach_session, user=verified_employee.employee
     )
 
 
 @employer_router.get(ENDPOINT_DELETE_JOB)
 async def get_delete_job(
     job_id: UUID,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
+    job_index: JobIndex = Depends(getJobIndex),
     verified_user: VerifiedUser = Depends(user_auth.verify_employer),
 ):
-    EmployerService.delete_job(
+    await EmployerService.delete_job(
         job_id=job_id,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
         user=verified_user.requesting_user,
+        job_index=job_index,
     )
     return Response(status_code=status.HTTP_200_OK)
 
@@ -213,35 +312,43 @@ async def get_delete_job(
 @employer_router.get(ENDPOINT_COMPLETE_JOB)
 async def get_complete_job(
     job_id: UUID,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
+    job_index: JobIndex = Depends(getJobIndex),
     verified_user: VerifiedUser = Depends(user_auth.verify_employer),
 ):
-    EmployerService.complete_job(
+    await EmployerService.complete_job(
         job_id=job_id,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
         user=verified_user.requesting_user,
+        job_index=job_index,
     )
     return Response(status_code=status.HTTP_200_OK)
 
 
 @employer_router.get(ENDPOINT_GET_JOBS, response_model=list[JobResponse])
 async def get_jobs(
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_user: VerifiedUser = Depends(user_auth.verify_employer),
 ):
-    return EmployerService.get_jobs(
-        cockroach_client=cockroach_client, user=verified_user.requesting_user
+    jobs, next_cursor = await EmployerService.get_jobs(
+        cockroach_session=cockroach_session,
+        user=verified_user.requesting_user,
+        limit=limit,
+        cursor=cursor,
     )
+    return ModelResponse(jobs, headers=next_cursor_headers(next_cursor))
 
 
 @employer_router.get(ENDPOINT_DELETE_TASK)
 async def get_delete_task(
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_task: VerifiedTask = Depends(user_auth.verify_task),
 ):
-    EmployerService.delete_task(
+    await EmployerService.delete_task(
         task=verified_task.task,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
         user=verified_task.requesting_user,
     )
     return Response(status_code=status.HTTP_200_OK)
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends
+from starlette.responses import PlainTextResponse
+
+from src.auth.ops import verify_ops
+from src.client.cockroach import CockroachDBClient
+from src.responses.ops import PoolStatus, SlowQuery
+from src.utils.client import (
+    getCockroachClient,
+    getJobIndex,
+    getLocationBuffer,
+    getLocationHub,
+    getLocationRetention,
+)
+from src.utils.job_index import JobIndex
+from src.utils.location_hub import LocationHub
+from src.utils.location_retention import LocationRetention
+from src.utils.metrics import render_prometheus
+from src.utils.write_behind import LocationBuffer
+
+OPS_PREFIX = "/ops"
+ops_router = APIRouter(prefix=OPS_PREFIX, dependencies=[Depends(verify_ops)])
+ENDPOINT_POOL = "/pool/"
+ENDPOINT_METRICS = "/metrics/"
+ENDPOINT_SLOW_QUERIES = "/slow-queries/"
+
+
+@ops_router.get(ENDPOINT_POOL, response_model=dict[str, PoolStatus])
+async def get_pool(
+    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+):
+    return cockroach_client.pool_status()
+
+
+@ops_router.get(ENDPOINT_METRICS, response_class=PlainTextResponse)
+async def get_metrics(
+    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    job_index: JobIndex = Depends(getJobIndex),
+    location_buffer: LocationBuffer = Depends(getLocationBuffer),
+    location_retention: LocationRetention = Depends(getLocationRetention),
+    location_hub: LocationHub = Depends(getLocationHub),
+):
+    return render_prometheus(
+        {
+            **cockroach_client.metrics(),
+            **job_index.metrics(),
+            **location_buffer.metrics(),
+            **location_retention.metrics(),
+            **location_hub.metrics(),
+        }
+    )
+
+
+@ops_router.get(ENDPOINT_SLOW_QUERIES, response_model=list[SlowQuery])
+async def get_slow_queries(
+    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+):
+    # newest first
+    return list(reversed(cockroach_client.slow_queries.entries))
@@ -1,13 +1,13 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header
 from starlette import status
 from starlette.exceptions import HTTPException
 from starlette.responses import Response
 
 from src.auth import user_auth
 from src.auth.user_auth import VerifiedUser
-from src.client.cockroach import CockroachDBClient
+from src.client.cockroach import CockroachDBSession
 from src.client.firebase import FirebaseClient
 from src.responses.user import (
     PaymentResponse,
@@ -19,10 +19,17 @@ from src.responses.user import (
 )
 from src.responses.util import DurationRequest
 from src.services.user import UserService
-from src.utils.client import getCockroachClient, getFirebaseClient
+from src.utils.client import getCockroachSession, getFirebaseClient
+from src.utils.pagination import next_cursor_headers
+from src.utils.response import EncodedResponse, ModelResponse, StreamingModelResponse
+from src.utils.route import TransactionRoute
 
 USER_PREFIX = "/user"
-user_router = APIRouter(prefix=USER_PREFIX)
+user_router = APIRouter(
+    prefix=USER_PREFIX,
+    route_class=TransactionRoute,
+    default_response_class=EncodedResponse,
+)
 ENDPOINT_CREATE_USER = "/create-user/"  # done | integrated
 ENDPOINT_CHECK_USER = "/check-user/"  # done | integrated
 ENDPOINT_GET_USER = "/get-user/"  # done | integrated
@@ -38,10 +45,10 @@ ENDPOINT_UPDATE_USER = "/update-user/"  # done | integrated
 @user_router.post(ENDPOINT_CREATE_USER)
 async def post_create_user(
     request: UserCreateRequest,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     firebase_client: FirebaseClient = Depends(getFirebaseClient),
 ):
-    UserService.create_user(request, cockroach_client, firebase_client)
+    await UserService.create_user(request, cockroach_session, firebase_client)
     return Response(status_code=status.HTTP_200_OK)
 
 
@@ -65,15 +72,15 @@ async def post_create_rating(
     user_id: UUID,
     request: RatingRequest,
     verified_user: VerifiedUser = Depends(user_auth.verify_user),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
     if user_id == verified_user.requesting_user.id:
         raise HTTPException(status_code=400, detail="User cannot rate themselves")
-    UserService.create_rating(
+    await UserService.create_rating(
         user_from=verified_user.requesting_user,
         user_to_id=user_id,
         request=request,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
     )
     return Response(status_code=status.HTTP_200_OK)
 
@@ -85,9 +92,11 @@ async def post_create_rating(
 )
 async def get_rating(
     user_id: UUID,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    return UserService.fetch_rating(user_id=user_id, cockroach_client=cockroach_client)
+    return await UserService.fetch_rating(
+        user_id=user_id, cockroach_session=cockroach_session
+    )
 
 
 @user_router.post(
@@ -96,26 +105,37 @@ async def get_rating(
 )
 async def get_payments(
     request: DurationRequest,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    accept: str | None = Header(None),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_user: VerifiedUser = Depends(user_auth.verify_user),
 ):
-    return UserService.get_payments(
+    if not request.paginated:
+        return StreamingModelResponse(
+            await UserService.stream_payments(
+                user=verified_user.requesting_user,
+                cockroach_session=cockroach_session,
+                request=request,
+            ),
+            accept=accept,
+        )
+    payments, cursor = await UserService.get_payments(
         user=verified_user.requesting_user,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
         request=request,
     )
+    return ModelResponse(payments, headers=next_cursor_headers(cursor))
 
 
 @user_router.post(ENDPOINT_ADD_FEEDBACK)
 async def post_add_feedback(
     request: RatingRequest,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
     verified_user: VerifiedUser = Depends(user_auth.verify_user),
 ):
-    UserService.add_feedback(
+    await UserService.add_feedback(
         user=verified_user.requesting_user,
         request=request,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
     )
     return Response(status_code=status.HTTP_200_OK)
 
@@ -127,20 +147,20 @@ async def post_add_feedback(
 )
 async def get_user_by_id(
     user_id: UUID,
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    return UserService.fetch_user_by_id(user_id, cockroach_client)
+    return await UserService.fetch_user_by_id(user_id, cockroach_session)
 
 
 @user_router.post(ENDPOINT_UPDATE_USER)
 async def post_update_user(
     request: UserUpdateRequest,
     verified_user: VerifiedUser = Depends(user_auth.verify_user),
-    cockroach_client: CockroachDBClient = Depends(getCockroachClient),
+    cockroach_session: CockroachDBSession = Depends(getCockroachSession),
 ):
-    UserService.update_user(
+    await UserService.update_user(
         user=verified_user.requesting_user,
         request=request,
-        cockroach_client=cockroach_client,
+        cockroach_session=cockroach_session,
     )
     return Response(status_code=status.HTTP_200_OK)
@@ -3,20 +3,28 @@ from uuid import UUID
 from fastapi import HTTPException
 from starlette import status
 
-from src.client.cockroach import CockroachDBClient
+from src.client.cockroach import CockroachDBSession
 from src.db.tables.employee_location import EmployeeLocation
 from src.db.tables.employee_mapping import EmployeeMapping
 from src.db.tables.job import Jobs
 from src.db.tables.payment import Payment
 from src.db.tables.task import Task
 from src.db.tables.user import User
-from src.responses.employee import EmployeeResponse
-from src.responses.job import JobResponse
+from src.responses.employee import EmployeeLocationResponse, EmployeeResponse
+from src.responses.job import JobResponse, JobSearchRequest
 from src.responses.task import TaskResponse
 from src.responses.user import UserResponse
 from src.responses.util import DurationRequest, Location
 from src.utils.enums import EmployeeStatus, TaskStatus
+from src.utils.job_index import JobIndex
+from src.utils.location_hub import LocationHub
+from src.utils.pagination import (
+    decode_distance_cursor,
+    next_cursor,
+    next_distance_cursor,
+)
 from src.utils.time import get_current_time
+from src.utils.write_behind import LocationBuffer
 
 
 class EmployeeService:
@@ -27,7 +35,7 @@ class EmployeeService:
             temp = TaskStatus.completed
         elif task.deleted is not None:
             temp = TaskStatus.cancelled
-        return TaskResponse(
+        return TaskResponse.model_construct(
             id=task.id,
             created_at=task.created_at,
             employee_id=task.employee_id,
@@ -39,35 +47,39 @@ class EmployeeService:
         )
 
     @classmethod
-    def fetch_tasks(
+    async def fetch_tasks(
         cls,
         employee: User,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
         request: DurationRequest,
-    ) -> list[TaskResponse]:
-        tasks: list[Task] | None = cockroach_client.query(
-            Task.get_by_time_field_multiple,
+    ) -> tuple[list[TaskResponse], str | None]:
+        tasks: list[Task] | None = await cockroach_session.aquery(
+            Task.aget_by_time_field_multiple,
             time_field="created_at",
             start_time=request.start_time,
             end_time=request.end_time,
             field="employee_id",
             match_value=employee.id,
             error_not_exist=False,
+            limit=request.page_size,
+            cursor=request.cursor,
         )
         response_list = []
         if tasks is None:
-            return response_list
+            return response_list, None
         for task in tasks:
             response_list.append(cls.fetch_task(task))
-        return response_list
+        return response_list, next_cursor(tasks, request.page_size)
 
     @classmethod
-    def fetch_job(
+    async def fetch_job(
         cls,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
         job_id: UUID,
     ):
-        job = cockroach_client.query(Jobs.get_id, id=job_id, error_not_exist=False)
+        job = await cockroach_session.aquery(
+            Jobs.aget_id, id=job_id, error_not_exist=False
+        )
         if job is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -76,65 +88,113 @@ class EmployeeService:
         return cls.fetch_job_detail(job)
 
     @classmethod
-    def add_location(
+    async def add_location(
         cls,
         location: Location,
         user: User,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
+        location_buffer: LocationBuffer,
+        location_hub: LocationHub,
+    ) -> None:
+        # stamped on arrival, the buffer may write it a moment later
+        now = get_current_time()
+        item = EmployeeLocation(
+            employee_id=user.id,
+            location_lat=location.location_lat,
+            location_long=location.location_long,
+            created_at=now,
+            last_modified_at=now,
+        )
+        if location_buffer.running:
+            # queued only once committed: a retried or rolled back attempt must
+            # not leave its ping behind. a full buffer still answers 503
+            cockroach_session.after_commit(lambda: location_buffer.put(item))
+        else:
+            await cockroach_session.aquery(EmployeeLocation.arecord, items=[item])
+        cls.__publish(cockroach_session, location_hub, item)
+
+    @classmethod
+    async def add_locations(
+        cls,
+        locations: list[Location],
+        user: User,
+        cockroach_session: CockroachDBSession,
+        location_hub: LocationHub,
     ) -> None:
-        cockroach_client.query(
-            EmployeeLocation.add,
-            items=[
-                EmployeeLocation(
-                    employee_id=user.id,
-                    location_lat=location.location_lat,
-                    location_long=location.location_long,
-                )
-            ],
+        # points buffered by the client keep the time they were taken
+        now = get_current_time()
+        items = [
+            EmployeeLocation(
+                employee_id=user.id,
+                location_lat=location.location_lat,
+                location_long=location.location_long,
+                created_at=location.created_at or now,
+                last_modified_at=now,
+            )
+            for location in locations
+        ]
+        await cockroach_session.aquery(EmployeeLocation.arecord, items=items)
+        # live maps only want where the employee is now
+        cls.__publish(
+            cockroach_session,
+            location_hub,
+            max(items, key=lambda item: item.created_at),
         )
 
     @classmethod
-    def leave_job(cls, cockroach_client: CockroachDBClient, user: User):
-        employee_mapping = cockroach_client.query(
-            EmployeeMapping.get_by_multiple_field_unique,
+    def __publish(
+        cls,
+        cockroach_session: CockroachDBSession,
+        location_hub: LocationHub,
+        item: EmployeeLocation,
+    ):
+        location = EmployeeLocationResponse.model_construct(
+            employee_id=item.employee_id,
+            location_lat=item.location_lat,
+            location_long=item.location_long,
+            created_at=item.created_at,
+        )
+        cockroach_session.after_commit(lambda: location_hub.publish(location))
+
+    @classmethod
+    async def leave_job(cls, cockroach_session: CockroachDBSession, user: User):
+        employee_mappings = await cockroach_session.aquery(
+            EmployeeMapping.aupdate_by_multiple_field,
             fields=["employee_id", "deleted"],
             match_values=[user.id, None],
-            error_not_exist=False,
+            new_values={
+                "deleted": get_current_time(),
+                "status": EmployeeStatus.left,
+            },
         )
-        if employee_mapping is None:
+        if employee_mappings is None:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Not Employed",
             )
-        employee_mapping.deleted = get_current_time()
-        employee_mapping.status = EmployeeStatus.left
-        cockroach_client.query(
-            EmployeeMapping.update_by_id,
-            id=employee_mapping.id,
-            new_data=employee_mapping,
-        )
 
     @classmethod
-    def fetch_job_detail(cls, job: Jobs) -> JobResponse:
-        return JobResponse(
+    def fetch_job_detail(cls, job: Jobs, distance: float | None = None) -> JobResponse:
+        return JobResponse.model_construct(
             id=job.id,
             created_at=job.created_at,
             employer_id=job.employer_id,
             title=job.title,
             description=job.description,
-            location=Location(
+            location=Location.model_construct(
                 location_lat=job.location_lat, location_long=job.location_long
             ),
             done=job.done,
             amount=job.amount,
             deleted=job.deleted,
+            distance=distance,
         )
 
     @classmethod
-    def complete_task(
+    async def complete_task(
         cls,
         task: Task,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
     ) -> None:
         if task.completed is not None:
             raise HTTPException(
@@ -146,40 +206,82 @@ class EmployeeService:
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Task Already Deleted",
             )
-        task.completed = get_current_time()
-        cockroach_client.query(
-            Task.update_by_id,
-            id=task.id,
-            new_data=task,
+        tasks = await cockroach_session.aquery(
+            Task.aupdate_by_multiple_field,
+            fields=["id", "deleted", "completed"],
+            match_values=[task.id, None, None],
+            new_values={"completed": get_current_time()},
         )
+        if tasks is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Task already deleted or completed",
+            )
 
     @classmethod
-    def get_jobs(
-        cls, cockroach_client: CockroachDBClient, request: Location
-    ) -> list[JobResponse]:
-        jobs: list[Jobs] | None = cockroach_client.query(
-            Jobs.get_multiple_in_radius,
-            radius=25000,
-            lat=request.location_lat,
-            lon=request.location_long,
-            error_not_exist=False,
-        )
-        if jobs is None:
+    async def get_jobs(
+        cls,
+        cockroach_session: CockroachDBSession,
+        request: JobSearchRequest,
+        job_index: JobIndex,
+    ) -> tuple[list[JobResponse], str | None]:
+        if job_index.ready:
+            jobs = job_index.search(
+                lat=request.location_lat,
+                lon=request.location_long,
+                radius=request.radius,
+                limit=request.limit,
+                after=(
+                    decode_distance_cursor(request.cursor)
+                    if request.cursor is not None
+                    else None
+                ),
+            )
+        else:
+            jobs = await cls.__search_jobs(cockroach_session, request)
+        if not jobs:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No Jobs Found",
             )
-        return [cls.fetch_job_detail(job=job) for job in jobs]
+        return [
+            cls.fetch_job_detail(job=job, distance=distance) for job, distance in jobs
+        ], next_distance_cursor(jobs, request.limit)
 
     @classmethod
-    def approve_payment(
+    async def __search_jobs(
+        cls, cockroach_session: CockroachDBSession, request: JobSearchRequest
+    ) -> list[tuple[Jobs, float]] | None:
+        return await cockroach_session.astale_query(
+            Jobs.aget_nearest_in_radius,
+            lat=request.location_lat,
+            lon=request.location_long,
+            radius=request.radius,
+            fields=["deleted", "done"],
+            match_values=[None, None],
+            limit=request.limit,
+            cursor=request.cursor,
+            error_not_exist=False,
+        )
+
+    @classmethod
+    async def approve_payment(
         cls,
         payment_id: UUID,
         user: User,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
     ) -> None:
-        payment: Payment = cockroach_client.query(
-            Payment.get_id,
+        payments = await cockroach_session.aquery(
+            Payment.aupdate_by_multiple_field,
+            fields=["id", "to_user_id", "approved_at"],
+            match_values=[payment_id, user.id, None],
+            new_values={"approved_at": get_current_time()},
+        )
+        if payments is not None:
+            return
+        # nothing was approved, only now read the payment to tell why
+        payment: Payment = await cockroach_session.aquery(
+            Payment.aget_id,
             id=payment_id,
             error_not_exist=False,
         )
@@ -193,24 +295,17 @@ class EmployeeService:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Payment Not for User",
             )
-        if payment.approved_at is not None:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Payment Already Approved",
-            )
-        payment.approved_at = get_current_time()
-        cockroach_client.query(
-            Payment.update_by_id,
-            id=payment.id,
-            new_data=payment,
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Payment Already Approved",
         )
 
     @classmethod
-    def fetch_employer(
-        cls, cockroach_client: CockroachDBClient, user: User
+    async def fetch_employer(
+        cls, cockroach_session: CockroachDBSession, user: User
     ) -> UserResponse:
-        employee_mapping: EmployeeMapping = cockroach_client.query(
-            EmployeeMapping.get_by_multiple_field_unique,
+        employee_mapping: EmployeeMapping = await cockroach_session.aquery(
+            EmployeeMapping.aget_by_multiple_field_unique,
             fields=["employee_id", "deleted"],
             match_values=[user.id, None],
             error_not_exist=False,
@@ -220,8 +315,8 @@ class EmployeeService:
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Not Employed",
             )
-        employer: User = cockroach_client.query(
-            User.get_id,
+        employer: User = await cockroach_session.aquery(
+            User.aget_id,
             id=employee_mapping.employer_id,
             error_not_exist=False,
         )
@@ -240,11 +335,11 @@ class EmployeeService:
         )
 
     @classmethod
-    def fetch_employee_job(
-        cls, cockroach_client: CockroachDBClient, user: User
+    async def fetch_employee_job(
+        cls, cockroach_session: CockroachDBSession, user: User
     ) -> EmployeeResponse:
-        employee_mapping: EmployeeMapping = cockroach_client.query(
-            EmployeeMapping.get_by_multiple_field_unique,
+        employee_mapping: EmployeeMapping = await cockroach_session.aquery(
+            EmployeeMapping.aget_by_multiple_field_unique,
             fields=["employee_id", "deleted"],
             match_values=[user.id, None],
             error_not_exist=False,
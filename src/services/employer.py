@@ -1,42 +1,61 @@
+import heapq
+from typing import AsyncGenerator, AsyncIterator
 from uuid import UUID
 
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import Row
 
-from src.client.cockroach import CockroachDBClient
+from src.client.cockroach import CockroachDBSession
+from src.db.tables.employee_last_location import EmployeeLastLocation
 from src.db.tables.employee_location import EmployeeLocation
+from src.db.tables.employee_location_hourly import EmployeeLocationHourly
 from src.db.tables.employee_mapping import EmployeeMapping
 from src.db.tables.job import Jobs
 from src.db.tables.payment import Payment
 from src.db.tables.task import Task
 from src.db.tables.user import User
 from src.db.views.payment import PaymentDetails
-from src.responses.employee import EmployeeResponse
+from src.responses.employee import EmployeeLocationResponse, EmployeeResponse
 from src.responses.job import JobCreateRequest, JobResponse
 from src.responses.task import TaskCreateRequest
 from src.responses.user import PaymentRequest, PaymentResponse, UserResponse
-from src.responses.util import DurationRequest, Location
+from src.responses.util import DurationRequest, Location, LocationPathRequest
 from src.utils.enums import EmployeeStatus, UserType
+from src.utils.job_index import JobIndex
+from src.utils.location_hub import LocationHub
+from src.utils.location_retention import LocationRetention
+from src.utils.pagination import MAX_PAGE_SIZE, next_cursor
+from src.utils.response import map_stream, merge_stream
 from src.utils.time import get_current_time
+from src.utils.trajectory import bucket_path, simplify_path
+
+# id and created_at order a path and make its cursors
+LOCATION_PATH_COLUMNS = ["id", "created_at", "location_lat", "location_long"]
+
+
+def location_path_order(location: Row):
+    return location.created_at, location.id
 
 
 class EmployerService:
     @classmethod
-    def __verify_employee(
+    async def __verify_employee(
         cls,
         employee_id: UUID,
         employer: User,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
         is_employer: bool = True,
     ) -> None:
-        employee = cockroach_client.query(
-            User.get_id, id=employee_id, error_not_exist=False
+        employee = await cockroach_session.aquery(
+            User.aget_id, id=employee_id, error_not_exist=False
         )
         if employee is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Employee not Found"
             )
-        employee_mapping = cockroach_client.query(
-            EmployeeMapping.get_by_multiple_field_unique,
+        employee_mapping = await cockroach_session.aquery(
+            EmployeeMapping.aget_by_multiple_field_unique,
             fields=["employee_id", "employer_id", "deleted"],
             match_values=[employee_id, employer.id, None],
             error_not_exist=False,
@@ -53,14 +72,17 @@ class EmployerService:
             )
 
     @classmethod
-    def add_task(
-        cls, request: TaskCreateRequest, cockroach_client: CockroachDBClient, user: User
+    async def add_task(
+        cls,
+        request: TaskCreateRequest,
+        cockroach_session: CockroachDBSession,
+        user: User,
     ) -> None:
-        cls.__verify_employee(
-            request.employee_id, user, cockroach_client, is_employer=True
+        await cls.__verify_employee(
+            request.employee_id, user, cockroach_session, is_employer=True
         )
-        cockroach_client.query(
-            Task.add,
+        await cockroach_session.aquery(
+            Task.aadd,
             items=[
                 Task(
                     employee_id=request.employee_id,
@@ -75,16 +97,18 @@ class EmployerService:
         )
 
     @classmethod
-    def add_employee(
+    async def add_employee(
         cls,
         employee_id: UUID,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
         user: User,
         title: str,
     ) -> None:
-        cls.__verify_employee(employee_id, user, cockroach_client, is_employer=False)
-        employee_mapping = cockroach_client.query(
-            EmployeeMapping.get_by_multiple_field_unique,
+        await cls.__verify_employee(
+            employee_id, user, cockroach_session, is_employer=False
+        )
+        employee_mapping = await cockroach_session.aquery(
+            EmployeeMapping.aget_by_multiple_field_unique,
             fields=["employee_id", "deleted"],
             match_values=[employee_id, None],
             error_not_exist=False,
@@ -94,8 +118,8 @@ class EmployerService:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Employee is Employed",
             )
-        cockroach_client.query(
-            EmployeeMapping.add,
+        await cockroach_session.aquery(
+            EmployeeMapping.aadd,
             items=[
                 EmployeeMapping(
                     employee_id=employee_id,
@@ -106,37 +130,37 @@ class EmployerService:
         )
 
     @classmethod
-    def add_job(
-        cls, request: JobCreateRequest, cockroach_client: CockroachDBClient, user: User
+    async def add_job(
+        cls,
+        request: JobCreateRequest,
+        cockroach_session: CockroachDBSession,
+        user: User,
+        job_index: JobIndex,
     ) -> None:
-        cockroach_client.query(
-            Jobs.add,
-            items=[
-                Jobs(
-                    employer_id=user.id,
-                    title=request.title,
-                    description=request.description,
-                    location_lat=request.location_lat,
-                    location_long=request.location_long,
-                    amount=request.amount,
-                )
-            ],
+        job = Jobs(
+            employer_id=user.id,
+            title=request.title,
+            description=request.description,
+            location_lat=request.location_lat,
+            location_long=request.location_long,
+            amount=request.amount,
         )
+        await cockroach_session.aquery(Jobs.aadd, items=[job])
+        cockroach_session.after_commit(lambda: job_index.add(job))
 
     @classmethod
-    def fetch_employees(
-        cls, cockroach_client: CockroachDBClient, user: User
-    ) -> list[EmployeeResponse]:
-        employees: list[EmployeeMapping] = cockroach_client.query(
-            EmployeeMapping.get_by_field_multiple,
+    async def stream_employees(
+        cls, cockroach_session: CockroachDBSession, user: User
+    ) -> AsyncIterator[EmployeeResponse]:
+        employees: list[Row] = await cockroach_session.aquery(
+            EmployeeMapping.aget_by_field_multiple,
             field="employer_id",
             match_value=user.id,
             error_not_exist=False,
+            columns=["employee_id", "status", "title", "deleted", "created_at"],
         )
         temp = {}
-        if employees is None:
-            return []
-        for i in employees:
+        for i in employees or []:
             if (
                 temp.get(i.employee_id) is None
                 or i.deleted is None
@@ -146,35 +170,32 @@ class EmployerService:
                 )
             ):
                 temp[i.employee_id] = [i.status, i.title, i.deleted, i.created_at]
-        users: list[User] = cockroach_client.query(
-            User.get_by_field_value_list,
+
+        def fetch(employee: Row) -> EmployeeResponse:
+            return EmployeeResponse.model_construct(
+                employee_id=employee.id,
+                name=employee.name,
+                phone_no=employee.phone_no,
+                title=temp[employee.id][1],
+                status=temp[employee.id][0],
+                join_date=temp[employee.id][3],
+                email=employee.email,
+            )
+
+        users = cockroach_session.astream(
+            User.astream_by_field_value_list,
             field="id",
-            match_values=temp.keys(),
-            error_not_exist=False,
+            match_values=list(temp.keys()),
+            columns=["id", "name", "phone_no", "email"],
         )
-        employee_response = []
-        if users is None:
-            return employee_response
-        for user in users:
-            employee_response.append(
-                EmployeeResponse(
-                    employee_id=user.id,
-                    name=user.name,
-                    phone_no=user.phone_no,
-                    title=temp[user.id][1],
-                    status=temp[user.id][0],
-                    join_date=temp[user.id][3],
-                    email=user.email,
-                )
-            )
-        return employee_response
+        return map_stream(fetch, users)
 
     @classmethod
-    def fetch_employee(
-        cls, cockroach_client: CockroachDBClient, user: User
+    async def fetch_employee(
+        cls, cockroach_session: CockroachDBSession, user: User
     ) -> EmployeeResponse:
-        employee_mapping: EmployeeMapping = cockroach_client.query(
-            EmployeeMapping.get_by_multiple_field_unique,
+        employee_mapping: EmployeeMapping = await cockroach_session.aquery(
+            EmployeeMapping.aget_by_multiple_field_unique,
             fields=["employee_id", "deleted"],
             match_values=[user.id, None],
             error_not_exist=False,
@@ -194,11 +215,11 @@ class EmployerService:
         )
 
     @classmethod
-    def search_employee_by_phone(
-        cls, cockroach_client: CockroachDBClient, phone_no: str
+    async def search_employee_by_phone(
+        cls, cockroach_session: CockroachDBSession, phone_no: str
     ) -> UserResponse:
-        user: User = cockroach_client.query(
-            User.get_by_field_unique,
+        user: User = await cockroach_session.aquery(
+            User.aget_by_field_unique,
             field="phone_no",
             match_value=phone_no,
             error_not_exist=False,
@@ -207,8 +228,8 @@ class EmployerService:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not Found"
             )
-        employee_mapping = cockroach_client.query(
-            EmployeeMapping.get_by_multiple_field_unique,
+        employee_mapping = await cockroach_session.aquery(
+            EmployeeMapping.aget_by_multiple_field_unique,
             fields=["employee_id", "deleted"],
             match_values=[user.id, None],
             error_not_exist=False,
@@ -228,11 +249,11 @@ class EmployerService:
         )
 
     @classmethod
-    def search_employee_by_email(
-        cls, cockroach_client: CockroachDBClient, email: str
+    async def search_employee_by_email(
+        cls, cockroach_session: CockroachDBSession, email: str
     ) -> UserResponse:
-        user: User = cockroach_client.query(
-            User.get_by_field_unique,
+        user: User = await cockroach_session.aquery(
+            User.aget_by_field_unique,
             field="email",
             match_value=email,
             error_not_exist=False,
@@ -241,8 +262,8 @@ class EmployerService:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not Found"
             )
-        employee_mapping = cockroach_client.query(
-            EmployeeMapping.get_by_multiple_field_unique,
+        employee_mapping = await cockroach_session.aquery(
+            EmployeeMapping.aget_by_multiple_field_unique,
             fields=["employee_id", "deleted"],
             match_values=[user.id, None],
             error_not_exist=False,
@@ -262,41 +283,217 @@ class EmployerService:
         )
 
     @classmethod
-    def fetch_location_path(
-        cls, cockroach_client: CockroachDBClient, user: User, request: DurationRequest
-    ) -> list[Location]:
-        locations: list[EmployeeLocation] | None = cockroach_client.query(
-            EmployeeLocation.get_by_time_field_multiple,
+    def fetch_location(cls, location: Row) -> Location:
+        return Location.model_construct(
+            location_lat=location.location_lat,
+            location_long=location.location_long,
+            created_at=location.created_at,
+        )
+
+    @classmethod
+    async def __fetch_hourly_locations(
+        cls,
+        cockroach_session: CockroachDBSession,
+        user: User,
+        request: DurationRequest,
+        location_retention: LocationRetention,
+        limit: int | None = None,
+    ) -> list[Row]:
+        # rollups of the part of the duration past the raw retention, ordered
+        if not location_retention.has_rollups(request.start_time):
+            return []
+        locations = await cockroach_session.aquery(
+            EmployeeLocationHourly.aget_by_time_field_multiple,
             time_field="created_at",
             start_time=request.start_time,
             end_time=request.end_time,
             field="employee_id",
             match_value=user.id,
             error_not_exist=False,
+            limit=limit,
+            cursor=request.cursor,
+            columns=LOCATION_PATH_COLUMNS,
+        )
+        return sorted(locations or [], key=location_path_order)
+
+    @classmethod
+    async def fetch_location_path(
+        cls,
+        cockroach_session: CockroachDBSession,
+        user: User,
+        request: LocationPathRequest,
+        location_retention: LocationRetention,
+    ) -> tuple[list[Location], str | None]:
+        locations: list[Row] = (
+            await cockroach_session.aquery(
+                EmployeeLocation.aget_by_time_field_multiple,
+                time_field="created_at",
+                start_time=request.start_time,
+                end_time=request.end_time,
+                field="employee_id",
+                match_value=user.id,
+                error_not_exist=False,
+                limit=request.page_size,
+                cursor=request.cursor,
+                columns=LOCATION_PATH_COLUMNS,
+            )
+            or []
+        )
+        hourly = await cls.__fetch_hourly_locations(
+            cockroach_session, user, request, location_retention, request.page_size
+        )
+        if hourly:
+            # two pages after the same cursor, the first page_size of both
+            locations = list(heapq.merge(hourly, locations, key=location_path_order))[
+                : request.page_size
+            ]
+        if not locations:
+            if request.cursor is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="No Location Found"
+                )
+            return [], None
+        path = [cls.fetch_location(location) for location in locations]
+        if request.simplified:
+            # the cursor follows the rows read, not the points returned
+            path = await cls.simplify_location_path(path, request)
+        return path, next_cursor(locations, request.page_size)
+
+    @classmethod
+    async def simplify_location_path(
+        cls, path: list[Location], request: LocationPathRequest
+    ) -> list[Location]:
+        # pure python and linear in the points per level of the path, keep it
+        # off the event loop for long durations
+        return await run_in_threadpool(cls.__simplify, path, request)
+
+    @classmethod
+    def __simplify(
+        cls, path: list[Location], request: LocationPathRequest
+    ) -> list[Location]:
+        if request.bucket_seconds is not None:
+            path = bucket_path(path, request.bucket_seconds)
+        return simplify_path(path, request.tolerance_meters, request.max_points)
+
+    @classmethod
+    async def fetch_simplified_location_path(
+        cls,
+        cockroach_session: CockroachDBSession,
+        user: User,
+        request: LocationPathRequest,
+        location_retention: LocationRetention,
+    ) -> list[Location]:
+        locations = await cls.stream_location_path(
+            cockroach_session=cockroach_session,
+            user=user,
+            request=request,
+            location_retention=location_retention,
+        )
+        return await cls.simplify_location_path(
+            [location async for location in locations], request
         )
-        if locations is None:
+
+    @classmethod
+    async def stream_location_path(
+        cls,
+        cockroach_session: CockroachDBSession,
+        user: User,
+        request: DurationRequest,
+        location_retention: LocationRetention,
+    ) -> AsyncIterator[Location]:
+        hourly = await cls.__fetch_hourly_locations(
+            cockroach_session, user, request, location_retention
+        )
+        duration = {
+            "time_field": "created_at",
+            "start_time": request.start_time,
+            "end_time": request.end_time,
+            "field": "employee_id",
+            "match_value": user.id,
+        }
+        # checked on the unit of work's connection; the stream takes its own only
+        # once the response is sent, after the unit of work has let go of it
+        if not hourly and not await cockroach_session.aquery(
+            EmployeeLocation.aget_by_time_field_multiple,
+            **duration,
+            limit=1,
+            columns=["id"],
+        ):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="No Location Found"
             )
+        locations = cockroach_session.astream(
+            EmployeeLocation.astream_by_time_field_multiple,
+            **duration,
+            columns=LOCATION_PATH_COLUMNS,
+        )
+        if hourly:
+            locations = merge_stream(hourly, locations, location_path_order)
+        return map_stream(cls.fetch_location, locations)
+
+    @classmethod
+    async def fetch_live_locations(
+        cls, cockroach_session: CockroachDBSession, user: User
+    ) -> list[EmployeeLocationResponse]:
+        locations: list[Row] = await cockroach_session.aquery(
+            EmployeeLastLocation.aget_of_employer,
+            employer_id=user.id,
+            columns=["employee_id", "location_lat", "location_long", "located_at"],
+        )
         return [
-            Location(
+            EmployeeLocationResponse.model_construct(
+                employee_id=location.employee_id,
                 location_lat=location.location_lat,
                 location_long=location.location_long,
-                created_at=location.created_at,
+                created_at=location.located_at,
             )
             for location in locations
         ]
 
     @classmethod
-    def add_payment(
+    async def stream_live_locations(
+        cls,
+        cockroach_session: CockroachDBSession,
+        user: User,
+        location_hub: LocationHub,
+    ) -> AsyncGenerator[EmployeeLocationResponse | None, None]:
+        """the last locations of the current employees, then their new ones as
+        they are published; None when there was nothing for a while. employees
+        hired or removed later show up after the client reconnects"""
+        mappings: list[Row] = await cockroach_session.aquery(
+            EmployeeMapping.aget_by_multiple_field_multiple,
+            fields=["employer_id", "deleted"],
+            match_values=[user.id, None],
+            error_not_exist=False,
+            columns=["employee_id"],
+        )
+        employee_ids = {mapping.employee_id for mapping in mappings or []}
+        current = await cls.fetch_live_locations(cockroach_session, user)
+
+        async def events():
+            # subscribed once the response starts: the endpoint may run again
+            # on a retry, and a stream that is never sent must not hold one
+            subscription = location_hub.subscribe(employee_ids)
+            try:
+                for location in current:
+                    yield location
+                async for location in subscription:
+                    yield location
+            finally:
+                subscription.close()
+
+        return events()
+
+    @classmethod
+    async def add_payment(
         cls,
         user: User,
         request: PaymentRequest,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
         employee_id: UUID,
     ) -> None:
-        cockroach_client.query(
-            Payment.add,
+        await cockroach_session.aquery(
+            Payment.aadd,
             items=[
                 Payment(
                     amount=request.amount,
@@ -309,11 +506,11 @@ class EmployerService:
         )
 
     @classmethod
-    def fetch_employee_payments(
-        cls, cockroach_client: CockroachDBClient, user: User, user_id: UUID
+    async def fetch_employee_payments(
+        cls, cockroach_session: CockroachDBSession, user: User, user_id: UUID
     ) -> list[PaymentResponse]:
-        payments: list[PaymentDetails] | None = cockroach_client.query(
-            PaymentDetails.get_by_multiple_field_multiple,
+        payments: list[PaymentDetails] | None = await cockroach_session.aquery(
+            PaymentDetails.aget_by_multiple_field_multiple,
             fields=["sender_id", "receiver_id"],
             match_values=[user.id, user_id],
             error_not_exist=False,
@@ -323,18 +520,18 @@ class EmployerService:
                 status_code=status.HTTP_404_NOT_FOUND, detail="No Payments Found"
             )
         return [
-            PaymentResponse(
+            PaymentResponse.model_construct(
                 id=payment.id,
                 amount=payment.amount,
                 created_at=payment.created_at,
-                from_user=UserResponse(
+                from_user=UserResponse.model_construct(
                     id=payment.sender_id,
                     name=payment.sender_name,
                     phone_no=payment.sender_phone,
                     email=payment.sender_email,
                     user_type=payment.sender_user_type,
                 ),
-                to_user=UserResponse(
+                to_user=UserResponse.model_construct(
                     id=payment.receiver_id,
                     name=payment.receiver_name,
                     phone_no=payment.receiver_phone,
@@ -349,35 +546,34 @@ class EmployerService:
         ]
 
     @classmethod
-    def remove_employee(
+    async def remove_employee(
         cls,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
         user_employee: User,
         user_employer: User,
     ):
-        employee_mapping = cockroach_client.query(
-            EmployeeMapping.get_by_multiple_field_unique,
+        employee_mappings = await cockroach_session.aquery(
+            EmployeeMapping.aupdate_by_multiple_field,
             fields=["employee_id", "employer_id", "deleted"],
             match_values=[user_employee.id, user_employer.id, None],
-            error_not_exist=False,
+            new_values={
+                "deleted": get_current_time(),
+                "status": EmployeeStatus.removed,
+            },
         )
-        if employee_mapping is None:
+        if employee_mappings is None:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Not Employed",
             )
-        employee_mapping.deleted = get_current_time()
-        employee_mapping.status = EmployeeStatus.removed
-        cockroach_client.query(
-            EmployeeMapping.update_by_id,
-            id=employee_mapping.id,
-            new_data=employee_mapping,
-        )
 
     @classmethod
-    def delete_job(cls, job_id: UUID, cockroach_client: CockroachDBClient, user: User):
-        job: Jobs = cockroach_client.query(
-            Jobs.get_by_multiple_field_unique,
+    async def __raise_job_not_updated(
+        cls, job_id: UUID, cockroach_session: CockroachDBSession, user: User
+    ):
+        # the guarded update matched nothing, only now read the job to tell why
+        job: Jobs = await cockroach_session.aquery(
+            Jobs.aget_by_multiple_field_unique,
             fields=["id", "employer_id", "deleted"],
             match_values=[job_id, user.id, None],
             error_not_exist=False,
@@ -387,47 +583,51 @@ class EmployerService:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Job not Found",
             )
-        if job.done is not None:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Job already completed",
-            )
-        job.deleted = get_current_time()
-        cockroach_client.query(
-            Jobs.update_by_id,
-            id=job.id,
-            new_data=job,
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Job already completed",
         )
 
     @classmethod
-    def complete_job(
-        cls, job_id: UUID, cockroach_client: CockroachDBClient, user: User
+    async def delete_job(
+        cls,
+        job_id: UUID,
+        cockroach_session: CockroachDBSession,
+        user: User,
+        job_index: JobIndex,
     ):
-        job: Jobs = cockroach_client.query(
-            Jobs.get_by_multiple_field_unique,
-            fields=["id", "employer_id", "deleted"],
-            match_values=[job_id, user.id, None],
-            error_not_exist=False,
+        jobs = await cockroach_session.aquery(
+            Jobs.aupdate_by_multiple_field,
+            fields=["id", "employer_id", "deleted", "done"],
+            match_values=[job_id, user.id, None, None],
+            new_values={"deleted": get_current_time()},
         )
-        if job is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Job not Found",
-            )
-        if job.done is not None:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Job already completed",
-            )
-        job.done = get_current_time()
-        cockroach_client.query(
-            Jobs.update_by_id,
-            id=job.id,
-            new_data=job,
+        if jobs is None:
+            await cls.__raise_job_not_updated(job_id, cockroach_session, user)
+        cockroach_session.after_commit(lambda: job_index.remove(job_id))
+
+    @classmethod
+    async def complete_job(
+        cls,
+        job_id: UUID,
+        cockroach_session: CockroachDBSession,
+        user: User,
+        job_index: JobIndex,
+    ):
+        jobs = await cockroach_session.aquery(
+            Jobs.aupdate_by_multiple_field,
+            fields=["id", "employer_id", "deleted", "done"],
+            match_values=[job_id, user.id, None, None],
+            new_values={"done": get_current_time()},
         )
+        if jobs is None:
+            await cls.__raise_job_not_updated(job_id, cockroach_session, user)
+        cockroach_session.after_commit(lambda: job_index.remove(job_id))
 
     @classmethod
-    def delete_task(cls, user: User, cockroach_client: CockroachDBClient, task: Task):
+    async def delete_task(
+        cls, user: User, cockroach_session: CockroachDBSession, task: Task
+    ):
         if user.id != task.employer_id:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -443,36 +643,51 @@ class EmployerService:
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Task already completed",
             )
-        task.deleted = get_current_time()
-        cockroach_client.query(
-            Task.update_by_id,
-            id=task.id,
-            new_data=task,
+        # re-check the state in the update itself, the task may have changed
+        # since it was read
+        tasks = await cockroach_session.aquery(
+            Task.aupdate_by_multiple_field,
+            fields=["id", "deleted", "completed"],
+            match_values=[task.id, None, None],
+            new_values={"deleted": get_current_time()},
         )
+        if tasks is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Task already deleted or completed",
+            )
 
     @classmethod
-    def get_jobs(
-        cls, cockroach_client: CockroachDBClient, user: User
-    ) -> list[JobResponse]:
-        jobs: list[Jobs] = cockroach_client.query(
-            Jobs.get_by_field_multiple,
+    async def get_jobs(
+        cls,
+        cockroach_session: CockroachDBSession,
+        user: User,
+        limit: int = MAX_PAGE_SIZE,
+        cursor: str | None = None,
+    ) -> tuple[list[JobResponse], str | None]:
+        jobs: list[Jobs] = await cockroach_session.astale_query(
+            Jobs.aget_by_field_multiple,
             field="employer_id",
             match_value=user.id,
             error_not_exist=False,
+            limit=limit,
+            cursor=cursor,
         )
         if jobs is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No Jobs Found",
-            )
+            if cursor is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No Jobs Found",
+                )
+            return [], None
         return [
-            JobResponse(
+            JobResponse.model_construct(
                 id=job.id,
                 created_at=job.created_at,
                 employer_id=job.employer_id,
                 title=job.title,
                 description=job.description,
-                location=Location(
+                location=Location.model_construct(
                     location_lat=job.location_lat, location_long=job.location_long
                 ),
                 done=job.done,
@@ -480,4 +695,4 @@ class EmployerService:
                 deleted=job.deleted,
             )
             for job in jobs
-        ]
+        ], next_cursor(jobs, limit)
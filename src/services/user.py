@@ -1,3 +1,4 @@
+from typing import AsyncIterator
 from uuid import UUID
 
 from fastapi import HTTPException
@@ -5,7 +6,7 @@ from firebase_admin import auth
 from firebase_admin.auth import UserRecord
 from starlette import status
 
-from src.client.cockroach import CockroachDBClient
+from src.client.cockroach import CockroachDBSession
 from src.client.firebase import FirebaseClient
 from src.db.tables.Feedback import Feedback
 from src.db.tables.payment import Payment
@@ -23,6 +24,8 @@ from src.responses.user import (
 )
 from src.responses.util import DurationRequest
 from src.utils.enums import UserType
+from src.utils.pagination import next_cursor
+from src.utils.response import map_stream
 
 
 class UserService:
@@ -38,10 +41,10 @@ class UserService:
         )
 
     @classmethod
-    def create_user(
+    async def create_user(
         cls,
         request: UserCreateRequest,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
         firebase_client: FirebaseClient,
     ) -> None:
         user: User = User(
@@ -51,8 +54,8 @@ class UserService:
             user_type=request.user_type,
             firebase_user_id=request.firebase_user_id,
         )
-        user_firebase: UserRecord = auth.get_user(
-            request.firebase_user_id, app=firebase_client.app
+        user_firebase: UserRecord = await firebase_client.arun(
+            auth.get_user, request.firebase_user_id, app=firebase_client.app
         )
         if (
             user_firebase.custom_claims is not None
@@ -60,28 +63,27 @@ class UserService:
         ):
             user.id = user_firebase.custom_claims[firebase_client.user_key]
         else:
-            auth.set_custom_user_claims(
+            await firebase_client.arun(
+                auth.set_custom_user_claims,
                 request.firebase_user_id,
                 {firebase_client.user_key: str(user.id)},
                 app=firebase_client.app,
             )
-        try:
-            cockroach_client.query(
-                User.add,
-                items=[user],
-            )
-        except Exception as e:
+        # a user that already exists (same id, firebase id, phone or email) is
+        # skipped by the insert instead of failing it
+        users = await cockroach_session.aquery(User.aupsert, items=[user])
+        if users is None:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT, detail="User already found"
             )
 
     @classmethod
-    def create_rating(
+    async def create_rating(
         cls,
         user_from: User,
         user_to_id: UUID,
         request: RatingRequest,
-        cockroach_client: CockroachDBClient,
+        cockroach_session: CockroachDBSession,
     ) -> None:
         rate = Rating(
             user_to=user_to_id,
@@ -89,32 +91,20 @@ class UserService:
             rate=request.rate,
             comment=request.comment,
         )
-        temp = cockroach_client.query(
-            Rating.get_by_multiple_field_unique,
-            fields=["user_to", "user_from"],
-            match_values=[user_to_id, user_from.id],
-            error_not_exist=False,
+        # a second rating between the same users replaces the first
+        await cockroach_session.aquery(
+            Rating.aupsert,
+            items=[rate],
+            conflict_fields=["user_from", "user_to"],
+            update_fields=["rate", "comment"],
         )
-        if temp is not None:
-            temp.rate = request.rate
-            temp.comment = request.comment
-            cockroach_client.query(
-                Rating.update_by_id,
-                id=temp.id,
-                new_data=temp,
-            )
-        else:
-            cockroach_client.query(
-                Rating.add,
-                items=[rate],
-            )
 
     @classmethod
-    def fetch_rating(
-        cls, user_id: UUID, cockroach_client: CockroachDBClient
+    async def fetch_rating(
+        cls, user_id: UUID, cockroach_session: CockroachDBSession
     ) -> RatingResponse:
-        rate = cockroach_client.query(
-            RatingView.get_id,
+        rate = await cockroach_session.astale_query(
+            RatingView.aget_id,
             id=user_id,
             error_not_exist=False,
         )
@@ -129,55 +119,90 @@ class UserService:
             )
 
     @classmethod
-    def get_payments(
-        cls, user: User, cockroach_client: CockroachDBClient, request: DurationRequest
-    ) -> list[PaymentResponse]:
+    def fetch_payment(cls, payment: PaymentDetails) -> PaymentResponse:
+        return PaymentResponse.model_construct(
+            id=payment.id,
+            amount=payment.amount,
+            created_at=payment.created_at,
+            from_user=UserResponse.model_construct(
+                id=payment.sender_id,
+                name=payment.sender_name,
+                phone_no=payment.sender_phone,
+                email=payment.sender_email,
+                user_type=payment.sender_user_type,
+            ),
+            to_user=UserResponse.model_construct(
+                id=payment.receiver_id,
+                name=payment.receiver_name,
+                phone_no=payment.receiver_phone,
+                email=payment.receiver_email,
+                user_type=payment.receiver_user_type,
+            ),
+            currency=payment.currency,
+            remarks=payment.remarks,
+            approved_at=payment.approved_at,
+        )
+
+    @classmethod
+    async def get_payments(
+        cls, user: User, cockroach_session: CockroachDBSession, request: DurationRequest
+    ) -> tuple[list[PaymentResponse], str | None]:
         field = "receiver_id" if user.user_type == UserType.employee else "sender_id"
-        payments: list[PaymentDetails] | None = cockroach_client.query(
-            PaymentDetails.get_by_time_field_multiple,
+        payments: list[PaymentDetails] | None = await cockroach_session.astale_query(
+            PaymentDetails.aget_by_time_field_multiple,
             time_field="created_at",
             start_time=request.start_time,
             end_time=request.end_time,
             field=field,
             match_value=user.id,
             error_not_exist=False,
+            limit=request.page_size,
+            cursor=request.cursor,
         )
         if payments is None:
+            if request.cursor is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="No Payments Found"
+                )
+            return [], None
+        return [cls.fetch_payment(payment) for payment in payments], next_cursor(
+            payments, request.page_size
+        )
+
+    @classmethod
+    async def stream_payments(
+        cls, user: User, cockroach_session: CockroachDBSession, request: DurationRequest
+    ) -> AsyncIterator[PaymentResponse]:
+        field = "receiver_id" if user.user_type == UserType.employee else "sender_id"
+        duration = {
+            "time_field": "created_at",
+            "start_time": request.start_time,
+            "end_time": request.end_time,
+            "field": field,
+            "match_value": user.id,
+        }
+        # checked on the unit of work's connection; the stream takes its own only
+        # once the response is sent, after the unit of work has let go of it
+        if not await cockroach_session.aquery(
+            PaymentDetails.aget_by_time_field_multiple,
+            **duration,
+            limit=1,
+            columns=["id"],
+        ):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="No Payments Found"
             )
-        return [
-            PaymentResponse(
-                id=payment.id,
-                amount=payment.amount,
-                created_at=payment.created_at,
-                from_user=UserResponse(
-                    id=payment.sender_id,
-                    name=payment.sender_name,
-                    phone_no=payment.sender_phone,
-                    email=payment.sender_email,
-                    user_type=payment.sender_user_type,
-                ),
-                to_user=UserResponse(
-                    id=payment.receiver_id,
-                    name=payment.receiver_name,
-                    phone_no=payment.receiver_phone,
-                    email=payment.receiver_email,
-                    user_type=payment.receiver_user_type,
-                ),
-                currency=payment.currency,
-                remarks=payment.remarks,
-                approved_at=payment.approved_at,
-            )
-            for payment in payments
-        ]
+        payments = cockroach_session.astream(
+            PaymentDetails.astream_by_time_field_multiple, **duration
+        )
+        return map_stream(cls.fetch_payment, payments)
 
     @classmethod
-    def add_feedback(
-        cls, user: User, request: RatingRequest, cockroach_client: CockroachDBClient
+    async def add_feedback(
+        cls, user: User, request: RatingRequest, cockroach_session: CockroachDBSession
     ) -> None:
-        cockroach_client.query(
-            Feedback.add,
+        await cockroach_session.aquery(
+            Feedback.aadd,
             items=[
                 Feedback(
                     from_user_id=user.id, rating=request.rate, feedback=request.comment
@@ -186,11 +211,11 @@ class UserService:
         )
 
     @classmethod
-    def fetch_user_by_id(
-        cls, user_id: UUID, cockroach_client: CockroachDBClient
+    async def fetch_user_by_id(
+        cls, user_id: UUID, cockroach_session: CockroachDBSession
     ) -> UserResponse:
-        user: User | None = cockroach_client.query(
-            User.get_id, id=user_id, error_not_exist=False
+        user: User | None = await cockroach_session.aquery(
+            User.aget_id, id=user_id, error_not_exist=False
         )
         if user is None:
             raise HTTPException(
@@ -199,12 +224,16 @@ class UserService:
         return cls.fetch_user(user)
 
     @classmethod
-    def update_user(
-        cls, user: User, request: UserUpdateRequest, cockroach_client: CockroachDBClient
+    async def update_user(
+        cls,
+        user: User,
+        request: UserUpdateRequest,
+        cockroach_session: CockroachDBSession,
     ):
+        new_values = {}
         if request.email is not None and request.email != user.email:
-            temp = cockroach_client.query(
-                User.get_by_field_unique,
+            temp = await cockroach_session.aquery(
+                User.aget_by_field_unique,
                 field="email",
                 match_value=request.email,
                 error_not_exist=False,
@@ -213,10 +242,10 @@ class UserService:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT, detail="Email already exists"
                 )
-            user.email = request.email
+            new_values["email"] = request.email
         if request.phone_no is not None and request.phone_no != user.phone_no:
-            temp = cockroach_client.query(
-                User.get_by_field_unique,
+            temp = await cockroach_session.aquery(
+                User.aget_by_field_unique,
                 field="phone_no",
                 match_value=request.phone_no,
                 error_not_exist=False,
@@ -226,11 +255,14 @@ class UserService:
                     status_code=status.HTTP_409_CONFLICT,
                     detail="Phone number already exists",
                 )
-            user.phone_no = request.phone_no
+            new_values["phone_no"] = request.phone_no
         if request.name is not None and request.name != user.name:
-            user.name = request.name
-        cockroach_client.query(
-            User.update_by_id,
-            id=user.id,
-            new_data=user,
+            new_values["name"] = request.name
+        if not new_values:
+            return
+        await cockroach_session.aquery(
+            User.aupdate_by_multiple_field,
+            fields=["id"],
+            match_values=[user.id],
+            new_values=new_values,
         )
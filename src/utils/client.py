@@ -1,8 +1,18 @@
-from src.client.cockroach import CockroachDBClient
+from fastapi import Request
+
+from src.client.cockroach import CockroachDBClient, CockroachDBSession
 from src.client.firebase import FirebaseClient
+from src.utils.job_index import JobIndex
+from src.utils.location_hub import LocationHub
+from src.utils.location_retention import LocationRetention
+from src.utils.write_behind import LocationBuffer
 
 cockroachClient = None
 firebaseClient = None
+jobIndex = None
+locationBuffer = None
+locationRetention = None
+locationHub = None
 
 
 def getCockroachClient():
@@ -17,3 +27,37 @@ def getFirebaseClient():
     if firebaseClient is None:
         firebaseClient = FirebaseClient()
     return firebaseClient
+
+
+def getJobIndex():
+    global jobIndex
+    if jobIndex is None:
+        jobIndex = JobIndex()
+    return jobIndex
+
+
+def getLocationBuffer():
+    global locationBuffer
+    if locationBuffer is None:
+        locationBuffer = LocationBuffer()
+    return locationBuffer
+
+
+def getLocationRetention():
+    global locationRetention
+    if locationRetention is None:
+        locationRetention = LocationRetention()
+    return locationRetention
+
+
+def getLocationHub():
+    global locationHub
+    if locationHub is None:
+        locationHub = LocationHub()
+    return locationHub
+
+
+def getCockroachSession(request: Request) -> CockroachDBSession:
+    # opened by TransactionRoute, which commits, rolls back and retries it; the
+    # auth checks and the endpoint all share this one session/transaction
+    return request.state.cockroach_session
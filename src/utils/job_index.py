@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import logging
+import math
+import os
+from collections import defaultdict
+from uuid import UUID
+
+from src.client.cockroach import CockroachDBClient
+from src.db.tables.job import Jobs
+from src.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# radius of earthdistance's earth(), distances match earth_distance()
+EARTH_RADIUS = 6378168.0
+
+
+def earth_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """great circle distance in meters, computed the way earthdistance does:
+    chord between the ll_to_earth points, then sec_to_gc"""
+    return _chord_to_distance(
+        math.dist(ll_to_earth(lat1, lon1), ll_to_earth(lat2, lon2))
+    )
+
+
+def _chord_to_distance(chord: float) -> float:
+    if chord >= 2 * EARTH_RADIUS:
+        return math.pi * EARTH_RADIUS
+    return 2 * EARTH_RADIUS * math.asin(chord / (2 * EARTH_RADIUS))
+
+
+def ll_to_earth(lat: float, lon: float) -> tuple[float, float, float]:
+    lat, lon = math.radians(float(lat)), math.radians(float(lon))
+    return (
+        EARTH_RADIUS * math.cos(lat) * math.cos(lon),
+        EARTH_RADIUS * math.cos(lat) * math.sin(lon),
+        EARTH_RADIUS * math.sin(lat),
+    )
+
+
+class JobIndex:
+    """open jobs of the jobs table in memory, bucketed into a lat/long grid
+
+    loaded at startup, kept current by the employer service once the writes
+    that add, delete or complete a job have committed, and rebuilt from the
+    table every JOB_INDEX_RECONCILE_SECONDS to pick up writes made by other
+    workers. until the first load has succeeded `ready` is false and job
+    search goes to the database
+    """
+
+    ENV_ENABLED = "JOB_INDEX_ENABLED"
+    ENV_CELL_DEGREES = "JOB_INDEX_CELL_DEGREES"
+    ENV_RECONCILE_SECONDS = "JOB_INDEX_RECONCILE_SECONDS"
+
+    def __init__(self):
+        self.enabled = os.environ.get(self.ENV_ENABLED, "true").lower() == "true"
+        self.cell_degrees = float(os.environ.get(self.ENV_CELL_DEGREES, 0.25))
+        self.reconcile_seconds = float(os.environ.get(self.ENV_RECONCILE_SECONDS, 60))
+        self.ready = False
+        self.reconciles = Counter()
+        self.reconcile_failures = Counter()
+        self._lon_cells = round(360 / self.cell_degrees)
+        # every job with its ll_to_earth point
+        self._jobs: dict[UUID, tuple[Jobs, tuple[float, float, float]]] = {}
+        self._cells: dict[tuple[int, int], set[UUID]] = defaultdict(set)
+        # changes applied since the last reload started, replayed on top of the
+        # reloaded table since the read may have missed them
+        self._recent: dict[UUID, Jobs | None] = {}
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        lat, lon = float(lat), float(lon)
+        return (
+            math.floor((lat + 90) / self.cell_degrees),
+            math.floor((lon + 180) / self.cell_degrees) % self._lon_cells,
+        )
+
+    def _put(self, job: Jobs):
+        self._drop(job.id)
+        self._jobs[job.id] = (job, ll_to_earth(job.location_lat, job.location_long))
+        self._cells[self._cell(job.location_lat, job.location_long)].add(job.id)
+
+    def _drop(self, job_id: UUID):
+        job, _ = self._jobs.pop(job_id, (None, None))
+        if job is None:
+            return
+        cell = self._cell(job.location_lat, job.location_long)
+        self._cells[cell].discard(job_id)
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    def add(self, job: Jobs):
+        if job.deleted is None and job.done is None:
+            self._put(job)
+            self._recent[job.id] = job
+        else:
+            self.remove(job.id)
+
+    def remove(self, job_id: UUID):
+        self._drop(job_id)
+        self._recent[job_id] = None
+
+    def _candidates(self, lat: float, lon: float, radius: float):
+        # rows of cells covering the radius; towards the poles a cell is
+        # narrower, so more of them are needed across
+        lat_span = math.degrees(radius / EARTH_RADIUS)
+        min_lat, max_lat = max(lat - lat_span, -90), min(lat + lat_span, 90)
+        widest = max(abs(min_lat), abs(max_lat))
+        if widest >= 89.9 or lat_span >= 90:
+            lon_span = 180.0
+        else:
+            lon_span = min(lat_span / math.cos(math.radians(widest)), 180.0)
+        rows = range(self._cell(min_lat, 0)[0], self._cell(max_lat, 0)[0] + 1)
+        columns = math.ceil(2 * lon_span / self.cell_degrees) + 1
+        if len(rows) * columns >= len(self._cells):
+            yield from self._jobs.values()
+            return
+        first = self._cell(lat, lon - lon_span)[1]
+        for row in rows:
+            for i in range(min(columns, self._lon_cells)):
+                for job_id in self._cells.get((row, (first + i) % self._lon_cells), ()):
+                    yield self._jobs[job_id]
+
+    def search(
+        self,
+        lat: float,
+        lon: float,
+        radius: float,
+        limit: int,
+        after: tuple[float, UUID] | None = None,
+    ) -> list[tuple[Jobs, float]]:
+        """same result as Jobs.get_nearest_in_radius over open jobs: (job,
+        distance) pairs within radius meters ordered by (distance, id), starting
+        after the given (distance, id)"""
+        center = ll_to_earth(lat, lon)
+        # compare chords first, asin is only needed for the jobs that are close
+        max_chord = (
+            2 * EARTH_RADIUS * math.sin(min(radius / (2 * EARTH_RADIUS), math.pi / 2))
+        )
+        found = []
+        for job, point in self._candidates(lat, lon, radius):
+            chord = math.dist(center, point)
+            if chord > max_chord * (1 + 1e-9):
+                continue
+            distance = _chord_to_distance(chord)
+            if distance > radius:
+                continue
+            if after is not None and (distance, job.id) <= after:
+                continue
+            found.append((distance, job.id, job))
+        return [(job, distance) for distance, _, job in heapq.nsmallest(limit, found)]
+
+    async def load(self, cockroach_client: CockroachDBClient):
+        self._recent = {}
+        jobs: list[Jobs] | None = await cockroach_client.aquery(
+            Jobs.aget_by_multiple_field_multiple,
+            fields=["deleted", "done"],
+            match_values=[None, None],
+            error_not_exist=False,
+        )
+        recent, self._recent = self._recent, {}
+        self._jobs = {}
+        self._cells = defaultdict(set)
+        for job in jobs or []:
+            self._put(job)
+        for job_id, job in recent.items():
+            if job is None:
+                self._drop(job_id)
+            else:
+                self._put(job)
+        self.ready = True
+        self.reconciles.inc()
+
+    async def _reconcile(self, cockroach_client: CockroachDBClient):
+        while True:
+            await asyncio.sleep(self.reconcile_seconds)
+            try:
+                await self.load(cockroach_client)
+            except Exception:
+                self.reconcile_failures.inc()
+                logger.exception("reloading the job index failed")
+
+    async def start(self, cockroach_client: CockroachDBClient):
+        if not self.enabled:
+            return
+        try:
+            await self.load(cockroach_client)
+        except Exception:
+            # search falls back to the database until a reload succeeds
+            self.reconcile_failures.inc()
+            logger.exception("loading the job index failed")
+        self._task = asyncio.create_task(self._reconcile(cockroach_client))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "job_index_ready": int(self.ready),
+            "job_index_jobs": len(self._jobs),
+            "job_index_reconciles_total": self.reconciles.value,
+            "job_index_reconcile_failures_total": self.reconcile_failures.value,
+        }
@@ -0,0 +1,125 @@
+import asyncio
+import os
+from collections import defaultdict, deque
+from uuid import UUID
+
+from src.responses.employee import EmployeeLocationResponse
+from src.utils.metrics import Counter
+
+
+class LocationSubscription:
+    """locations of a set of employees as they are published, for one stream
+
+    holds at most queue_size locations; when the stream falls behind the oldest
+    are dropped, a live map only needs the newest. iterating yields None when
+    nothing arrived for keepalive seconds, and stops once closed or after
+    max_seconds
+    """
+
+    def __init__(
+        self,
+        hub: "LocationHub",
+        employee_ids: set[UUID],
+        queue_size: int,
+        keepalive: float,
+        max_seconds: float,
+    ):
+        self.employee_ids = employee_ids
+        self.keepalive = keepalive
+        self._deadline = asyncio.get_running_loop().time() + max_seconds
+        self._hub = hub
+        self._queue: deque[EmployeeLocationResponse] = deque(maxlen=queue_size)
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def put(self, location: EmployeeLocationResponse):
+        if len(self._queue) == self._queue.maxlen:
+            self._hub.dropped.inc()
+        self._queue.append(location)
+        self._ready.set()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._hub.unsubscribe(self)
+            self._ready.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> EmployeeLocationResponse | None:
+        if not self._queue and not self._closed:
+            remaining = self._deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise StopAsyncIteration
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(
+                    self._ready.wait(), min(self.keepalive, remaining)
+                )
+            except asyncio.TimeoutError:
+                return None
+        if self._queue:
+            return self._queue.popleft()
+        raise StopAsyncIteration
+
+
+class LocationHub:
+    """in-process pub/sub of employee locations
+
+    add_location publishes every accepted ping once its request has committed,
+    the employer location stream subscribes to the employees of the employer.
+    only pings received by this instance are seen: with several instances a
+    stream gets the employees whose pings reach the same one
+    """
+
+    ENV_QUEUE_SIZE = "LOCATION_STREAM_QUEUE_SIZE"
+    ENV_KEEPALIVE_SECONDS = "LOCATION_STREAM_KEEPALIVE_SECONDS"
+    ENV_MAX_SECONDS = "LOCATION_STREAM_MAX_SECONDS"
+
+    def __init__(self):
+        self.queue_size = int(os.environ.get(self.ENV_QUEUE_SIZE, 100))
+        self.keepalive = float(os.environ.get(self.ENV_KEEPALIVE_SECONDS, 15))
+        # streams end after a while and the client reconnects: a server shutting
+        # down waits for open responses, and the employees are read again
+        self.max_seconds = float(os.environ.get(self.ENV_MAX_SECONDS, 300))
+        self.published = Counter()
+        self.dropped = Counter()
+        self._subscriptions: dict[UUID, set[LocationSubscription]] = defaultdict(set)
+        self._all: set[LocationSubscription] = set()
+
+    def subscribe(self, employee_ids: set[UUID]) -> LocationSubscription:
+        subscription = LocationSubscription(
+            self, employee_ids, self.queue_size, self.keepalive, self.max_seconds
+        )
+        for employee_id in employee_ids:
+            self._subscriptions[employee_id].add(subscription)
+        self._all.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LocationSubscription):
+        for employee_id in subscription.employee_ids:
+            subscriptions = self._subscriptions.get(employee_id)
+            if subscriptions is None:
+                continue
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[employee_id]
+        self._all.discard(subscription)
+
+    def publish(self, location: EmployeeLocationResponse):
+        self.published.inc()
+        for subscription in self._subscriptions.get(location.employee_id, ()):
+            subscription.put(location)
+
+    async def stop(self):
+        # ends every stream so shutdown does not wait for clients to hang up
+        for subscription in list(self._all):
+            subscription.close()
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "location_stream_subscribers": len(self._all),
+            "location_stream_published_total": self.published.value,
+            "location_stream_dropped_total": self.dropped.value,
+        }
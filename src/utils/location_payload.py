@@ -0,0 +1,258 @@
+import json
+import math
+import struct
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, Mapping
+
+import msgpack
+from fastapi import HTTPException, status
+from pydantic import TypeAdapter, ValidationError
+from starlette.responses import StreamingResponse
+
+from src.responses.util import Location
+from src.utils.response import STREAM_CHUNK_SIZE
+
+MAX_LOCATION_BATCH = 5000
+
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+CONTENT_TYPE_PACKED = "application/octet-stream"
+# location path responses only
+CONTENT_TYPE_POLYLINE = "application/vnd.google.polyline"
+CONTENT_TYPE_COLUMNS = "application/vnd.location-columns+json"
+
+# polyline coordinates are rounded to 1e-5 degrees (about a meter), columns to
+# 1e-6 degrees
+POLYLINE_SCALE = 10**5
+COLUMNS_SCALE = 10**6
+
+# one packed point: epoch milliseconds, latitude, longitude, little endian
+PACKED_POINT = struct.Struct("<qdd")
+
+_locations = TypeAdapter(list[Location])
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _point(epoch_ms: int, lat: float, lon: float) -> Location:
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise _bad_request("Invalid location")
+    try:
+        created_at = datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        raise _bad_request("Invalid timestamp")
+    return Location.model_construct(
+        location_lat=lat, location_long=lon, created_at=created_at
+    )
+
+
+def _from_json(body: bytes) -> list[Location]:
+    try:
+        locations = _locations.validate_json(body)
+    except ValidationError:
+        raise _bad_request("Invalid locations")
+    # in UTC like the other encodings; a time without an offset is taken as UTC,
+    # it is compared with the aware times of the rest of the batch
+    for location in locations:
+        if location.created_at is not None:
+            if location.created_at.tzinfo is None:
+                location.created_at = location.created_at.replace(tzinfo=timezone.utc)
+            else:
+                location.created_at = location.created_at.astimezone(timezone.utc)
+    return locations
+
+
+def _from_msgpack(body: bytes) -> list[Location]:
+    # an array of [epoch_ms, lat, long] arrays, the packed layout in msgpack
+    try:
+        points = msgpack.unpackb(body, use_list=False)
+        return [
+            _point(int(epoch_ms), float(lat), float(lon))
+            for epoch_ms, lat, lon in points
+        ]
+    except (ValueError, TypeError):
+        raise _bad_request("Invalid locations")
+
+
+def _from_packed(body: bytes) -> list[Location]:
+    if len(body) % PACKED_POINT.size:
+        raise _bad_request("Invalid locations")
+    if len(body) // PACKED_POINT.size > MAX_LOCATION_BATCH:
+        raise _bad_request(f"At most {MAX_LOCATION_BATCH} locations per request")
+    return [
+        _point(epoch_ms, lat, lon)
+        for epoch_ms, lat, lon in PACKED_POINT.iter_unpack(body)
+    ]
+
+
+_DECODERS = {
+    CONTENT_TYPE_JSON: _from_json,
+    CONTENT_TYPE_MSGPACK: _from_msgpack,
+    "application/x-msgpack": _from_msgpack,
+    CONTENT_TYPE_PACKED: _from_packed,
+}
+
+
+def decode_locations(body: bytes, content_type: str | None) -> list[Location]:
+    """timestamped points of a batch upload, by Content-Type:
+    - application/json: an array of Location objects
+    - application/msgpack: an array of [epoch_ms, lat, long] arrays
+    - application/octet-stream: PACKED_POINT records back to back
+    """
+    media_type = (content_type or CONTENT_TYPE_JSON).split(";")[0].strip().lower()
+    decode = _DECODERS.get(media_type)
+    if decode is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported content type {media_type}",
+        )
+    locations = decode(body)
+    if not locations:
+        raise _bad_request("No locations")
+    if len(locations) > MAX_LOCATION_BATCH:
+        raise _bad_request(f"At most {MAX_LOCATION_BATCH} locations per request")
+    return locations
+
+
+def _epoch_ms(created_at: datetime | None) -> int:
+    if created_at is None:
+        return 0
+    if created_at.tzinfo is None:
+        # timestamps of our own rows are UTC
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return round(created_at.timestamp() * 1000)
+
+
+class _PackedEncoder:
+    # PACKED_POINT records back to back, the body add-locations accepts
+    def add(self, location: Location) -> bytes:
+        return PACKED_POINT.pack(
+            _epoch_ms(location.created_at),
+            location.location_lat,
+            location.location_long,
+        )
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _PolylineEncoder:
+    # Google's encoded polyline algorithm; it carries no timestamps
+    def __init__(self):
+        self._lat = self._long = 0
+
+    @staticmethod
+    def _value(delta: int, out: bytearray):
+        value = ~(delta << 1) if delta < 0 else delta << 1
+        while value >= 0x20:
+            out.append((0x20 | (value & 0x1F)) + 63)
+            value >>= 5
+        out.append(value + 63)
+
+    def add(self, location: Location) -> bytes:
+        lat = round(location.location_lat * POLYLINE_SCALE)
+        long = round(location.location_long * POLYLINE_SCALE)
+        out = bytearray()
+        self._value(lat - self._lat, out)
+        self._value(long - self._long, out)
+        self._lat, self._long = lat, long
+        return bytes(out)
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ColumnsEncoder:
+    # one integer array per field, the first value absolute and every later
+    # one the difference to the previous
+    def __init__(self):
+        self._columns = {"created_at": [], "location_lat": [], "location_long": []}
+        self._previous = (0, 0, 0)
+
+    def add(self, location: Location) -> bytes:
+        current = (
+            _epoch_ms(location.created_at),
+            round(location.location_lat * COLUMNS_SCALE),
+            round(location.location_long * COLUMNS_SCALE),
+        )
+        for column, value, previous in zip(
+            self._columns.values(), current, self._previous
+        ):
+            column.append(value - previous)
+        self._previous = current
+        return b""
+
+    def finish(self) -> bytes:
+        return json.dumps(
+            {"scale": COLUMNS_SCALE, **self._columns}, separators=(",", ":")
+        ).encode()
+
+
+_ENCODERS = {
+    CONTENT_TYPE_POLYLINE: _PolylineEncoder,
+    CONTENT_TYPE_COLUMNS: _ColumnsEncoder,
+    CONTENT_TYPE_PACKED: _PackedEncoder,
+}
+
+
+def compact_media_type(accept: str | None) -> str | None:
+    """the compact location path encoding the Accept header asks for, if any"""
+    if not accept:
+        return None
+    for media_range in accept.split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in _ENCODERS:
+            return media_type
+    return None
+
+
+class LocationPathResponse(StreamingResponse):
+    """a location path in one of the compact encodings:
+    - application/vnd.google.polyline: the points as an encoded polyline, 1e-5
+      degrees, without timestamps
+    - application/vnd.location-columns+json: {"scale", "created_at",
+      "location_lat", "location_long"}, integer columns of epoch milliseconds
+      and degrees * scale, each value after the first a delta to the previous
+    - application/octet-stream: PACKED_POINT records, as add-locations takes
+
+    content is a list or a stream of locations; streams are encoded as they
+    come, except for the columns, which need every point first
+    """
+
+    def __init__(
+        self,
+        content: Iterable[Location] | AsyncIterator[Location],
+        media_type: str,
+        headers: Mapping[str, str] | None = None,
+    ):
+        self.content = content
+        super().__init__(
+            self._encode(content, _ENCODERS[media_type]()),
+            headers={**(headers or {}), "Vary": "Accept"},
+            media_type=media_type,
+        )
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # a stream holds a database connection until closed
+            if hasattr(self.content, "aclose"):
+                await self.content.aclose()
+
+    @staticmethod
+    async def _encode(content, encoder) -> AsyncIterator[bytes]:
+        buffer = bytearray()
+        if hasattr(content, "__aiter__"):
+            async for location in content:
+                buffer += encoder.add(location)
+                if len(buffer) >= STREAM_CHUNK_SIZE:
+                    yield bytes(buffer)
+                    buffer.clear()
+        else:
+            for location in content:
+                buffer += encoder.add(location)
+        buffer += encoder.finish()
+        yield bytes(buffer)
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from src.client.cockroach import CockroachDBClient
+from src.db.tables.employee_location import EmployeeLocation
+from src.utils.metrics import Counter
+from src.utils.time import get_current_time
+
+logger = logging.getLogger(__name__)
+
+
+class LocationRetention:
+    """keeps raw location pings for LOCATION_RETENTION_DAYS and hourly rollups
+    of everything older
+
+    at startup and every LOCATION_MAINTENANCE_SECONDS the daily partitions of
+    employee_location for the next LOCATION_PARTITIONS_AHEAD days are created,
+    and the days that ended more than the retention ago are rolled up into
+    employee_location_hourly and dropped. needs the partitioned table of
+    V3.3__partition_employee_location.sql (Postgres)
+    """
+
+    ENV_ENABLED = "LOCATION_RETENTION_ENABLED"
+    ENV_RETENTION_DAYS = "LOCATION_RETENTION_DAYS"
+    ENV_PARTITIONS_AHEAD = "LOCATION_PARTITIONS_AHEAD"
+    ENV_MAINTENANCE_SECONDS = "LOCATION_MAINTENANCE_SECONDS"
+
+    def __init__(self):
+        self.enabled = os.environ.get(self.ENV_ENABLED, "true").lower() == "true"
+        self.retention_days = int(os.environ.get(self.ENV_RETENTION_DAYS, 30))
+        self.partitions_ahead = int(os.environ.get(self.ENV_PARTITIONS_AHEAD, 7))
+        self.maintenance_seconds = float(
+            os.environ.get(self.ENV_MAINTENANCE_SECONDS, 3600)
+        )
+        self.runs = Counter()
+        self.failures = Counter()
+        self.partitions_dropped = Counter()
+        self._task: asyncio.Task | None = None
+
+    def has_rollups(self, start_time: datetime) -> bool:
+        # rollups only ever hold pings older than the retention
+        if start_time.tzinfo is None:
+            # a client time without an offset is UTC, as UTCDateTime binds it
+            start_time = start_time.replace(tzinfo=timezone.utc)
+        return self.enabled and start_time < get_current_time() - timedelta(
+            days=self.retention_days
+        )
+
+    async def maintain(self, cockroach_client: CockroachDBClient):
+        dropped = await cockroach_client.aquery(
+            EmployeeLocation.amaintain,
+            retention_days=self.retention_days,
+            ahead_days=self.partitions_ahead,
+        )
+        self.partitions_dropped.inc(dropped)
+        self.runs.inc()
+
+    async def _run(self, cockroach_client: CockroachDBClient):
+        while True:
+            try:
+                await self.maintain(cockroach_client)
+            except Exception:
+                self.failures.inc()
+                logger.exception("employee_location maintenance failed")
+            await asyncio.sleep(self.maintenance_seconds)
+
+    async def start(self, cockroach_client: CockroachDBClient):
+        if self.enabled:
+            self._task = asyncio.create_task(self._run(cockroach_client))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "location_retention_runs_total": self.runs.value,
+            "location_retention_failures_total": self.failures.value,
+            "location_retention_partitions_dropped_total": self.partitions_dropped.value,
+        }
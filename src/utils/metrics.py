@@ -0,0 +1,70 @@
+import random
+from collections import deque
+from typing import Any
+
+from src.utils.time import get_current_time
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class Timer:
+    """running count / total / max of observed durations (seconds)"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+def render_prometheus(values: dict[str, float]) -> str:
+    return "".join(f"{name} {value}\n" for name, value in values.items())
+
+
+class SlowQueryLog:
+    """the last `size` statements that took at least threshold seconds"""
+
+    EXPLAINABLE = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+    def __init__(self, threshold: float, size: int, explain_rate: float):
+        self.threshold = threshold
+        self.explain_rate = explain_rate
+        self.entries: deque[dict[str, Any]] = deque(maxlen=size)
+        self.count = Counter()
+
+    def observe(self, statement: str, parameters: Any, seconds: float) -> dict | None:
+        """record the statement if it was slow; returns the entry when its plan
+        should be captured (a sampled share of explainable statements)"""
+        if seconds < self.threshold:
+            return None
+        self.count.inc()
+        sql = " ".join(statement.split())
+        if isinstance(parameters, dict):
+            parameters = parameters.values()
+        entry = {
+            "sql": sql,
+            "param_types": [type(p).__name__ for p in parameters or ()],
+            "duration_ms": seconds * 1000,
+            "recorded_at": get_current_time(),
+            "plan": None,
+        }
+        self.entries.append(entry)
+        verb = sql.split(" ", 1)[0].upper()
+        if verb in self.EXPLAINABLE and random.random() < self.explain_rate:
+            return entry
+        return None
@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+MAX_PAGE_SIZE = 1000
+HEADER_NEXT_CURSOR = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    """opaque cursor pointing just after the record with this (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), str(id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (AttributeError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def encode_distance_cursor(distance: float, id: UUID) -> str:
+    """opaque cursor pointing just after the record at this (distance, id)"""
+    raw = json.dumps([distance, str(id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_distance_cursor(cursor: str) -> tuple[float, UUID]:
+    try:
+        distance, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(distance), UUID(id)
+    except (AttributeError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def next_cursor(records: list | None, limit: int | None) -> str | None:
+    # a full page may be followed by more records, a short one is the last
+    if not records or limit is None or len(records) < limit:
+        return None
+    return encode_cursor(records[-1].created_at, records[-1].id)
+
+
+def next_distance_cursor(
+    results: list[tuple[Any, float]] | None, limit: int
+) -> str | None:
+    # results are (record, distance) pairs ordered by (distance, id)
+    if not results or len(results) < limit:
+        return None
+    record, distance = results[-1]
+    return encode_distance_cursor(distance, record.id)
+
+
+def next_cursor_headers(cursor: str | None) -> dict[str, str]:
+    # list bodies stay plain arrays for existing clients, the cursor travels
+    # in a header
+    return {HEADER_NEXT_CURSOR: cursor} if cursor is not None else {}
@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.StreamHandler(sys.stdout))
+logger.propagate = False
+
+
+class RequestStats:
+    """what one request spent on the database and on firebase"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.db_rows = 0
+        self.firebase_calls = 0
+        self.firebase_time = 0.0
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.start
+        return ", ".join(
+            [
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries, {self.db_rows} rows"',
+                f'firebase;dur={self.firebase_time * 1000:.1f};desc="{self.firebase_calls} calls"',
+                f"total;dur={total * 1000:.1f}",
+            ]
+        )
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def record_query(seconds: float, rows: int):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += seconds
+        stats.db_rows += rows
+
+
+def record_firebase(seconds: float):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.firebase_calls += 1
+        stats.firebase_time += seconds
+
+
+def instrument_engine(
+    engine: Engine,
+    on_query: Callable[[str, Any, bool, float], None] | None = None,
+):
+    """count every statement the engine sends into the current request's stats.
+    for an AsyncEngine pass its sync_engine. on_query also gets every statement
+    with its parameters, executemany flag and duration"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        seconds = time.perf_counter() - conn.info.pop("query_start")
+        # rowcount is -1 when the driver does not know it (server-side cursors)
+        record_query(seconds, max(cursor.rowcount, 0))
+        if on_query is not None:
+            on_query(statement, parameters, many, seconds)
+
+
+class RequestStatsMiddleware:
+    """collects RequestStats for every http request, sends them as a
+    Server-Timing header and logs them as one JSON line when the request ends
+
+    the line is a warning when the request ran more than DB_QUERY_BUDGET
+    statements, which usually means a query in a loop
+    """
+
+    ENV_QUERY_BUDGET = "DB_QUERY_BUDGET"
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.query_budget = int(os.environ.get(self.ENV_QUERY_BUDGET, 20))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", stats.server_timing()
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            self._log(scope, status_code, stats)
+
+    def _log(self, scope: Scope, status_code: int, stats: RequestStats):
+        over_budget = stats.db_queries > self.query_budget
+        line = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round((time.perf_counter() - stats.start) * 1000, 1),
+            "db_queries": stats.db_queries,
+            "db_time_ms": round(stats.db_time * 1000, 1),
+            "db_rows": stats.db_rows,
+            "firebase_calls": stats.firebase_calls,
+            "firebase_time_ms": round(stats.firebase_time * 1000, 1),
+        }
+        if over_budget:
+            line["warning"] = f"more than {self.query_budget} queries, possible N+1"
+            logger.warning(json.dumps(line))
+        else:
+            logger.info(json.dumps(line))
@@ -0,0 +1,176 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Mapping
+
+import msgpack
+import orjson
+from pydantic import BaseModel
+from pydantic_core import to_json, to_jsonable_python
+from starlette.responses import Response, StreamingResponse
+
+from src.utils.response_encoding import MEDIA_TYPE_MSGPACK, msgpack_requested
+
+MEDIA_TYPE_NDJSON = "application/x-ndjson"
+MEDIA_TYPE_EVENT_STREAM = "text/event-stream"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class _VaryAccept:
+    # the body depends on the Accept header, so shared caches must key on it
+    def init_headers(self, headers: Mapping[str, str] | None = None):
+        super().init_headers(headers)
+        self.headers.add_vary_header("Accept")
+
+
+class EncodedResponse(_VaryAccept, Response):
+    """default response class of the routers: the JSON-compatible content
+    FastAPI makes of a return value, encoded by orjson, or as msgpack when the
+    request asked for it (see ResponseEncodingMiddleware)
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if msgpack_requested():
+            self.media_type = MEDIA_TYPE_MSGPACK
+            return msgpack.packb(content)
+        return orjson.dumps(content)
+
+
+class ModelResponse(_VaryAccept, Response):
+    """JSON response for content that is already a response model (or a list of
+    them), serialized by pydantic as is; msgpack when the request asked for it
+
+    FastAPI validates plain return values against response_model a second time
+    before serializing them; returning a Response skips that step, while the
+    route's response_model still documents the shape
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if msgpack_requested():
+            self.media_type = MEDIA_TYPE_MSGPACK
+            return msgpack.packb(to_jsonable_python(content))
+        return to_json(content)
+
+
+class StreamingModelResponse(_VaryAccept, StreamingResponse):
+    """streams response models as a JSON array, or as NDJSON (one model per line)
+    when the client accepts application/x-ndjson
+
+    models are encoded as they come and sent in chunks of about
+    STREAM_CHUNK_SIZE bytes, so the whole list is never held in memory. content
+    must have aclose (an async generator)
+    """
+
+    def __init__(
+        self,
+        content: AsyncIterator[BaseModel],
+        accept: str | None = None,
+        headers: Mapping[str, str] | None = None,
+    ):
+        ndjson = accept is not None and MEDIA_TYPE_NDJSON in accept
+        self.content = content
+        super().__init__(
+            self._encode(content, ndjson),
+            headers=headers,
+            media_type=MEDIA_TYPE_NDJSON if ndjson else "application/json",
+        )
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # the body may never be iterated (client gone before it started),
+            # content still holds a database connection then
+            await self.content.aclose()
+
+    @staticmethod
+    async def _encode(
+        content: AsyncIterator[BaseModel], ndjson: bool
+    ) -> AsyncIterator[bytes]:
+        buffer = bytearray() if ndjson else bytearray(b"[")
+        first = True
+        try:
+            async for item in content:
+                if ndjson:
+                    buffer += to_json(item) + b"\n"
+                else:
+                    if not first:
+                        buffer += b","
+                    buffer += to_json(item)
+                first = False
+                if len(buffer) >= STREAM_CHUNK_SIZE:
+                    yield bytes(buffer)
+                    buffer.clear()
+        finally:
+            # also runs when the client goes away mid-stream, releasing the
+            # database connection behind content
+            await content.aclose()
+        if not ndjson:
+            buffer += b"]"
+        yield bytes(buffer)
+
+
+class EventStreamResponse(StreamingResponse):
+    """server-sent events: every model of content is sent as soon as it comes,
+    as one `event` with the model's JSON as data. a None from content is sent
+    as a comment, which keeps proxies from closing an idle stream. content must
+    have aclose, it is closed when the client goes away
+    """
+
+    media_type = MEDIA_TYPE_EVENT_STREAM
+
+    def __init__(self, content: AsyncIterator[BaseModel | None], event: str):
+        self.content = content
+        super().__init__(
+            self._encode(content, event.encode()),
+            # no caching, and no buffering by nginx style proxies
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.content.aclose()
+
+    @staticmethod
+    async def _encode(
+        content: AsyncIterator[BaseModel | None], event: bytes
+    ) -> AsyncIterator[bytes]:
+        try:
+            async for item in content:
+                if item is None:
+                    yield b": keepalive\n\n"
+                else:
+                    yield b"event: " + event + b"\ndata: " + to_json(item) + b"\n\n"
+        finally:
+            await content.aclose()
+
+
+async def map_stream(
+    fn: Callable[[Any], Any], content: AsyncGenerator[Any, None]
+) -> AsyncGenerator[Any, None]:
+    # unlike a generator expression, closing this also closes content
+    try:
+        async for item in content:
+            yield fn(item)
+    finally:
+        await content.aclose()
+
+
+async def merge_stream(
+    items: list[Any], content: AsyncGenerator[Any, None], key: Callable[[Any], Any]
+) -> AsyncGenerator[Any, None]:
+    # items and content, both ordered by key, as one stream ordered by key
+    i = 0
+    try:
+        async for item in content:
+            while i < len(items) and key(items[i]) <= key(item):
+                yield items[i]
+                i += 1
+            yield item
+    finally:
+        await content.aclose()
+    for item in items[i:]:
+        yield item
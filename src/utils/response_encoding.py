@@ -0,0 +1,172 @@
+import os
+import zlib
+from contextvars import ContextVar
+from typing import Callable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional, responses are only gzipped without it
+    brotli = None
+
+MEDIA_TYPE_MSGPACK = "application/msgpack"
+_MSGPACK_TYPES = {MEDIA_TYPE_MSGPACK, "application/x-msgpack"}
+_JSON_TYPES = {"application/json", "*/*", "application/*"}
+
+GZIP_LEVEL = 6
+# brotli's fast end still beats gzip on JSON at a similar cost
+BROTLI_QUALITY = 4
+
+_msgpack_requested: ContextVar[bool] = ContextVar("msgpack_requested", default=False)
+
+
+def msgpack_requested() -> bool:
+    """whether the current request asked for msgpack over JSON"""
+    return _msgpack_requested.get()
+
+
+def _media_types(header: str | None) -> list[tuple[str, float]]:
+    # (value, q) of every entry of an Accept style header, in order
+    entries = []
+    for entry in (header or "").split(","):
+        value, *params = entry.split(";")
+        q = 1.0
+        for param in params:
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        if value.strip():
+            entries.append((value.strip().lower(), q))
+    return entries
+
+
+def _accepts_msgpack(accept: str | None) -> bool:
+    # msgpack when it is listed before JSON
+    for media_type, q in _media_types(accept):
+        if q > 0 and media_type in _MSGPACK_TYPES:
+            return True
+        if q > 0 and media_type in _JSON_TYPES:
+            return False
+    return False
+
+
+def _gzip() -> Callable[[bytes, bool], bytes]:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(data: bytes, last: bool) -> bytes:
+        return compressor.compress(data) + compressor.flush(
+            zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+        )
+
+    return compress
+
+
+def _brotli() -> Callable[[bytes, bool], bytes]:
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(data: bytes, last: bool) -> bytes:
+        return compressor.process(data) + (
+            compressor.finish() if last else compressor.flush()
+        )
+
+    return compress
+
+
+def _compressor(accept_encoding: str | None) -> tuple[str, Callable] | None:
+    encodings = {value: q for value, q in _media_types(accept_encoding)}
+    if brotli is not None and encodings.get("br", 0) > 0:
+        return "br", _brotli
+    if encodings.get("gzip", 0) > 0:
+        return "gzip", _gzip
+    return None
+
+
+class ResponseEncodingMiddleware:
+    """negotiates how responses are encoded:
+    - msgpack instead of JSON for EncodedResponse and ModelResponse when the
+      Accept header lists application/msgpack before JSON
+    - brotli (when installed) or gzip by Accept-Encoding for bodies of at least
+      RESPONSE_COMPRESSION_MIN_SIZE bytes. streamed bodies are compressed chunk
+      by chunk and flushed with every chunk, so nothing is held back; event
+      streams are never compressed
+    """
+
+    ENV_MIN_SIZE = "RESPONSE_COMPRESSION_MIN_SIZE"
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.min_size = int(os.environ.get(self.ENV_MIN_SIZE, 1024))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        token = _msgpack_requested.set(_accepts_msgpack(headers.get("accept")))
+        try:
+            compressor = _compressor(headers.get("accept-encoding"))
+            if compressor is not None:
+                send = _CompressingSend(send, *compressor, self.min_size)
+            await self.app(scope, receive, send)
+        finally:
+            _msgpack_requested.reset(token)
+
+
+class _CompressingSend:
+    # the send of one response; holds back the start message until the first
+    # body chunk shows whether the body is worth compressing
+
+    def __init__(self, send: Send, encoding: str, compressor: Callable, min_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.compressor = compressor
+        self.min_size = min_size
+        self.start: Message | None = None
+        self.compress: Callable[[bytes, bool], bytes] | None = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message):
+        if self.passthrough:
+            await self.send(message)
+        elif message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or headers.get(
+                "content-type", ""
+            ).startswith("text/event-stream"):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.start = message
+        elif message["type"] == "http.response.body":
+            await self._body(message)
+        else:
+            await self.send(message)
+
+    async def _body(self, message: Message):
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compress is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.min_size:
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.compress = self.compressor()
+            headers["Content-Encoding"] = self.encoding
+            del headers["Content-Length"]
+            body = self.compress(body, not more_body)
+            if not more_body:
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.start)
+        else:
+            body = self.compress(body, not more_body)
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
@@ -0,0 +1,29 @@
+from typing import Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from src.client.cockroach import CockroachDBSession
+from src.utils.client import getCockroachClient
+
+
+class TransactionRoute(APIRoute):
+    """runs every request to the route, dependencies included, in one unit of work
+
+    the unit of work is committed when the endpoint returns and rolled back when it
+    raises; serialization conflicts re-run the whole endpoint on the same
+    transaction (see CockroachDBClient.run_transaction). getCockroachSession
+    hands the unit of work to the auth dependencies and the endpoint
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[None, None, Response]]:
+        handler = super().get_route_handler()
+
+        async def transaction_handler(request: Request) -> Response:
+            async def attempt(cockroach_session: CockroachDBSession) -> Response:
+                request.state.cockroach_session = cockroach_session
+                return await handler(request)
+
+            return await getCockroachClient().run_transaction(attempt)
+
+        return transaction_handler
@@ -0,0 +1,118 @@
+import heapq
+import math
+from datetime import datetime, timezone
+from typing import Sequence
+
+from src.responses.util import Location
+from src.utils.job_index import EARTH_RADIUS
+
+
+def _project(points: Sequence[Location]) -> tuple[list[float], list[float]]:
+    # meters on a plane tangent at the mean latitude, plenty for the extent of
+    # one employee's path. longitudes are unwrapped so crossing the antimeridian
+    # does not look like a jump around the globe
+    cos_lat = math.cos(
+        math.radians(sum(point.location_lat for point in points) / len(points))
+    )
+    xs, ys = [], []
+    offset, previous = 0.0, None
+    for point in points:
+        lon = point.location_long + offset
+        if previous is not None and abs(lon - previous) > 180:
+            shift = 360.0 if lon < previous else -360.0
+            offset += shift
+            lon += shift
+        previous = lon
+        xs.append(EARTH_RADIUS * math.radians(lon) * cos_lat)
+        ys.append(EARTH_RADIUS * math.radians(point.location_lat))
+    return xs, ys
+
+
+def _farthest(xs: list[float], ys: list[float], first: int, last: int):
+    # (distance, index) of the point between first and last farthest from the
+    # segment joining them
+    ax, ay = xs[first], ys[first]
+    dx, dy = xs[last] - ax, ys[last] - ay
+    length = dx * dx + dy * dy
+    farthest, index = -1.0, first + 1
+    for i, px, py in zip(
+        range(first + 1, last), xs[first + 1 : last], ys[first + 1 : last]
+    ):
+        px -= ax
+        py -= ay
+        t = px * dx + py * dy
+        if t <= 0.0 or not length:
+            distance = px * px + py * py
+        elif t >= length:
+            distance = (px - dx) ** 2 + (py - dy) ** 2
+        else:
+            # perpendicular distance to the line
+            distance = (px * dy - py * dx) ** 2 / length
+        if distance > farthest:
+            farthest, index = distance, i
+    return math.sqrt(farthest), index
+
+
+def simplify_path(
+    points: Sequence[Location],
+    tolerance_meters: float | None = None,
+    max_points: int | None = None,
+) -> list[Location]:
+    """the points of a time ordered path that keep its shape, Douglas-Peucker
+    style: starting from the two ends, the point farthest from the simplified
+    path is added back while it is more than tolerance_meters off and fewer
+    than max_points are kept. with only max_points this keeps the max_points
+    points that matter most; the first and last points are always kept"""
+    if len(points) <= 2 or (tolerance_meters is None and max_points is None):
+        return list(points)
+    xs, ys = _project(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    kept = 2
+    # segments still worth splitting, farthest deviation first
+    segments = []
+
+    def split(first: int, last: int):
+        if last - first < 2:
+            return
+        distance, index = _farthest(xs, ys, first, last)
+        if tolerance_meters is None or distance > tolerance_meters:
+            heapq.heappush(segments, (-distance, index, first, last))
+
+    split(0, len(points) - 1)
+    while segments and (max_points is None or kept < max_points):
+        _, index, first, last = heapq.heappop(segments)
+        keep[index] = True
+        kept += 1
+        split(first, index)
+        split(index, last)
+    return [point for point, kept_point in zip(points, keep) if kept_point]
+
+
+def _mean(points: Sequence[Location], start: float) -> Location:
+    # longitudes are taken next to the first one, so a bucket on both sides of
+    # the antimeridian does not average to the other side of the globe
+    first = points[0].location_long
+    lon = sum(
+        first + (point.location_long - first + 180) % 360 - 180 for point in points
+    ) / len(points)
+    return Location.model_construct(
+        location_lat=sum(point.location_lat for point in points) / len(points),
+        location_long=(lon + 180) % 360 - 180,
+        created_at=datetime.fromtimestamp(start, timezone.utc),
+    )
+
+
+def bucket_path(points: Sequence[Location], bucket_seconds: float) -> list[Location]:
+    """one point per bucket_seconds of a time ordered path: the mean position of
+    the points in the bucket, at the start of the bucket. buckets are aligned to
+    the epoch, the way the hourly rollups are to the hour"""
+    buckets: list[tuple[float, list[Location]]] = []
+    for point in points:
+        start = (
+            math.floor(point.created_at.timestamp() / bucket_seconds) * bucket_seconds
+        )
+        if not buckets or buckets[-1][0] != start:
+            buckets.append((start, []))
+        buckets[-1][1].append(point)
+    return [_mean(bucket, start) for start, bucket in buckets]
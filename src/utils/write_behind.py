@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.client.cockroach import CockroachDBClient
+from src.db.base import DBSchemaBase
+from src.db.tables.employee_location import EmployeeLocation
+from src.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# wakes the flusher on shutdown
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    """records accepted now and inserted later, many per statement
+
+    put() queues a record and returns; one background task passes the queue to
+    write(db, items) in batches whenever batch_size records are waiting or
+    flush_interval seconds after the first of them arrived. at most max_size
+    records wait: past that put() waits up to put_timeout seconds for room and
+    then answers 503, so a slow database pushes back on clients instead of
+    growing memory. stop() writes out whatever is still queued.
+
+    records are acknowledged before they are written: a batch that still fails
+    after `attempts` tries, or a crash of the process, loses them
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write: Callable[[AsyncSession, list[Any]], Awaitable[Any]],
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        put_timeout: float,
+        attempts: int = 3,
+    ):
+        self.name = name
+        self.write = write
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.attempts = attempts
+        self.written = Counter()
+        self.dropped = Counter()
+        self.rejected = Counter()
+        self.flush_failures = Counter()
+        self._queue: asyncio.Queue | None = None
+        self._full: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._client: CockroachDBClient | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def put(self, item: DBSchemaBase):
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(item), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.rejected.inc()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many pending writes",
+                    headers={"Retry-After": "1"},
+                )
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+
+    def _take(self, batch: list) -> bool:
+        # moves waiting records into the batch; False once _STOP was taken
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return True
+            if item is _STOP:
+                return False
+            batch.append(item)
+        return True
+
+    async def _run(self):
+        running = True
+        while running:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            self._full.clear()
+            if self._queue.qsize() + 1 < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch = [first]
+            running = self._take(batch)
+            await self._write(batch)
+        # shutting down: everything still queued goes out now
+        while True:
+            batch = []
+            self._take(batch)
+            if not batch:
+                return
+            await self._write(batch)
+
+    async def _write(self, batch: list[DBSchemaBase]):
+        for attempt in range(self.attempts):
+            try:
+                await self._client.aquery(self.write, items=batch)
+                self.written.inc(len(batch))
+                return
+            except Exception:
+                self.flush_failures.inc()
+                logger.exception(f"{self.name}: writing {len(batch)} records failed")
+                await asyncio.sleep(self.flush_interval * 2**attempt)
+        self.dropped.inc(len(batch))
+
+    async def start(self, cockroach_client: CockroachDBClient):
+        self._client = cockroach_client
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        await self._queue.put(_STOP)
+        await task
+
+    def metrics(self) -> dict[str, float]:
+        name = self.name
+        return {
+            f"{name}_queued": self._queue.qsize() if self._queue is not None else 0,
+            f"{name}_written_total": self.written.value,
+            f"{name}_dropped_total": self.dropped.value,
+            f"{name}_rejected_total": self.rejected.value,
+            f"{name}_flush_failures_total": self.flush_failures.value,
+        }
+
+
+class LocationBuffer(WriteBehindBuffer):
+    """write-behind for single location pings, written by EmployeeLocation.arecord"""
+
+    ENV_ENABLED = "LOCATION_BUFFER_ENABLED"
+    ENV_MAX_SIZE = "LOCATION_BUFFER_MAX_SIZE"
+    ENV_BATCH_SIZE = "LOCATION_BUFFER_BATCH_SIZE"
+    ENV_FLUSH_MS = "LOCATION_BUFFER_FLUSH_MS"
+    ENV_PUT_TIMEOUT = "LOCATION_BUFFER_PUT_TIMEOUT"
+
+    def __init__(self):
+        super().__init__(
+            "location_buffer",
+            EmployeeLocation.arecord,
+            max_size=int(os.environ.get(self.ENV_MAX_SIZE, 10000)),
+            batch_size=int(os.environ.get(self.ENV_BATCH_SIZE, 500)),
+            flush_interval=float(os.environ.get(self.ENV_FLUSH_MS, 200)) / 1000,
+            put_timeout=float(os.environ.get(self.ENV_PUT_TIMEOUT, 1)),
+        )
+        self.enabled = os.environ.get(self.ENV_ENABLED, "true").lower() == "true"
+
+    async def start(self, cockroach_client: CockroachDBClient):
+        if self.enabled:
+            await super().start(cockroach_client)
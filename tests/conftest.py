@@ -1,12 +1,13 @@
+import asyncio
 import os
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import text
 
 from src.client.cockroach import CockroachDBClient
 from src.client.firebase import FirebaseClient
 from src.db.tables.user import User
-from src.main import app
 from src.utils.enums import UserType
 
 
@@ -15,6 +16,27 @@ def cockroach_client():
     return CockroachDBClient(url=os.environ["COCKROACH_DB_LOCAL_URL"])
 
 
+@pytest.fixture(scope="session")
+def database_client():
+    # the database of DB_NAME, skipping the test when there is none to reach
+    if "DB_NAME" not in os.environ:
+        pytest.skip("no database configured")
+    client = CockroachDBClient()
+
+    async def ping():
+        try:
+            async with client.async_engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+        finally:
+            await client.async_engine.dispose()
+
+    try:
+        asyncio.run(ping())
+    except Exception as e:
+        pytest.skip(f"database unreachable: {e}")
+    return client
+
+
 @pytest.fixture(scope="session")
 def firebase_client():
     return FirebaseClient()
@@ -22,6 +44,8 @@ def firebase_client():
 
 @pytest.fixture(scope="session")
 def app_test_client():
+    from src.main import app
+
     return TestClient(app)
 
 
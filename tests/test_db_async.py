@@ -0,0 +1,172 @@
+import asyncio
+import uuid
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import DBAPIError
+
+from src.db.tables.employee_location import EmployeeLocation
+from src.db.tables.user import User
+from src.responses.util import DurationRequest
+from src.services.employer import EmployerService
+from src.utils.enums import UserType
+from src.utils.location_retention import LocationRetention
+from src.utils.pagination import next_cursor
+from src.utils.time import get_current_time
+
+
+def run(client, fn):
+    # one event loop per test; pooled asyncpg connections belong to it
+    async def main():
+        try:
+            return await fn()
+        finally:
+            await client.async_engine.dispose()
+
+    return asyncio.run(main())
+
+
+def new_user() -> User:
+    key = uuid.uuid4().hex
+    return User(
+        phone_no=f"+0{int(key[:8], 16)}",
+        email=f"{key}@example.com",
+        name="async test",
+        firebase_user_id=key,
+        user_type=UserType.employee,
+    )
+
+
+async def add_locations(client, user, locations):
+    async with client.async_engine.begin() as connection:
+        for schema in (User, EmployeeLocation):
+            table = schema._schema_cls().__table__
+            await connection.run_sync(lambda sync: table.create(sync, checkfirst=True))
+    await client.aquery(User.aadd, items=[user])
+    await client.aquery(EmployeeLocation.aadd_bulk, items=locations)
+
+
+async def remove_locations(client, user, locations):
+    for location in locations:
+        await client.aquery(EmployeeLocation.adelete_by_id, id=location.id)
+    await client.aquery(User.adelete_by_id, id=user.id)
+
+
+def test_timestamps_round_trip(database_client):
+    now = get_current_time()
+    user = new_user()
+    locations = [
+        EmployeeLocation(
+            employee_id=user.id,
+            location_lat=i,
+            location_long=i,
+            created_at=now - timedelta(minutes=3 - i),
+        )
+        for i in range(3)
+    ]
+
+    async def scenario():
+        await add_locations(database_client, user, locations)
+        try:
+            first = await database_client.aquery(
+                EmployeeLocation.aget_by_time_field_multiple,
+                time_field="created_at",
+                start_time=now - timedelta(hours=1),
+                end_time=now,
+                field="employee_id",
+                match_value=user.id,
+                limit=2,
+            )
+            rest = await database_client.aquery(
+                EmployeeLocation.aget_by_time_field_multiple,
+                time_field="created_at",
+                # a client time without an offset is taken as UTC
+                start_time=(now - timedelta(hours=1)).replace(tzinfo=None),
+                end_time=now,
+                field="employee_id",
+                match_value=user.id,
+                limit=2,
+                cursor=next_cursor(first, 2),
+            )
+            updated = await database_client.aquery(
+                EmployeeLocation.aupdate_by_multiple_field,
+                fields=["id", "employee_id"],
+                match_values=[locations[0].id, user.id],
+                new_values={"location_lat": 10.0},
+            )
+            return first, rest, updated
+        finally:
+            await remove_locations(database_client, user, locations)
+
+    first, rest, updated = run(database_client, scenario)
+    assert [record.id for record in first + rest] == [
+        location.id for location in locations
+    ]
+    assert [record.created_at for record in first + rest] == [
+        location.created_at for location in locations
+    ]
+    assert all(record.created_at.tzinfo is not None for record in first + rest)
+    assert [record.location_lat for record in updated] == [10.0]
+    assert updated[0].last_modified_at > now
+
+
+class Conflict(Exception):
+    sqlstate = "40001"
+
+
+def test_streams_take_no_second_connection(database_client):
+    now = get_current_time()
+    user = new_user()
+    locations = [EmployeeLocation(employee_id=user.id, location_lat=1, location_long=1)]
+    # nothing until now, the location is added after it
+    request = DurationRequest(start_time=now - timedelta(hours=1), end_time=now)
+    checked_out = []
+
+    async def stream(cockroach_session, request):
+        # auth looks the user up on the unit of work first
+        await cockroach_session.aquery(User.aget_id, id=user.id)
+        content = await EmployerService.stream_location_path(
+            cockroach_session=cockroach_session,
+            user=user,
+            request=request,
+            location_retention=LocationRetention(),
+        )
+        checked_out.append(database_client.async_engine.pool.checkedout())
+        return content
+
+    async def retried(cockroach_session):
+        content = await stream(
+            cockroach_session,
+            request.model_copy(update={"end_time": get_current_time()}),
+        )
+        if len(checked_out) == 1:
+            raise DBAPIError("SELECT", {}, Conflict())
+        return content
+
+    async def scenario():
+        await add_locations(database_client, user, locations)
+        try:
+            content = await database_client.run_transaction(retried)
+            committed = database_client.async_engine.pool.checkedout()
+            records = [record async for record in content]
+            drained = database_client.async_engine.pool.checkedout()
+            with pytest.raises(HTTPException) as error:
+                await database_client.run_transaction(
+                    lambda cockroach_session: stream(
+                        cockroach_session, request.model_copy(update={"end_time": now})
+                    )
+                )
+            return records, committed, drained, error.value
+        finally:
+            await remove_locations(database_client, user, locations)
+
+    records, committed, drained, error = run(database_client, scenario)
+    assert [(record.location_lat, record.location_long) for record in records] == [
+        (1.0, 1.0)
+    ]
+    # only the unit of work's connection until the response is sent
+    assert checked_out == [1, 1]
+    assert committed == 0
+    assert drained == 0
+    assert error.status_code == 404
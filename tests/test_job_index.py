@@ -0,0 +1,169 @@
+import asyncio
+import random
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from src.db.tables.job import Jobs
+from src.db.tables.user import User
+from src.utils.enums import UserType
+from src.utils.job_index import JobIndex, earth_distance
+from src.utils.pagination import encode_distance_cursor
+from src.utils.time import get_current_time
+
+
+def new_job(lat: float, lon: float, employer_id: uuid.UUID | None = None) -> Jobs:
+    return Jobs(
+        employer_id=employer_id or uuid.uuid4(),
+        title="job",
+        description="job",
+        location_lat=lat,
+        location_long=lon,
+        amount=100,
+    )
+
+
+def around(lat: float, lon: float, degrees: float, n: int) -> list[Jobs]:
+    generator = random.Random(f"{lat} {lon}")
+    return [
+        new_job(
+            max(min(lat + generator.uniform(-degrees, degrees), 90), -90),
+            (lon + generator.uniform(-degrees, degrees) + 180) % 360 - 180,
+        )
+        for _ in range(n)
+    ]
+
+
+def index_of(jobs: list[Jobs]) -> JobIndex:
+    index = JobIndex()
+    for job in jobs:
+        index.add(job)
+    return index
+
+
+def in_radius(jobs, lat, lon, radius):
+    # what the earth_box test and earth_distance cutoff of the SQL path return
+    found = [
+        (job, earth_distance(lat, lon, job.location_lat, job.location_long))
+        for job in jobs
+    ]
+    return sorted(
+        [(job, distance) for job, distance in found if distance <= radius],
+        key=lambda found: (found[1], found[0].id),
+    )
+
+
+@pytest.mark.parametrize(
+    "lat, lon, radius",
+    [
+        (28.6, 77.2, 25_000),
+        (28.6, 77.2, 100_000),
+        # rows of cells across the antimeridian and close to a pole
+        (10.0, 179.9, 50_000),
+        (10.0, -179.9, 50_000),
+        (89.8, 20.0, 100_000),
+        (-89.8, -20.0, 100_000),
+    ],
+)
+def test_search_matches_radius_query(lat, lon, radius):
+    jobs = around(lat, lon, 2, 500)
+    found = index_of(jobs).search(lat, lon, radius, limit=len(jobs))
+    expected = in_radius(jobs, lat, lon, radius)
+    assert [job.id for job, _ in found] == [job.id for job, _ in expected]
+    assert [distance for _, distance in found] == pytest.approx(
+        [distance for _, distance in expected]
+    )
+
+
+def test_search_pages_after_cursor():
+    jobs = around(28.6, 77.2, 0.5, 200)
+    # equal distances are ordered by id
+    jobs += [new_job(28.7, 77.3) for _ in range(5)]
+    index = index_of(jobs)
+    everything = index.search(28.6, 77.2, 100_000, limit=len(jobs))
+    pages, after = [], None
+    while True:
+        page = index.search(28.6, 77.2, 100_000, limit=30, after=after)
+        pages += page
+        if len(page) < 30:
+            break
+        after = (page[-1][1], page[-1][0].id)
+    assert [job.id for job, _ in pages] == [job.id for job, _ in everything]
+    assert len(everything) == len(jobs)
+
+
+def test_closed_jobs_leave_the_index():
+    jobs = around(28.6, 77.2, 0.1, 3)
+    index = index_of(jobs)
+    jobs[0].done = get_current_time()
+    index.add(jobs[0])
+    index.remove(jobs[1].id)
+    assert [job.id for job, _ in index.search(28.6, 77.2, 50_000, 10)] == [jobs[2].id]
+    assert len(index) == 1
+
+
+@pytest.fixture(scope="module")
+def earthdistance(database_client):
+    # the SQL path needs the cube and earthdistance extensions of V2.7
+    async def installed():
+        try:
+            async with database_client.async_engine.connect() as connection:
+                return await connection.scalar(
+                    text(
+                        "SELECT count(*) FROM pg_extension"
+                        " WHERE extname = 'earthdistance'"
+                    )
+                )
+        finally:
+            await database_client.async_engine.dispose()
+
+    if not asyncio.run(installed()):
+        pytest.skip("extension earthdistance is not installed")
+    return database_client
+
+
+def test_search_matches_nearest_in_radius(earthdistance):
+    employer = User(
+        phone_no=f"+0{uuid.uuid4().int % 10**12}",
+        email=f"{uuid.uuid4().hex}@example.com",
+        name="job index test",
+        firebase_user_id=uuid.uuid4().hex,
+        user_type=UserType.employer,
+    )
+    jobs = around(28.6, 77.2, 0.5, 100)
+    for job in jobs:
+        job.employer_id = employer.id
+
+    async def scenario():
+        await earthdistance.aquery(User.aadd, items=[employer])
+        await earthdistance.aquery(Jobs.aadd_bulk, items=jobs)
+        try:
+            pages, cursor = [], None
+            while True:
+                page = await earthdistance.aquery(
+                    Jobs.aget_nearest_in_radius,
+                    lat=28.6,
+                    lon=77.2,
+                    radius=40_000,
+                    fields=["employer_id", "deleted", "done"],
+                    match_values=[employer.id, None, None],
+                    limit=20,
+                    cursor=cursor,
+                )
+                pages += page
+                if len(page) < 20:
+                    return pages
+                cursor = encode_distance_cursor(page[-1][1], page[-1][0].id)
+        finally:
+            for job in jobs:
+                await earthdistance.aquery(Jobs.adelete_by_id, id=job.id)
+            await earthdistance.aquery(User.adelete_by_id, id=employer.id)
+            await earthdistance.async_engine.dispose()
+
+    from_sql = asyncio.run(scenario())
+    found = index_of(jobs).search(28.6, 77.2, 40_000, limit=len(jobs))
+    assert [job.id for job, _ in found] == [job.id for job, _ in from_sql]
+    assert [distance for _, distance in found] == pytest.approx(
+        [distance for _, distance in from_sql]
+    )
@@ -0,0 +1,91 @@
+import asyncio
+import uuid
+
+from src.responses.employee import EmployeeLocationResponse
+from src.utils.location_hub import LocationHub
+from src.utils.time import get_current_time
+
+
+def location_of(employee_id: uuid.UUID, lat: float) -> EmployeeLocationResponse:
+    return EmployeeLocationResponse.model_construct(
+        employee_id=employee_id,
+        location_lat=lat,
+        location_long=0.0,
+        created_at=get_current_time(),
+    )
+
+
+def hub_of(queue_size=100, keepalive=15.0, max_seconds=300.0) -> LocationHub:
+    hub = LocationHub()
+    hub.queue_size = queue_size
+    hub.keepalive = keepalive
+    hub.max_seconds = max_seconds
+    return hub
+
+
+def test_locations_reach_subscribers_of_the_employee():
+    employee, other = uuid.uuid4(), uuid.uuid4()
+
+    async def scenario():
+        hub = hub_of()
+        subscription = hub.subscribe({employee})
+        hub.publish(location_of(other, 1))
+        hub.publish(location_of(employee, 2))
+        received = await anext(subscription)
+        subscription.close()
+        return hub, received
+
+    hub, received = asyncio.run(scenario())
+    assert received.location_lat == 2
+    assert hub.published.value == 2
+    assert hub.metrics()["location_stream_subscribers"] == 0
+
+
+def test_slow_stream_drops_the_oldest():
+    employee = uuid.uuid4()
+
+    async def scenario():
+        hub = hub_of(queue_size=3)
+        subscription = hub.subscribe({employee})
+        for lat in range(5):
+            hub.publish(location_of(employee, lat))
+        received = [(await anext(subscription)).location_lat for _ in range(3)]
+        subscription.close()
+        return hub, received
+
+    hub, received = asyncio.run(scenario())
+    assert received == [2, 3, 4]
+    assert hub.dropped.value == 2
+
+
+def test_keepalive_then_end_after_max_seconds():
+    async def scenario():
+        hub = hub_of(keepalive=0.02, max_seconds=0.1)
+        return [location async for location in hub.subscribe({uuid.uuid4()})]
+
+    received = asyncio.run(scenario())
+    assert received
+    assert all(location is None for location in received)
+
+
+def test_stop_ends_every_stream():
+    employee = uuid.uuid4()
+
+    async def scenario():
+        hub = hub_of()
+        subscriptions = [hub.subscribe({employee}) for _ in range(2)]
+        hub.publish(location_of(employee, 1))
+
+        async def read(subscription):
+            return [location.location_lat async for location in subscription]
+
+        readers = [asyncio.create_task(read(s)) for s in subscriptions]
+        await asyncio.sleep(0)
+        await hub.stop()
+        hub.publish(location_of(employee, 2))
+        return hub, await asyncio.wait_for(asyncio.gather(*readers), 1)
+
+    hub, received = asyncio.run(scenario())
+    # queued before the stop is still delivered, nothing after it
+    assert received == [[1], [1]]
+    assert hub.metrics()["location_stream_subscribers"] == 0
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import msgpack
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete
+
+from src.db.tables.employee_last_location import EmployeeLastLocation
+from src.db.tables.employee_location import EmployeeLocation
+from src.db.tables.user import User
+from src.services.employee import EmployeeService
+from src.utils.enums import UserType
+from src.utils.location_hub import LocationHub
+from src.utils.location_payload import PACKED_POINT, decode_locations
+from src.utils.time import get_current_time
+
+TAKEN_AT = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def test_json_times_are_utc():
+    body = json.dumps(
+        [
+            {
+                "location_lat": 1,
+                "location_long": 1,
+                "created_at": "2024-01-01T12:00:00",
+            },
+            {
+                "location_lat": 2,
+                "location_long": 2,
+                "created_at": "2024-01-01T17:30:00+05:30",
+            },
+            {"location_lat": 3, "location_long": 3},
+        ]
+    ).encode()
+    locations = decode_locations(body, "application/json")
+    assert [location.created_at for location in locations] == [
+        TAKEN_AT,
+        TAKEN_AT,
+        None,
+    ]
+    assert locations[1].created_at.tzinfo == timezone.utc
+
+
+def test_encodings_agree():
+    epoch_ms = round(TAKEN_AT.timestamp() * 1000)
+    bodies = {
+        "application/json": json.dumps(
+            [
+                {
+                    "location_lat": 1.5,
+                    "location_long": 2.5,
+                    "created_at": "2024-01-01T12:00:00Z",
+                }
+            ]
+        ).encode(),
+        "application/msgpack": msgpack.packb([[epoch_ms, 1.5, 2.5]]),
+        "application/octet-stream": PACKED_POINT.pack(epoch_ms, 1.5, 2.5),
+    }
+    for content_type, body in bodies.items():
+        (location,) = decode_locations(body, content_type)
+        assert (location.location_lat, location.location_long) == (1.5, 2.5)
+        assert location.created_at == TAKEN_AT
+
+
+@pytest.mark.parametrize(
+    "body, content_type, status_code",
+    [
+        (b"[]", "application/json", 400),
+        (b"{", "application/json", 400),
+        (b"\x00" * 5, "application/octet-stream", 400),
+        (b"[]", "text/csv", 415),
+    ],
+)
+def test_invalid_batches(body, content_type, status_code):
+    with pytest.raises(HTTPException) as error:
+        decode_locations(body, content_type)
+    assert error.value.status_code == status_code
+
+
+def test_add_locations_of_mixed_batch(database_client):
+    key = uuid.uuid4().hex
+    user = User(
+        phone_no=f"+0{int(key[:8], 16)}",
+        email=f"{key}@example.com",
+        name="location batch test",
+        firebase_user_id=key,
+        user_type=UserType.employee,
+    )
+    newest = get_current_time().replace(microsecond=0) - timedelta(minutes=1)
+    # a time without an offset, one with another offset and one without a time
+    body = json.dumps(
+        [
+            {
+                "location_lat": 1,
+                "location_long": 1,
+                "created_at": newest.replace(tzinfo=None).isoformat(),
+            },
+            {
+                "location_lat": 2,
+                "location_long": 2,
+                "created_at": (newest - timedelta(minutes=5))
+                .astimezone(timezone(timedelta(hours=5, minutes=30)))
+                .isoformat(),
+            },
+            {"location_lat": 3, "location_long": 3},
+        ]
+    ).encode()
+    hub = LocationHub()
+
+    async def remove(db):
+        for table in (EmployeeLastLocation, EmployeeLocation):
+            await db.execute(
+                delete(table._schema_cls()).where(
+                    table.get_field("employee_id") == user.id
+                )
+            )
+
+    async def scenario():
+        await database_client.aquery(User.aadd, items=[user])
+        subscription = hub.subscribe({user.id})
+        try:
+            await database_client.run_transaction(
+                lambda cockroach_session: EmployeeService.add_locations(
+                    locations=decode_locations(body, "application/json"),
+                    user=user,
+                    cockroach_session=cockroach_session,
+                    location_hub=hub,
+                )
+            )
+            published = await anext(subscription)
+            last = await database_client.aquery(
+                EmployeeLastLocation.aget_by_field_unique,
+                field="employee_id",
+                match_value=user.id,
+            )
+            return published, last
+        finally:
+            subscription.close()
+            await database_client.aquery(remove)
+            await database_client.aquery(User.adelete_by_id, id=user.id)
+            await database_client.async_engine.dispose()
+
+    published, last = asyncio.run(scenario())
+    # the point without a time was stamped on arrival, after the others
+    assert published.location_lat == 3
+    assert last.location_lat == 3
+    assert last.located_at > newest
@@ -0,0 +1,29 @@
+from datetime import timedelta, timezone
+
+import pytest
+
+from src.utils.location_retention import LocationRetention
+from src.utils.time import get_current_time
+
+
+def retention_of(enabled=True, retention_days=30) -> LocationRetention:
+    retention = LocationRetention()
+    retention.enabled = enabled
+    retention.retention_days = retention_days
+    return retention
+
+
+@pytest.mark.parametrize("days, expected", [(31, True), (29, False)])
+def test_rollups_only_past_the_retention(days, expected):
+    start_time = get_current_time() - timedelta(days=days)
+    retention = retention_of()
+    assert retention.has_rollups(start_time) is expected
+    # a client time without an offset is taken as UTC
+    assert retention.has_rollups(start_time.replace(tzinfo=None)) is expected
+    offset = timezone(timedelta(hours=-8))
+    assert retention.has_rollups(start_time.astimezone(offset)) is expected
+
+
+def test_no_rollups_when_disabled():
+    start_time = (get_current_time() - timedelta(days=365)).replace(tzinfo=None)
+    assert not retention_of(enabled=False).has_rollups(start_time)
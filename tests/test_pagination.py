@@ -0,0 +1,79 @@
+import uuid
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from src.utils.pagination import (
+    HEADER_NEXT_CURSOR,
+    decode_cursor,
+    decode_distance_cursor,
+    encode_cursor,
+    encode_distance_cursor,
+    next_cursor,
+    next_cursor_headers,
+    next_distance_cursor,
+)
+from src.utils.time import get_current_time
+
+
+class Record:
+    def __init__(self, created_at, id):
+        self.created_at = created_at
+        self.id = id
+
+
+def test_cursor_round_trip():
+    created_at = get_current_time()
+    id = uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, id)) == (created_at, id)
+
+
+def test_cursor_keeps_naive_time():
+    created_at = get_current_time().replace(tzinfo=None)
+    id = uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, id)) == (created_at, id)
+
+
+def test_distance_cursor_round_trip():
+    id = uuid.uuid4()
+    assert decode_distance_cursor(encode_distance_cursor(1234.5678, id)) == (
+        1234.5678,
+        id,
+    )
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "bnVsbA==", "WzEsIDJd"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        decode_distance_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_next_cursor_after_full_page_only():
+    now = get_current_time()
+    records = [Record(now + timedelta(seconds=i), uuid.uuid4()) for i in range(3)]
+    assert decode_cursor(next_cursor(records, 3)) == (
+        records[-1].created_at,
+        records[-1].id,
+    )
+    assert next_cursor(records, 4) is None
+    assert next_cursor([], 3) is None
+    assert next_cursor(records, None) is None
+
+
+def test_next_distance_cursor():
+    results = [(Record(None, uuid.uuid4()), float(i)) for i in range(2)]
+    assert decode_distance_cursor(next_distance_cursor(results, 2)) == (
+        1.0,
+        results[-1][0].id,
+    )
+    assert next_distance_cursor(results, 3) is None
+
+
+def test_next_cursor_headers():
+    assert next_cursor_headers(None) == {}
+    assert next_cursor_headers("abc") == {HEADER_NEXT_CURSOR: "abc"}
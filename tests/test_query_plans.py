@@ -0,0 +1,558 @@
+"""EXPLAIN every query shape the services send and fail on full table scans
+
+seeds synthetic users, mappings, jobs, tasks, payments, ratings and locations
+into the database of DB_NAME, runs each DBSchemaBase reader and guarded update
+with the arguments the services pass, and checks the plan of every statement
+that reached the database. writes made by the shapes are rolled back and the
+seeded rows are deleted again at the end; skipped when no database is configured
+
+    sh deploy/local_test.sh plan-check
+"""
+
+import random
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+import pytest
+from sqlalchemy import delete, event, text
+from sqlalchemy.orm import Session
+
+from src.client.cockroach import CockroachDBClient
+from src.db.tables.employee_last_location import EmployeeLastLocation
+from src.db.tables.employee_location import EmployeeLocation
+from src.db.tables.employee_location_hourly import EmployeeLocationHourly
+from src.db.tables.employee_mapping import EmployeeMapping
+from src.db.tables.job import Jobs
+from src.db.tables.payment import Payment
+from src.db.tables.ratings import Rating
+from src.db.tables.task import Task
+from src.db.tables.user import User
+from src.db.views.payment import PaymentDetails
+from src.db.views.rate import RatingView
+from src.responses.job import DEFAULT_SEARCH_LIMIT, DEFAULT_SEARCH_RADIUS
+from src.utils.enums import EmployeeStatus, UserType
+from src.utils.pagination import MAX_PAGE_SIZE, encode_cursor
+from src.utils.time import get_current_time
+
+EMPLOYERS = 20
+EMPLOYEES_PER_EMPLOYER = 25
+JOBS_PER_EMPLOYER = 50
+TASKS_PER_EMPLOYEE = 10
+PAYMENTS_PER_EMPLOYEE = 10
+LOCATIONS_PER_EMPLOYEE = 50
+
+TABLES = [
+    "user_accounts",
+    "employee_mapping",
+    "jobs",
+    "task",
+    "payments",
+    "rating",
+    "employee_location",
+    "employee_last_location",
+]
+
+# Postgres names the node "Seq Scan on <table>", CockroachDB prints the spans of
+# an unconstrained scan as "FULL SCAN"
+FULL_SCAN = re.compile(r"Seq Scan on|FULL SCAN")
+# a sort node means the rows did not come out of an index in (created_at, id)
+# order; the "Sort Key" of a merge over partitions is no sort
+SORT = re.compile(
+    r"^\s*(->\s+)?(Incremental )?Sort\s+\(|•\s+(sort|top-k)\b", re.MULTILINE
+)
+
+
+@dataclass
+class Seed:
+    users: list[User]
+    employer: User
+    employee: User
+    job: Jobs
+    task: Task
+    payment: Payment
+    locations: list[EmployeeLocation]
+    start_time: datetime
+    end_time: datetime
+
+
+@dataclass
+class QueryShape:
+    name: str
+    fn: Callable[..., Any]
+    # the arguments the services pass, for the seeded rows
+    kwargs: Callable[[Seed], dict[str, Any]]
+    # keyset pages have to be read from the index in order, not sorted
+    ordered: bool = False
+    # shapes on Postgres-only schema: earthdistance functions, the partitioned
+    # location tables
+    postgres_only: bool = False
+    # the Postgres extension the statement calls into
+    extension: str | None = None
+
+
+def load(db: Session) -> Seed:
+    tag = uuid.uuid4().hex[:8]
+    now = get_current_time()
+    start_time = now - timedelta(days=1)
+
+    def user(i: int, user_type: UserType) -> User:
+        return User(
+            phone_no=f"plan-check-{tag}-{i}",
+            email=f"{tag}-{i}@plan-check.invalid",
+            name=f"plan check {i}",
+            firebase_user_id=f"plan-check-{tag}-{i}",
+            user_type=user_type,
+        )
+
+    employers = [user(i, UserType.employer) for i in range(EMPLOYERS)]
+    employees = [
+        user(EMPLOYERS + i, UserType.employee)
+        for i in range(EMPLOYERS * EMPLOYEES_PER_EMPLOYER)
+    ]
+    owner = {e.id: employers[i % EMPLOYERS] for i, e in enumerate(employees)}
+    mappings = [
+        EmployeeMapping(employee_id=e.id, employer_id=owner[e.id].id) for e in employees
+    ]
+    jobs = [
+        Jobs(
+            employer_id=employer.id,
+            title=f"job {i}",
+            description=f"job {i}",
+            location_lat=random.uniform(8, 35),
+            location_long=random.uniform(68, 97),
+            amount=100,
+        )
+        for employer in employers
+        for i in range(JOBS_PER_EMPLOYER)
+    ]
+    tasks = [
+        Task(
+            employee_id=e.id,
+            employer_id=owner[e.id].id,
+            heading=f"task {i}",
+            created_at=start_time + timedelta(minutes=i),
+        )
+        for e in employees
+        for i in range(TASKS_PER_EMPLOYEE)
+    ]
+    payments = [
+        Payment(
+            from_user_id=owner[e.id].id,
+            to_user_id=e.id,
+            remarks=f"payment {i}",
+            amount=100,
+            created_at=start_time + timedelta(minutes=i),
+        )
+        for e in employees
+        for i in range(PAYMENTS_PER_EMPLOYEE)
+    ]
+    ratings = [
+        Rating(user_from=e.id, user_to=owner[e.id].id, rate=5) for e in employees
+    ]
+    locations = [
+        EmployeeLocation(
+            employee_id=e.id,
+            location_lat=random.uniform(8, 35),
+            location_long=random.uniform(68, 97),
+            created_at=start_time + timedelta(minutes=i),
+        )
+        for e in employees
+        for i in range(LOCATIONS_PER_EMPLOYEE)
+    ]
+    users = employers + employees
+    User.add_bulk(db, users)
+    EmployeeMapping.add_bulk(db, mappings)
+    Jobs.add_bulk(db, jobs)
+    Task.add_bulk(db, tasks)
+    Payment.add_bulk(db, payments)
+    Rating.add_bulk(db, ratings)
+    EmployeeLocation.add_bulk(db, locations)
+    latest = {
+        loc.employee_id: loc
+        for loc in sorted(locations, key=lambda loc: loc.created_at)
+    }
+    EmployeeLastLocation.add_bulk(
+        db,
+        [
+            EmployeeLastLocation(
+                employee_id=loc.employee_id,
+                location_lat=loc.location_lat,
+                location_long=loc.location_long,
+                located_at=loc.created_at,
+            )
+            for loc in latest.values()
+        ],
+    )
+    employee = employees[0]
+    return Seed(
+        users=users,
+        employer=owner[employee.id],
+        employee=employee,
+        job=jobs[0],
+        task=tasks[0],
+        payment=payments[0],
+        locations=[loc for loc in locations if loc.employee_id == employee.id],
+        start_time=start_time,
+        end_time=now,
+    )
+
+
+def unload(db: Session, user_ids: list[uuid.UUID]):
+    for table, field in [
+        (EmployeeLastLocation, "employee_id"),
+        (EmployeeLocation, "employee_id"),
+        (Rating, "user_from"),
+        (Payment, "to_user_id"),
+        (Task, "employee_id"),
+        (Jobs, "employer_id"),
+        (EmployeeMapping, "employee_id"),
+        (User, "id"),
+    ]:
+        db.execute(
+            delete(table._schema_cls()).where(table.get_field(field).in_(user_ids))
+        )
+
+
+def analyze(client: CockroachDBClient):
+    # fresh statistics so the planner sees the seeded volumes. CockroachDB does
+    # not collect statistics inside an explicit transaction
+    with client.engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as conn:
+        for table in TABLES:
+            conn.execute(text(f"ANALYZE {table}"))
+
+
+def is_cockroach(client: CockroachDBClient) -> bool:
+    with client.engine.connect() as conn:
+        return "CockroachDB" in conn.execute(text("SELECT version()")).scalar()
+
+
+def duration(seed: Seed) -> dict[str, Any]:
+    return {
+        "time_field": "created_at",
+        "start_time": seed.start_time,
+        "end_time": seed.end_time,
+    }
+
+
+def cursor(seed: Seed) -> str:
+    return encode_cursor(seed.locations[9].created_at, seed.locations[9].id)
+
+
+# the reads and guarded updates the services and auth dependencies issue
+SHAPES = [
+    QueryShape(
+        "user by firebase id",
+        User.get_by_field_unique,
+        lambda seed: {
+            "field": "firebase_user_id",
+            "match_value": seed.employee.firebase_user_id,
+        },
+    ),
+    QueryShape(
+        "user by phone",
+        User.get_by_field_unique,
+        lambda seed: {"field": "phone_no", "match_value": seed.employee.phone_no},
+    ),
+    QueryShape(
+        "user by email",
+        User.get_by_field_unique,
+        lambda seed: {"field": "email", "match_value": seed.employee.email},
+    ),
+    QueryShape("user by id", User.get_id, lambda seed: {"id": seed.employee.id}),
+    QueryShape(
+        "users by id list",
+        User.get_by_field_value_list,
+        lambda seed: {
+            "field": "id",
+            "match_values": [u.id for u in seed.users[:50]],
+            "columns": ["id", "name", "phone_no", "email"],
+        },
+    ),
+    QueryShape(
+        "user update",
+        User.update_by_multiple_field,
+        lambda seed: {
+            "fields": ["id"],
+            "match_values": [seed.employee.id],
+            "new_values": {"name": "plan check"},
+        },
+    ),
+    QueryShape(
+        "current mapping of employee",
+        EmployeeMapping.get_by_multiple_field_unique,
+        lambda seed: {
+            "fields": ["employee_id", "deleted"],
+            "match_values": [seed.employee.id, None],
+        },
+    ),
+    QueryShape(
+        "current mapping of employee under employer",
+        EmployeeMapping.get_by_multiple_field_unique,
+        lambda seed: {
+            "fields": ["employee_id", "employer_id", "deleted"],
+            "match_values": [seed.employee.id, seed.employer.id, None],
+        },
+    ),
+    QueryShape(
+        "mappings of employer",
+        EmployeeMapping.get_by_field_multiple,
+        lambda seed: {
+            "field": "employer_id",
+            "match_value": seed.employer.id,
+            "columns": ["employee_id", "status", "title", "deleted", "created_at"],
+        },
+    ),
+    QueryShape(
+        "leave job",
+        EmployeeMapping.update_by_multiple_field,
+        lambda seed: {
+            "fields": ["employee_id", "deleted"],
+            "match_values": [seed.employee.id, None],
+            "new_values": {
+                "deleted": get_current_time(),
+                "status": EmployeeStatus.left,
+            },
+        },
+    ),
+    QueryShape(
+        "remove employee",
+        EmployeeMapping.update_by_multiple_field,
+        lambda seed: {
+            "fields": ["employee_id", "employer_id", "deleted"],
+            "match_values": [seed.employee.id, seed.employer.id, None],
+            "new_values": {
+                "deleted": get_current_time(),
+                "status": EmployeeStatus.removed,
+            },
+        },
+    ),
+    QueryShape("job by id", Jobs.get_id, lambda seed: {"id": seed.job.id}),
+    QueryShape(
+        "open job of employer",
+        Jobs.get_by_multiple_field_unique,
+        lambda seed: {
+            "fields": ["id", "employer_id", "deleted"],
+            "match_values": [seed.job.id, seed.job.employer_id, None],
+        },
+    ),
+    QueryShape(
+        "jobs of employer, first page",
+        Jobs.get_by_field_multiple,
+        lambda seed: {
+            "field": "employer_id",
+            "match_value": seed.job.employer_id,
+            "limit": MAX_PAGE_SIZE,
+        },
+        ordered=True,
+    ),
+    QueryShape(
+        "complete job",
+        Jobs.update_by_multiple_field,
+        lambda seed: {
+            "fields": ["id", "employer_id", "deleted", "done"],
+            "match_values": [seed.job.id, seed.job.employer_id, None, None],
+            "new_values": {"done": get_current_time()},
+        },
+    ),
+    QueryShape(
+        "open jobs near a location",
+        Jobs.get_nearest_in_radius,
+        lambda seed: {
+            "lat": seed.job.location_lat,
+            "lon": seed.job.location_long,
+            "radius": DEFAULT_SEARCH_RADIUS,
+            "fields": ["deleted", "done"],
+            "match_values": [None, None],
+            "limit": DEFAULT_SEARCH_LIMIT,
+        },
+        postgres_only=True,
+        extension="earthdistance",
+    ),
+    QueryShape("task by id", Task.get_id, lambda seed: {"id": seed.task.id}),
+    QueryShape(
+        "tasks of employee, first page",
+        Task.get_by_time_field_multiple,
+        lambda seed: {
+            **duration(seed),
+            "field": "employee_id",
+            "match_value": seed.employee.id,
+            "limit": MAX_PAGE_SIZE,
+        },
+        ordered=True,
+    ),
+    QueryShape(
+        "complete task",
+        Task.update_by_multiple_field,
+        lambda seed: {
+            "fields": ["id", "deleted", "completed"],
+            "match_values": [seed.task.id, None, None],
+            "new_values": {"completed": get_current_time()},
+        },
+    ),
+    QueryShape(
+        "location path, first page",
+        EmployeeLocation.get_by_time_field_multiple,
+        lambda seed: {
+            **duration(seed),
+            "field": "employee_id",
+            "match_value": seed.employee.id,
+            "limit": 10,
+            "columns": ["id", "created_at", "location_lat", "location_long"],
+        },
+        ordered=True,
+    ),
+    QueryShape(
+        "location path, next page",
+        EmployeeLocation.get_by_time_field_multiple,
+        lambda seed: {
+            **duration(seed),
+            "field": "employee_id",
+            "match_value": seed.employee.id,
+            "limit": 10,
+            "cursor": cursor(seed),
+            "columns": ["id", "created_at", "location_lat", "location_long"],
+        },
+        ordered=True,
+    ),
+    QueryShape(
+        "live locations of employer",
+        EmployeeLastLocation.get_of_employer,
+        lambda seed: {
+            "employer_id": seed.employer.id,
+            "columns": ["employee_id", "location_lat", "location_long", "located_at"],
+        },
+    ),
+    QueryShape(
+        # (employee_id, created_at) is unique, the id only breaks no ties
+        "hourly location rollups, first page",
+        EmployeeLocationHourly.get_by_time_field_multiple,
+        lambda seed: {
+            **duration(seed),
+            "field": "employee_id",
+            "match_value": seed.employee.id,
+            "limit": 10,
+            "columns": ["id", "created_at", "location_lat", "location_long"],
+        },
+        # employee_location_hourly comes with the partitioned table
+        postgres_only=True,
+    ),
+    QueryShape("payment by id", Payment.get_id, lambda seed: {"id": seed.payment.id}),
+    QueryShape(
+        "approve payment",
+        Payment.update_by_multiple_field,
+        lambda seed: {
+            "fields": ["id", "to_user_id", "approved_at"],
+            "match_values": [seed.payment.id, seed.employee.id, None],
+            "new_values": {"approved_at": get_current_time()},
+        },
+    ),
+    QueryShape(
+        "payments sent, first page",
+        PaymentDetails.get_by_time_field_multiple,
+        lambda seed: {
+            **duration(seed),
+            "field": "sender_id",
+            "match_value": seed.employer.id,
+            "limit": MAX_PAGE_SIZE,
+        },
+        ordered=True,
+    ),
+    QueryShape(
+        "payments received, first page",
+        PaymentDetails.get_by_time_field_multiple,
+        lambda seed: {
+            **duration(seed),
+            "field": "receiver_id",
+            "match_value": seed.employee.id,
+            "limit": MAX_PAGE_SIZE,
+        },
+        ordered=True,
+    ),
+    QueryShape(
+        "payments between employer and employee",
+        PaymentDetails.get_by_multiple_field_multiple,
+        lambda seed: {
+            "fields": ["sender_id", "receiver_id"],
+            "match_values": [seed.employer.id, seed.employee.id],
+        },
+    ),
+    QueryShape(
+        "rating of user", RatingView.get_id, lambda seed: {"id": seed.employer.id}
+    ),
+]
+
+
+def plan_problems(
+    client: CockroachDBClient, shape: QueryShape, seed: Seed, cockroach: bool
+) -> list[str]:
+    """run the shape, then EXPLAIN every statement it sent; returns what is
+    wrong with their plans"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, many):
+        statements.append((statement, parameters))
+
+    session = client.get_session_maker()()
+    try:
+        if not cockroach:
+            # a sequential scan is then only chosen when no index can serve
+            # the query at all, whatever the size of the table
+            session.execute(text("SET LOCAL enable_seqscan = off"))
+            if shape.ordered:
+                # likewise a sort, when no index returns the page in order
+                session.execute(text("SET LOCAL enable_sort = off"))
+        event.listen(client.engine, "before_cursor_execute", record)
+        try:
+            shape.fn(session, **shape.kwargs(seed))
+        finally:
+            event.remove(client.engine, "before_cursor_execute", record)
+        problems = []
+        for statement, parameters in statements:
+            result = session.connection().exec_driver_sql(
+                f"EXPLAIN {statement}", parameters
+            )
+            plan = "\n".join(str(row[0]) for row in result)
+            if FULL_SCAN.search(plan):
+                problems.append(f"full scan in\n{statement}\n{plan}")
+            elif shape.ordered and SORT.search(plan):
+                problems.append(f"sort instead of index order in\n{statement}\n{plan}")
+        return problems
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture(scope="module")
+def cockroach(database_client) -> bool:
+    return is_cockroach(database_client)
+
+
+@pytest.fixture(scope="module")
+def extensions(database_client) -> set[str]:
+    with database_client.engine.connect() as conn:
+        return set(conn.execute(text("SELECT extname FROM pg_extension")).scalars())
+
+
+@pytest.fixture(scope="module")
+def seed(database_client):
+    seed = database_client.query(load)
+    try:
+        analyze(database_client)
+        yield seed
+    finally:
+        database_client.query(unload, user_ids=[u.id for u in seed.users])
+
+
+@pytest.mark.parametrize("shape", SHAPES, ids=lambda shape: shape.name)
+def test_query_plan(database_client, cockroach, extensions, seed, shape):
+    if cockroach and shape.postgres_only:
+        pytest.skip("Postgres only schema")
+    if shape.extension is not None and shape.extension not in extensions:
+        pytest.skip(f"extension {shape.extension} is not installed")
+    problems = plan_problems(database_client, shape, seed, cockroach)
+    assert not problems, "\n\n".join(problems)
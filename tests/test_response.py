@@ -0,0 +1,64 @@
+import msgpack
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.responses.util import Location
+from src.utils.response import EncodedResponse, ModelResponse, StreamingModelResponse
+from src.utils.response_encoding import ResponseEncodingMiddleware
+
+LOCATIONS = [Location(location_lat=i, location_long=i) for i in range(3)]
+
+
+async def stream():
+    for location in LOCATIONS:
+        yield location
+
+
+def app_of() -> FastAPI:
+    app = FastAPI(default_response_class=EncodedResponse)
+    app.add_middleware(ResponseEncodingMiddleware)
+
+    @app.get("/encoded")
+    def get_encoded():
+        return {"locations": [location.model_dump() for location in LOCATIONS]}
+
+    @app.get("/model")
+    def get_model():
+        return ModelResponse(LOCATIONS)
+
+    @app.get("/stream")
+    def get_stream():
+        return StreamingModelResponse(stream())
+
+    return app
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app_of())
+
+
+@pytest.mark.parametrize("path", ["/encoded", "/model", "/stream"])
+def test_negotiated_responses_vary_on_accept(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "identity"})
+    assert response.headers["content-type"] == "application/json"
+    assert "Accept" in response.headers["vary"]
+
+
+@pytest.mark.parametrize("path", ["/encoded", "/model"])
+def test_msgpack_by_accept(client, path):
+    json = client.get(path, headers={"Accept": "application/json"}).json()
+    response = client.get(path, headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert "Accept" in response.headers["vary"]
+    assert msgpack.unpackb(response.content) == json
+
+
+def test_compressed_response_varies_on_both(monkeypatch):
+    monkeypatch.setenv(ResponseEncodingMiddleware.ENV_MIN_SIZE, "0")
+    client = TestClient(app_of())
+    response = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    vary = {value.strip() for value in response.headers["vary"].split(",")}
+    assert vary == {"Accept", "Accept-Encoding"}
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.responses.util import Location
+from src.utils.trajectory import bucket_path, simplify_path
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def path_of(coordinates, seconds: float = 10) -> list[Location]:
+    return [
+        Location(
+            location_lat=lat,
+            location_long=lon,
+            created_at=START + timedelta(seconds=i * seconds),
+        )
+        for i, (lat, lon) in enumerate(coordinates)
+    ]
+
+
+def test_straight_line_keeps_its_ends():
+    path = path_of([(28.6, 77.2 + i * 0.001) for i in range(50)])
+    assert simplify_path(path, tolerance_meters=1) == [path[0], path[-1]]
+
+
+def test_tolerance_keeps_the_corner():
+    # an L: 20 points north, then 20 east
+    path = path_of(
+        [(28.6 + i * 0.001, 77.2) for i in range(20)]
+        + [(28.619, 77.2 + i * 0.001) for i in range(1, 21)]
+    )
+    assert simplify_path(path, tolerance_meters=5) == [path[0], path[19], path[-1]]
+
+
+def test_max_points_keeps_the_largest_deviations():
+    # a zigzag with one spike far larger than the rest
+    coordinates = [(28.6 + (i % 2) * 0.0001, 77.2 + i * 0.001) for i in range(30)]
+    coordinates[15] = (28.7, coordinates[15][1])
+    path = path_of(coordinates)
+    simplified = simplify_path(path, max_points=3)
+    assert simplified == [path[0], path[15], path[-1]]
+
+
+def test_nothing_to_simplify():
+    path = path_of([(28.6, 77.2), (28.7, 77.3)])
+    assert simplify_path(path, tolerance_meters=1) == path
+    assert simplify_path(path_of([(0, i) for i in range(5)])) == path_of(
+        [(0, i) for i in range(5)]
+    )
+
+
+def test_antimeridian_is_no_detour():
+    path = path_of([(10.0, 179.998 + i * 0.001) for i in range(5)])
+    path = [
+        point.model_copy(
+            update={"location_long": (point.location_long + 180) % 360 - 180}
+        )
+        for point in path
+    ]
+    assert simplify_path(path, tolerance_meters=1) == [path[0], path[-1]]
+
+
+def test_buckets_average_positions_at_their_start():
+    path = path_of([(10.0 + i, 20.0 + i) for i in range(6)], seconds=20)
+    buckets = bucket_path(path, 60)
+    assert [point.created_at for point in buckets] == [
+        START,
+        START + timedelta(seconds=60),
+    ]
+    assert [point.location_lat for point in buckets] == pytest.approx([11.0, 14.0])
+    assert [point.location_long for point in buckets] == pytest.approx([21.0, 24.0])
+
+
+def test_buckets_are_aligned_to_the_epoch():
+    path = path_of([(0, 0), (1, 1)], seconds=50)
+    path = [
+        point.model_copy(
+            update={"created_at": point.created_at + timedelta(seconds=30)}
+        )
+        for point in path
+    ]
+    # 00:00:30 and 00:01:20 fall in the minutes starting 00:00 and 00:01
+    assert [point.created_at for point in bucket_path(path, 60)] == [
+        START,
+        START + timedelta(seconds=60),
+    ]
+
+
+def test_bucket_across_the_antimeridian():
+    path = path_of([(0, 179.9), (0, -179.9)])
+    (bucket,) = bucket_path(path, 60)
+    assert abs(bucket.location_long) == pytest.approx(180)
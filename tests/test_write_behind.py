@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import DBAPIError
+
+from src.db.tables.employee_location import EmployeeLocation
+from src.db.tables.user import User
+from src.responses.util import Location
+from src.services.employee import EmployeeService
+from src.utils.enums import UserType
+from src.utils.location_hub import LocationHub
+from src.utils.write_behind import WriteBehindBuffer
+
+
+class Client:
+    # runs the buffer's writes without a database
+    async def aquery(self, fn, **kwargs):
+        return await fn(None, **kwargs)
+
+
+class Writes:
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self.written = asyncio.Event()
+
+    async def __call__(self, db, items):
+        if self.fail:
+            raise RuntimeError("write failed")
+        self.batches.append(list(items))
+        self.written.set()
+
+
+def buffer_of(writes, **kwargs) -> WriteBehindBuffer:
+    options = {
+        "max_size": 100,
+        "batch_size": 3,
+        "flush_interval": 10,
+        "put_timeout": 1,
+        **kwargs,
+    }
+    return WriteBehindBuffer("test_buffer", writes, **options)
+
+
+def test_flush_when_batch_is_full():
+    async def scenario():
+        writes = Writes()
+        buffer = buffer_of(writes)
+        await buffer.start(Client())
+        for i in range(3):
+            await buffer.put(i)
+        await asyncio.wait_for(writes.written.wait(), 1)
+        await buffer.stop()
+        return writes.batches, buffer
+
+    batches, buffer = asyncio.run(scenario())
+    assert batches == [[0, 1, 2]]
+    assert buffer.written.value == 3
+
+
+def test_flush_after_interval():
+    async def scenario():
+        writes = Writes()
+        buffer = buffer_of(writes, batch_size=100, flush_interval=0.05)
+        await buffer.start(Client())
+        await buffer.put(0)
+        await buffer.put(1)
+        await asyncio.wait_for(writes.written.wait(), 1)
+        batches = list(writes.batches)
+        await buffer.stop()
+        return batches
+
+    assert asyncio.run(scenario()) == [[0, 1]]
+
+
+def test_stop_writes_everything_queued():
+    async def scenario():
+        writes = Writes()
+        buffer = buffer_of(writes, batch_size=2)
+        await buffer.start(Client())
+        for i in range(5):
+            buffer._queue.put_nowait(i)
+        await buffer.stop()
+        return writes.batches, buffer
+
+    batches, buffer = asyncio.run(scenario())
+    assert [item for batch in batches for item in batch] == list(range(5))
+    assert all(len(batch) <= 2 for batch in batches)
+    assert not buffer.running
+
+
+def test_full_buffer_answers_503():
+    async def scenario():
+        buffer = buffer_of(Writes(), max_size=2, batch_size=10, put_timeout=0.05)
+        # not started: nothing takes records off the queue
+        buffer._queue = asyncio.Queue(maxsize=2)
+        buffer._full = asyncio.Event()
+        await buffer.put(0)
+        await buffer.put(1)
+        with pytest.raises(HTTPException) as error:
+            await buffer.put(2)
+        return error.value, buffer
+
+    error, buffer = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "1"}
+    assert buffer.rejected.value == 1
+
+
+def test_failed_batch_is_dropped_after_attempts():
+    async def scenario():
+        buffer = buffer_of(Writes(fail=True), flush_interval=0.01, attempts=2)
+        await buffer.start(Client())
+        for i in range(3):
+            await buffer.put(i)
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert buffer.dropped.value == 3
+    assert buffer.flush_failures.value == 2
+    assert buffer.written.value == 0
+
+
+class Conflict(Exception):
+    sqlstate = "40001"
+
+
+def test_pings_are_queued_once_committed(database_client):
+    user = User(
+        phone_no="+0",
+        email="write-behind@example.com",
+        name="write behind test",
+        firebase_user_id="write-behind-test",
+        user_type=UserType.employee,
+    )
+    attempts = []
+
+    async def add_location(cockroach_session, fail=None):
+        await EmployeeService.add_location(
+            location=Location(location_lat=len(attempts), location_long=0),
+            user=user,
+            cockroach_session=cockroach_session,
+            location_buffer=buffer,
+            location_hub=LocationHub(),
+        )
+        attempts.append(None)
+        if fail is not None:
+            raise fail
+
+    async def retried(cockroach_session):
+        await add_location(
+            cockroach_session,
+            DBAPIError("SELECT", {}, Conflict()) if not attempts else None,
+        )
+
+    async def failing(cockroach_session):
+        await add_location(cockroach_session, RuntimeError())
+
+    async def scenario():
+        await buffer.start(Client())
+        try:
+            await database_client.run_transaction(retried)
+            with pytest.raises(RuntimeError):
+                await database_client.run_transaction(failing)
+        finally:
+            await buffer.stop()
+            await database_client.async_engine.dispose()
+
+    writes = Writes()
+    buffer = buffer_of(writes)
+    asyncio.run(scenario())
+    # the retry's ping only; neither the conflicting nor the failed attempt's
+    assert [[item.location_lat for item in batch] for batch in writes.batches] == [
+        [1.0]
+    ]
+    assert isinstance(writes.batches[0][0], EmployeeLocation)